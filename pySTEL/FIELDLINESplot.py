@@ -211,9 +211,8 @@ class MyApp(QMainWindow):
 			k = self.u
 			rmin = np.amin(self.fieldlines_data.raxis)
 			rmax = np.amax(self.fieldlines_data.raxis)
-			self.ax.plot(self.fieldlines_data.R_lines[k:self.nsteps-1:self.npoinc,:],\
-				self.fieldlines_data.Z_lines[k:self.nsteps-1:self.npoinc,:],\
-				'.k',markersize=0.1)
+			r, z = self.fieldlines_data.read_poincare(k)
+			self.ax.plot(r,z,'.k',markersize=0.1)
 			self.ax.set_xlabel('R [m]')
 			self.ax.set_ylabel('Z [m]')
 			self.ax.set_title('Poincaré Plot')
@@ -223,14 +222,10 @@ class MyApp(QMainWindow):
 			k = self.u
 			rmin = np.amin(self.fieldlines_data.raxis)
 			rmax = np.amax(self.fieldlines_data.raxis)
-			cmin = np.amin(self.fieldlines_data.B_lines[k:self.npoinc,0])
-			cmax = np.amax(self.fieldlines_data.B_lines[k:self.npoinc,0])
+			r, z, b = self.fieldlines_data.read_poincare(k,names=['R_lines','Z_lines','B_lines'])
 			#cmin = cmin - 0.5*np.abs(cmin)
 			#cmax = cmax + 0.5*np.abs(cmin)
-			print(self.fieldlines_data.B_lines[0,:])
-			cax  = self.ax.scatter(self.fieldlines_data.R_lines[k:self.nsteps-1:self.npoinc,:],\
-				self.fieldlines_data.Z_lines[k:self.nsteps-1:self.npoinc,:],\
-				c=self.fieldlines_data.B_lines[k:self.nsteps-1:self.npoinc,:], marker='.',s=0.3, \
+			cax  = self.ax.scatter(r,z,c=b, marker='.',s=0.3, \
 				cmap='jet')
 			self.ax.set_xlabel('R [m]')
 			self.ax.set_ylabel('Z [m]')
@@ -248,9 +243,8 @@ class MyApp(QMainWindow):
 			cmax = np.amax(rho)
 			n = np.rint((self.nsteps-1-k)/self.npoinc)
 			rho2d = np.matlib.repmat(rho,int(n),1)
-			cax  = self.ax.scatter(self.fieldlines_data.R_lines[k:self.nsteps-1:self.npoinc,:],\
-				self.fieldlines_data.Z_lines[k:self.nsteps-1:self.npoinc,:],\
-				c=rho2d, marker='.',s=0.3, \
+			r, z = self.fieldlines_data.read_poincare(k)
+			cax  = self.ax.scatter(r,z,c=rho2d, marker='.',s=0.3, \
 				cmap='jet')
 			self.ax.set_xlabel('R [m]')
 			self.ax.set_ylabel('Z [m]')
@@ -268,9 +262,8 @@ class MyApp(QMainWindow):
 			cmax = np.amax(rho)
 			n = np.rint((self.nsteps-1-k)/self.npoinc)
 			rho2d = np.matlib.repmat(rho,int(n),1)
-			cax  = self.ax.scatter(self.fieldlines_data.R_lines[k:self.nsteps-1:self.npoinc,:],\
-				self.fieldlines_data.Z_lines[k:self.nsteps-1:self.npoinc,:],\
-				c=rho2d, marker='.',s=0.3, \
+			r, z = self.fieldlines_data.read_poincare(k)
+			cax  = self.ax.scatter(r,z,c=rho2d, marker='.',s=0.3, \
 				cmap='jet')
 			self.ax.set_xlabel('R [m]')
 			self.ax.set_ylabel('Z [m]')
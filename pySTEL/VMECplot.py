@@ -343,17 +343,13 @@ class MyApp(QMainWindow):
 		for j in range(self.nu): self.theta[j]=2*pi*j/(self.nu-1)
 		for j in range(self.nv): self.zeta[j]=2*pi*j/((self.nv-1))
 		self.zeta2=self.zeta[0:self.nv2+1]
-		self.r=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.rmnc,self.vmec_data.xm,self.vmec_data.xn)
-		self.z=self.vmec_data.sfunct(self.theta,self.zeta,self.vmec_data.zmns,self.vmec_data.xm,self.vmec_data.xn)
-		self.b=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.bmnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.g=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.gmnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.bu=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.bsupumnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.bv=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.bsupvmnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.cu=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.currumnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.cv=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.currvmnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.b_s=self.vmec_data.sfunct(self.theta,self.zeta,self.vmec_data.bsubsmns,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.b_u=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.bsubumnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
-		self.b_v=self.vmec_data.cfunct(self.theta,self.zeta,self.vmec_data.bsubvmnc,self.vmec_data.xm_nyq,self.vmec_data.xn_nyq)
+		self.r,self.z=self.vmec_data.mfunct(self.theta,self.zeta,[self.vmec_data.rmnc,self.vmec_data.zmns],\
+			self.vmec_data.xm,self.vmec_data.xn,['cos','sin'])
+		self.b,self.g,self.bu,self.bv,self.cu,self.cv,self.b_s,self.b_u,self.b_v=self.vmec_data.mfunct(self.theta,self.zeta,\
+			[self.vmec_data.bmnc,self.vmec_data.gmnc,self.vmec_data.bsupumnc,self.vmec_data.bsupvmnc,\
+			self.vmec_data.currumnc,self.vmec_data.currvmnc,self.vmec_data.bsubsmns,self.vmec_data.bsubumnc,\
+			self.vmec_data.bsubvmnc],self.vmec_data.xm_nyq,self.vmec_data.xn_nyq,\
+			['cos','cos','cos','cos','cos','cos','sin','cos','cos'])
 
 	def plot_to_file(self,i):
 		text = self.ui.saveas_filename.toPlainText();
@@ -19,9 +19,9 @@ theta = np.ndarray((nu,1))
 phi   = np.ndarray((nv,1))
 for j in range(nu):  theta[j]=2.0*np.pi*j/(nu)
 for j in range(nv):    phi[j]=2.0*np.pi*j/(nv)
-r = vmec_wout.cfunct(theta,phi,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn)
-z = vmec_wout.sfunct(theta,phi,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn)
-[vertices,faces] = vmec_wout.blenderSurface(r,z,phi,surface=vmec_wout.ns-1)
+r = vmec_wout.cfunct(theta,phi,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn,surfaces=vmec_wout.ns-1)
+z = vmec_wout.sfunct(theta,phi,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn,surfaces=vmec_wout.ns-1)
+[vertices,faces] = vmec_wout.blenderSurface(r,z,phi)
 
 # Create mesh data
 mesh = bpy.data.meshes.new(name="VMECMesh")
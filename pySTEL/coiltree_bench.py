@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the COILTREE multipole field against the exact
+Biot-Savart sum (COILSET.coilbiot) of a coils file.
+
+The points are random in a spherical shell outside the coils
+(shell) or in a torus inside the coils (torus). The exact field is
+computed on the first nexact points, its time is scaled to all
+points and the relative error of |B| is evaluated on them.
+"""
+
+
+def bench_points(coils,npts,region,seed=1):
+	"""Random evaluation points about a coilset
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset
+	npts : int
+		Number of points
+	region : str
+		shell (1.4 to 2 times the largest coil radius) or torus
+		(inner half of the coil R and Z extent)
+	seed : int (optional)
+		Random seed (default: 1)
+	Returns
+	----------
+	x : ndarray
+		Cartesian x [m]
+	y : ndarray
+		Cartesian y [m]
+	z : ndarray
+		Cartesian z [m]
+	"""
+	import numpy as np
+	rng = np.random.default_rng(seed)
+	xc,yc,zc,seg,cur = coils.segments()
+	if region == 'shell':
+		rc = np.max(np.sqrt(xc*xc+yc*yc+zc*zc))
+		r = rng.uniform(1.4*rc,2.0*rc,npts)
+		u = rng.normal(size=(3,npts))
+		u = r*u/np.sqrt(np.sum(u*u,axis=0))
+		return u[0], u[1], u[2]
+	rr = np.sqrt(xc*xc+yc*yc)
+	r0 = 0.5*(np.min(rr)+np.max(rr)); dr = 0.25*(np.max(rr)-np.min(rr))
+	z0 = 0.5*(np.min(zc)+np.max(zc)); dz = 0.25*(np.max(zc)-np.min(zc))
+	r = rng.uniform(r0-dr,r0+dr,npts)
+	phi = rng.uniform(0,2*np.pi,npts)
+	z = rng.uniform(z0-dz,z0+dz,npts)
+	return r*np.cos(phi), r*np.sin(phi), z
+
+
+if __name__=="__main__":
+	import sys, time
+	from argparse import ArgumentParser
+	from libstell.coils import COILSET, COILTREE
+	import numpy as np
+	parser = ArgumentParser(description=
+		'''Compares the COILTREE multipole field with the exact
+		   Biot-Savart sum of a coils file.''')
+	parser.add_argument("-c", "--coil", dest="coils_file",
+		help="Coils file for input", default = None)
+	parser.add_argument("-n", "--npts", dest="npts",
+		help="Numbers of points (comma separated)", default = '100000')
+	parser.add_argument("-r", "--region", dest="region",
+		help="Point region (shell,torus)", default = 'shell,torus')
+	parser.add_argument("--theta", dest="theta", type=float,
+		help="Opening angle", default = 0.4)
+	parser.add_argument("--order", dest="order", type=int,
+		help="Expansion order", default = 8)
+	parser.add_argument("--nexact", dest="nexact", type=int,
+		help="Points of the exact sum", default = 100000)
+	args = parser.parse_args()
+	if not args.coils_file: sys.exit(0)
+	coils = COILSET()
+	coils.read_coils_file(args.coils_file)
+	xc,yc,zc,seg,cur = coils.segments()
+	print(f'  Segments: {len(seg)}  theta: {args.theta}  order: {args.order}')
+	t0 = time.time()
+	tree = COILTREE(xc,yc,zc,seg,cur,order=args.order)
+	tbuild = time.time()-t0
+	print(f'  Tree build: {tbuild:.2f} s')
+	print('  REGION    NPTS   EXACT[s]  TREE[s]  SPEEDUP  MAX_ERR   MEAN_ERR')
+	for region in args.region.split(','):
+		for npts in [int(n) for n in args.npts.split(',')]:
+			x,y,z = bench_points(coils,npts,region)
+			t0 = time.time()
+			b = np.array(tree.bfield(x,y,z,theta=args.theta))
+			ttree = time.time()-t0
+			nexact = min(npts,args.nexact)
+			t0 = time.time()
+			b0 = np.array(coils.coilbiot(x[:nexact],y[:nexact],z[:nexact]))
+			texact = (time.time()-t0)*npts/nexact
+			err = np.sqrt(np.sum((b[:,:nexact]-b0)**2,axis=0)/np.sum(b0*b0,axis=0))
+			print(f'  {region:6s} {npts:8d} {texact:9.2f} {ttree:8.2f} {texact/(ttree+tbuild):8.2f}'\
+				f'  {np.max(err):.2e}  {np.mean(err):.2e}')
+	sys.exit(0)
@@ -39,9 +39,10 @@ if __name__=="__main__":
 				zeta  = np.ndarray((3,1))
 				for j in range(360): theta[j]=2.0*np.pi*j/359.0
 				for j in range(3):   zeta[j]=     np.pi*j/2.0
-				r = vmec_wout.cfunct(theta,zeta,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp)
-				z = vmec_wout.sfunct(theta,zeta,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp)
 				j = vmec_wout.ns-1
+				r = vmec_wout.cfunct(theta,zeta,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp,surfaces=j)
+				z = vmec_wout.sfunct(theta,zeta,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp,surfaces=j)
+				j = 0
 				ax1.plot(r[j,:,0],z[j,:,0],'r')
 				ax2.plot(r[j,:,1],z[j,:,1],'r')
 				ax3.plot(r[j,:,2],z[j,:,2],'r')
@@ -79,6 +79,30 @@ class BEAMS3D():
 		self.MODB    = np.sqrt(self.B_R**2 + self.B_PHI**2 + self.B_Z**2)
 		return
 
+	def interp_grid(self,names=['B_R','B_PHI','B_Z'],order=3):
+		"""Returns an interpolator for background grid quantities
+
+		This routine sets up a GRIDINTERP for quantities on the
+		(raxis,phiaxis,zaxis) grid (B_R, B_PHI, B_Z, MODB, S_ARR,
+		TE, NE, ...) which can then be evaluated at any points.
+
+		Parameters
+		----------
+		names : list (optional)
+			Quantities to interpolate (default: B_R, B_PHI, B_Z)
+		order : int (optional)
+			Trilinear (1) or tricubic (3) interpolation (default: 3)
+		Returns
+		-------
+		interp : GRIDINTERP
+			Interpolator for the quantities.
+		"""
+		from libstell.gridinterp import GRIDINTERP
+		interp = GRIDINTERP(self.raxis,self.phiaxis,self.zaxis,order=order)
+		for temp in names:
+			interp.add_field(temp,getattr(self,temp))
+		return interp
+
 	def calcVperp(self):
 		"""Calculates the perpendicular marker velocity
 
@@ -6,7 +6,7 @@ transform data.
 """
 
 # Libraries
-from libstell.libstell import LIBSTELL, FourierRep
+from libstell.libstell import LIBSTELL, FourierRep, read_netcdf
 
 # Constants
 
@@ -18,9 +18,13 @@ class BOOZER(FourierRep):
 	def __init__(self):
 		super().__init__()
 		self.nfp = None
-		self.libStell = LIBSTELL()
+		try:
+			self.libStell = LIBSTELL()
+		except Exception:
+			# No libstell.so, netCDF files can still be read
+			self.libStell = None
 
-	def read_boozer(self,filename):
+	def read_boozer(self,filename,lnative=None):
 		"""Reads a BOOZER boozmn file
 
 		This routine reads and initilizes the BOOZER class
@@ -30,14 +34,74 @@ class BOOZER(FourierRep):
 		----------
 		file : str
 			Path to wout file.
+		lnative : bool (optional)
+			Read a netCDF boozmn file directly instead of through
+			LIBSTELL (default: only if libstell.so is unavailable)
 		"""
 		import numpy as np
-		boozmn_dict = self.libStell.read_boozer(filename)
+		if lnative is None: lnative = self.libStell is None
+		if lnative:
+			boozmn_dict = self.read_boozer_netcdf(filename)
+		else:
+			boozmn_dict = self.libStell.read_boozer(filename)
 		for key in boozmn_dict:
 			setattr(self, key, boozmn_dict[key])
 		self.mboz_b = int(max(np.squeeze(self.ixm_b)))
 		nmax = int(max(np.squeeze(self.ixn_b))/self.nfp_b)
 
+	def read_boozer_netcdf(self,filename):
+		"""Reads a netCDF boozmn file without LIBSTELL
+
+		This routine reads a netCDF boozmn file and returns a
+		dictionary with the same keys and shapes as
+		LIBSTELL.read_boozer. Harmonics are stored in the file only
+		for the surfaces in jlist, these are placed in arrays over
+		all ns_b surfaces with idx_b flagging the computed ones.
+
+		Parameters
+		----------
+		filename : str
+			Path to boozmn file.
+		Returns
+		----------
+		boozmn_dict : dict
+			Dictionary of boozmn variables
+		"""
+		import numpy as np
+		intList  = ['mnboz_b', 'mboz_b', 'nboz_b', 'nfp_b', 'ns_b']
+		realList = ['aspect_b', 'rmax_b', 'rmin_b', 'betaxis_b']
+		profList = ['iota_b','pres_b','phip_b','phi_b','beta_b','buco_b','bvco_b']
+		# read_boozer_mod name : file name
+		harmList = {'bmnc_b':'bmnc_b','rmnc_b':'rmnc_b','zmns_b':'zmns_b',\
+			'pmns_b':'pmns_b','gmnc_b':'gmn_b'}
+		asymList = {'bmns_b':'bmns_b','rmns_b':'rmns_b','zmnc_b':'zmnc_b',\
+			'pmnc_b':'pmnc_b','gmns_b':'gmns_b'}
+		file_data = read_netcdf(filename,['lasym__logical__','jlist','ixm_b','ixn_b']\
+			+intList+realList+profList+list(harmList.values())+list(asymList.values()))
+		boozmn_dict = {}
+		boozmn_dict['lasym_b'] = bool(file_data.get('lasym__logical__',0))
+		for temp in intList:
+			boozmn_dict[temp] = int(file_data[temp])
+		for temp in realList:
+			boozmn_dict[temp] = float(file_data.get(temp,0.0))
+		ns = boozmn_dict['ns_b']
+		mnmax = boozmn_dict['mnboz_b']
+		for temp in profList:
+			boozmn_dict[temp] = np.reshape(file_data[temp],(ns,1)).astype(float)
+		boozmn_dict['ixm_b'] = np.reshape(file_data['ixm_b'],(mnmax,1)).astype(np.int32)
+		boozmn_dict['ixn_b'] = np.reshape(file_data['ixn_b'],(mnmax,1)).astype(np.int32)
+		# jlist holds the (1 based) computed surfaces, packed rows
+		# are stored in increasing surface order (see unpack_cdf)
+		jlist = np.ravel(file_data['jlist']).astype(int)-1
+		boozmn_dict['idx_b'] = np.zeros((ns,1),dtype=np.int32)
+		boozmn_dict['idx_b'][jlist] = 1
+		jlist = np.nonzero(boozmn_dict['idx_b'][:,0])[0]
+		if boozmn_dict['lasym_b']: harmList = harmList | asymList
+		for temp in harmList:
+			boozmn_dict[temp] = np.zeros((ns,mnmax))
+			boozmn_dict[temp][jlist,:] = np.reshape(file_data[harmList[temp]],(len(jlist),mnmax))
+		return boozmn_dict
+
 	def plotBmnSpectrum(self,sval,ax=None):
 		"""Plots the boozer spectrum for a surface
 
@@ -0,0 +1,392 @@
+##!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This library provides vectorized engineering metrics (length,
+curvature, torsion, coil-coil separation and self distance) for all
+coils of a COILSET at once.
+"""
+
+# Libraries
+
+# Constants
+
+def coil_metrics(coils,arc_fraction=0.1):
+	"""Calculates the engineering metrics of a coilset
+
+	This routine evaluates all metrics of this module on the
+	packed coilset (see COILSET.pack).
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset to evaluate.
+	arc_fraction : float (optional)
+		Fraction of the coil length below which points are
+		neighbours for the self distance (default: 0.1)
+	Returns
+	----------
+	metrics : dict
+		length, max_curvature, separation, separation_coil and
+		self_distance per coil (ncoils), curvature and torsion per
+		point (packed order).
+	"""
+	import numpy as np
+	metrics = {}
+	metrics['length'] = coil_length(coils)
+	curv, tors = coil_curvature(coils)
+	metrics['curvature'] = curv
+	metrics['torsion'] = tors
+	metrics['max_curvature'] = np.maximum.reduceat(curv,coils.coil_bounds[:-1])
+	sep, sep_coil = coil_separation(coils)
+	metrics['separation'] = sep
+	metrics['separation_coil'] = sep_coil
+	metrics['self_distance'] = coil_self_distance(coils,arc_fraction)
+	return metrics
+
+def coil_length(coils):
+	"""Calculates the length of each coil
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset to evaluate.
+	Returns
+	----------
+	length : ndarray
+		Length of each coil in packed order [m]
+	"""
+	return coils.coilLength()
+
+def coil_curvature(coils):
+	"""Calculates the curvature and torsion along each coil
+
+	Derivatives with respect to the point index are taken with
+	central differences, periodic for closed coils (last point
+	equal to the first) and clamped at the ends of open coils.
+	The curvature |r'xr''|/|r'|**3 and torsion
+	(r'xr'').r'''/|r'xr''|**2 do not depend on the
+	parametrization.
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset to evaluate.
+	Returns
+	----------
+	curvature : ndarray
+		Curvature at each point (packed order) [1/m]
+	torsion : ndarray
+		Torsion at each point (packed order) [1/m]
+	"""
+	import numpy as np
+	if coils.seg_index is None: coils.pack()
+	r = np.stack((coils.coil_x,coils.coil_y,coils.coil_z),axis=1)
+	i0 = coils.coil_bounds[:-1]
+	i1 = coils.coil_bounds[1:]
+	npts = i1-i0
+	lclosed = np.all(np.isclose(r[i0],r[i1-1],rtol=0,atol=1.0E-10),axis=1)
+	# Number of distinct points of each coil
+	nuniq = np.where(lclosed,npts-1,npts)
+	coil = np.repeat(np.arange(len(i0)),npts)
+	j = np.arange(len(r))-i0[coil]
+	def shift(m):
+		jm = j+m
+		jm = np.where(lclosed[coil],np.mod(jm,nuniq[coil]),np.clip(jm,0,npts[coil]-1))
+		return r[i0[coil]+jm]
+	rm2 = shift(-2); rm1 = shift(-1); rp1 = shift(1); rp2 = shift(2)
+	d1 = 0.5*(rp1-rm1)
+	d2 = rp1-2.0*shift(0)+rm1
+	d3 = 0.5*(rp2-2.0*rp1+2.0*rm1-rm2)
+	c = np.cross(d1,d2)
+	c2 = np.sum(c*c,axis=1)
+	v = np.sqrt(np.sum(d1*d1,axis=1))
+	with np.errstate(divide='ignore',invalid='ignore'):
+		curvature = np.where(v>0,np.sqrt(c2)/v**3,0.0)
+		torsion = np.where(c2>0,np.sum(c*d3,axis=1)/c2,0.0)
+	return curvature, torsion
+
+def coil_separation(coils,nblock=32):
+	"""Calculates the minimum distance of each coil to any other coil
+
+	Each coil is split into nblock blocks of consecutive points
+	with a KD-tree per block. The distance between the first
+	points of the blocks bounds the separation of each coil from
+	above, the bounding spheres of the blocks bound the distance
+	of two blocks from below. Each block tree is then queried,
+	bounded by the upper bound, with the points of the blocks of
+	other coils which can be closer than that.
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset to evaluate.
+	nblock : int (optional)
+		Number of blocks per coil (default: 32)
+	Returns
+	----------
+	separation : ndarray
+		Minimum distance to another coil for each coil [m]
+	partner : ndarray
+		Index of the closest other coil (packed order)
+	"""
+	import numpy as np
+	if coils.seg_index is None: coils.pack()
+	bounds = coils.coil_bounds
+	ncoils = len(bounds)-1
+	r = np.stack((coils.coil_x,coils.coil_y,coils.coil_z),axis=1)
+	coil = np.repeat(np.arange(ncoils),np.diff(bounds))
+	blocks = []
+	for i in range(ncoils):
+		idx = np.arange(bounds[i],bounds[i+1])
+		blocks.extend(np.array_split(idx,min(nblock,len(idx))))
+	owner = np.array([coil[b[0]] for b in blocks])
+	cent, rad = _bounding_spheres([r[b] for b in blocks])
+	# Upper bound from the first points of the blocks
+	first = r[[b[0] for b in blocks]]
+	upper, _ = _separation_bits(first,owner,ncoils)
+	upper = upper*(1.0+1.0E-12)
+	# Pairs of blocks of different coils which can be closer
+	ia, ib = _block_pairs(cent,rad,upper[owner])
+	lower = np.sqrt(np.sum((cent[ia]-cent[ib])**2,axis=1))-rad[ia]-rad[ib]
+	lkeep = (owner[ia] != owner[ib]) & (lower < upper[owner[ia]])
+	ia = ia[lkeep]; ib = ib[lkeep]
+	dist, iq, ib = _query_blocks(r,blocks,ia,ib,upper[owner[ia]])
+	pcoil = coil[iq]; pother = owner[ib]
+	separation = np.full(ncoils,np.inf)
+	partner = -np.ones(ncoils,dtype=int)
+	np.minimum.at(separation,pcoil,dist)
+	lmin = np.isfinite(dist) & (dist == separation[pcoil])
+	partner[pcoil[lmin]] = pother[lmin]
+	return separation, partner
+
+def _separation_bits(r,coil,ncoils):
+	"""Coil separation from KD-trees over the halves of each bit
+
+	For each bit of the coil index the points of the coils with
+	and without the bit set are put in two trees. Querying each
+	point against the tree of the other half, for every bit,
+	covers all other coils.
+
+	Returns
+	----------
+	separation : ndarray
+		Minimum distance to another coil for each coil [m]
+	partner : ndarray
+		Index of the closest other coil
+	"""
+	import numpy as np
+	from scipy.spatial import cKDTree
+	dist = np.full(len(r),np.inf)
+	index = np.zeros(len(r),dtype=int)
+	for bit in range(int(ncoils-1).bit_length()):
+		lset = (coil >> bit) & 1 == 1
+		for lquery in [lset,~lset]:
+			iq = np.nonzero(lquery)[0]
+			it = np.nonzero(~lquery)[0]
+			if len(iq) == 0 or len(it) == 0: continue
+			d, k = cKDTree(r[it]).query(r[iq])
+			lbetter = d < dist[iq]
+			dist[iq[lbetter]] = d[lbetter]
+			index[iq[lbetter]] = it[k[lbetter]]
+	separation = np.full(ncoils,np.inf)
+	partner = -np.ones(ncoils,dtype=int)
+	np.minimum.at(separation,coil,dist)
+	lmin = np.isfinite(dist) & (dist == separation[coil])
+	partner[coil[lmin]] = coil[index[lmin]]
+	return separation, partner
+
+def coil_self_distance(coils,arc_fraction=0.1,nsize=32):
+	"""Calculates the self distance of each coil
+
+	The self distance is the minimum distance between two points
+	of the same coil which are further apart than arc_fraction
+	of the coil length along the coil (the shorter way around
+	for closed coils). It becomes small when a coil folds back
+	onto (or intersects) itself.
+
+	The points of each coil are split into blocks of nsize
+	points. The points a block may be compared with form one
+	(closed coils) or two (open coils) ranges along the coil.
+	The ends of the ranges are compared point by point, the
+	blocks entirely inside are covered by O(log n) power of two
+	unions of blocks. A union is only searched (with a KD-tree
+	bounded by the best distance so far) if its bounding box
+	can be closer than that.
+
+	Parameters
+	----------
+	coils : COILSET
+		Coilset to evaluate.
+	arc_fraction : float (optional)
+		Fraction of the coil length below which points are
+		neighbours (default: 0.1)
+	nsize : int (optional)
+		Points per block (default: 32)
+	Returns
+	----------
+	self_distance : ndarray
+		Self distance of each coil [m]
+	"""
+	import numpy as np
+	from scipy.spatial import cKDTree
+	if coils.seg_index is None: coils.pack()
+	bounds = coils.coil_bounds
+	ncoils = len(bounds)-1
+	r = np.stack((coils.coil_x,coils.coil_y,coils.coil_z),axis=1)
+	self_distance = np.full(ncoils,np.inf)
+	for i in range(ncoils):
+		p = r[bounds[i]:bounds[i+1]]
+		lclosed = len(p) > 1 and np.allclose(p[0],p[-1],rtol=0,atol=1.0E-10)
+		# Arc length of each point along the coil
+		s = np.concatenate(([0.0],np.cumsum(np.sqrt(np.sum(np.diff(p,axis=0)**2,axis=1)))))
+		length = s[-1]
+		arc = arc_fraction*length
+		if lclosed: p = p[:-1]; s = s[:-1]
+		n = len(p)
+		if n < 2 or length <= 0: continue
+		j = np.arange(n)
+		# Ranges of allowed points, closed coils unrolled twice
+		if lclosed:
+			p = np.concatenate((p,p)); s = np.concatenate((s,s+length))
+			ranges = [(np.searchsorted(s,s[j]+arc,'right'),np.searchsorted(s,s[j]+length-arc,'left'))]
+		else:
+			ranges = [(np.zeros(n,dtype=int),np.searchsorted(s,s[j]-arc,'left')),\
+				(np.searchsorted(s,s[j]+arc,'right'),np.full(n,n))]
+		# Points of each block, the last block padded with its last point
+		nb = -(-n//nsize)
+		jb = np.minimum(np.arange(nb*nsize),n-1).reshape((nb,nsize))
+		# Bounding boxes of the blocks of p and of their power of two unions
+		np_ = len(p)
+		ib = np.minimum(np.arange(-(-np_//nsize)*nsize),np_-1).reshape((-1,nsize))
+		boxes = [(np.min(p[ib],axis=1),np.max(p[ib],axis=1))]
+		while len(boxes[-1][0]) > 1:
+			bmin, bmax = boxes[-1]
+			if len(bmin) % 2: bmin = np.vstack((bmin,bmin[-1:])); bmax = np.vstack((bmax,bmax[-1:]))
+			boxes.append((np.minimum(bmin[0::2],bmin[1::2]),np.maximum(bmax[0::2],bmax[1::2])))
+		qmin, qmax = boxes[0][0][0:nb], boxes[0][1][0:nb]
+		best = np.inf
+		nodes = []
+		for lo, hi in ranges:
+			lo = lo[jb]; hi = hi[jb]
+			lok = lo < hi
+			lvalid = np.any(lok,axis=1)
+			lomin = np.min(np.where(lok,lo,np_),axis=1); lomax = np.max(np.where(lok,lo,0),axis=1)
+			himin = np.min(np.where(lok,hi,np_),axis=1); himax = np.max(np.where(lok,hi,0),axis=1)
+			# Blocks allowed for all points of the block
+			k0 = -(-lomax//nsize); k1 = himin//nsize
+			k0 = np.where(k0 >= k1,k1,k0)
+			# Ends of the range point by point
+			for e0, e1 in [(lomin,k0*nsize),(k1*nsize,himax)]:
+				w = np.where(lvalid,e1-e0,0)
+				if np.max(w) <= 0: continue
+				e = np.minimum(e0[:,None]+np.arange(np.max(w)),np_-1)
+				lin = (e[:,None,:] >= lo[:,:,None]) & (e[:,None,:] < hi[:,:,None]) \
+					& (np.arange(np.max(w))[None,None,:] < w[:,None,None])
+				nchunk = max(1,2**22//(nsize*np.max(w)))
+				for k in range(0,nb,nchunk):
+					sl = slice(k,k+nchunk)
+					d = np.sqrt(np.sum((p[jb[sl]][:,:,None]-p[e[sl]][:,None,:])**2,axis=3))
+					best = min(best,np.min(np.where(lin[sl],d,np.inf)))
+			# Power of two unions covering [k0,k1), bottom up
+			a = np.where(lvalid,k0,0); b = np.where(lvalid,k1,0); q = np.arange(nb)
+			l = 0
+			while np.any(a < b):
+				m = (a < b) & (a % 2 == 1)
+				nodes.append((q[m],l,a[m])); a = a+m
+				m = (a < b) & (b % 2 == 1)
+				b = b-m; nodes.append((q[m],l,b[m]))
+				a = a//2; b = b//2; l += 1
+		if len(nodes) == 0:
+			self_distance[i] = best
+			continue
+		q = np.concatenate([n_[0] for n_ in nodes])
+		lev = np.concatenate([np.full(len(n_[0]),n_[1]) for n_ in nodes])
+		idx = np.concatenate([n_[2] for n_ in nodes])
+		# Lower bound between the block and union boxes
+		nmin = np.zeros((len(q),3)); nmax = np.zeros((len(q),3))
+		for l in range(len(boxes)):
+			m = lev == l
+			nmin[m] = boxes[l][0][idx[m]]; nmax[m] = boxes[l][1][idx[m]]
+		gap = np.maximum(0.0,np.maximum(nmin-qmax[q],qmin[q]-nmax))
+		lower = np.sqrt(np.sum(gap**2,axis=1))
+		key = lev*(np_+1)+idx
+		order = np.lexsort((lower,key))
+		q = q[order]; lev = lev[order]; idx = idx[order]; lower = lower[order]; key = key[order]
+		split = np.nonzero(np.diff(key))[0]+1
+		groups = list(zip(np.split(q,split),np.split(lev,split),np.split(idx,split),np.split(lower,split)))
+		# Unions with the lowest bound first
+		for gq, gl, gi, gw in sorted(groups,key=lambda g: g[3][0]):
+			if gw[0] >= best: break
+			gq = gq[gw < best]
+			e = np.arange(gi[0]*2**gl[0]*nsize,min((gi[0]+1)*2**gl[0]*nsize,np_))
+			d, _ = cKDTree(p[e]).query(p[jb[gq]].reshape((-1,3)),distance_upper_bound=best)
+			best = min(best,np.min(d))
+		self_distance[i] = best
+	return self_distance
+
+def _block_pairs(cent,rad,upper):
+	"""Pairs of blocks whose bounding spheres are closer than upper
+
+	Returns
+	----------
+	ia : ndarray
+		Index of the first block of each pair
+	ib : ndarray
+		Index of the second block (ib != ia)
+	"""
+	import numpy as np
+	from scipy.spatial import cKDTree
+	reach = np.where(np.isfinite(upper),upper,0.0)+rad+np.max(rad)
+	near = cKDTree(cent).query_ball_point(cent,reach)
+	ia = np.repeat(np.arange(len(cent)),[len(n) for n in near])
+	ib = np.concatenate(near).astype(int)
+	lkeep = ia != ib
+	return ia[lkeep], ib[lkeep]
+
+def _query_blocks(r,blocks,ia,ib,upper):
+	"""Nearest points of blocks ib for the points of blocks ia
+
+	The tree of each block in ib is built once and queried with
+	the points of all its blocks in ia, bounded by upper.
+
+	Returns
+	----------
+	dist : ndarray
+		Distance of each queried point (inf beyond the bound)
+	iq : ndarray
+		Index of the queried point
+	ib : ndarray
+		Block which was queried
+	"""
+	import numpy as np
+	from scipy.spatial import cKDTree
+	order = np.argsort(ib,kind='stable')
+	ia = ia[order]; ib = ib[order]; upper = upper[order]
+	dist = [np.zeros(0)]; iq = [np.zeros(0,dtype=int)]; iblk = [np.zeros(0,dtype=int)]
+	split = np.nonzero(np.diff(ib))[0]+1
+	for sa, sb, su in zip(np.split(ia,split),np.split(ib,split),np.split(upper,split)):
+		if len(sa) == 0: continue
+		idx = np.concatenate([blocks[a] for a in sa])
+		d, _ = cKDTree(r[blocks[sb[0]]]).query(r[idx],distance_upper_bound=np.max(su))
+		dist.append(d); iq.append(idx); iblk.append(np.full(len(idx),sb[0]))
+	return np.concatenate(dist), np.concatenate(iq), np.concatenate(iblk)
+
+def _bounding_spheres(pts):
+	"""Centers and radii of spheres enclosing sets of points
+
+	Returns
+	----------
+	cent : ndarray
+		Mean of each set of points (n,3)
+	rad : ndarray
+		Largest distance of a point from the mean
+	"""
+	import numpy as np
+	cent = np.array([np.mean(p,axis=0) for p in pts])
+	rad = np.array([np.sqrt(np.max(np.sum((p-c)**2,axis=1))) for p,c in zip(pts,cent)])
+	return cent, rad
+
+# Main routine
+if __name__=="__main__":
+	import sys
+	sys.exit(0)
@@ -8,6 +8,13 @@ This library provides a python class for working with coils files
 from libstell.libstell import LIBSTELL
 
 # Constants
+COIL_BLOCK_BYTES = 2**27 # Scratch memory per block of evaluation points
+TREE_BLOCK_BYTES = 2**22 # Size of the COILTREE expansion terms per block of points
+TREE_MIN_POINTS = 2000 # Fewer points are summed directly in coilbiot_tree
+UNIT_CACHE_SIZE = 4 # Point sets kept in COILSET.unit_cache
+
+# Last surface KD-tree (see surface_tree)
+_SURFACE_TREE = None
 
 # VMEC Class
 class COILSET(LIBSTELL):
@@ -15,7 +22,7 @@ class COILSET(LIBSTELL):
 
 	"""
 	def __init__(self):
-		from collections import deque
+		from collections import deque, OrderedDict
 		super().__init__()
 		self.libStell = LIBSTELL()
 		self.nfp = None
@@ -25,55 +32,61 @@ class COILSET(LIBSTELL):
 		self.ymin=None; self.ymax=None;
 		self.zmin=None; self.zmax=None;
 		self.color_cycle = deque(['g', 'b', 'c', 'm', 'y', 'k'])
-
-	def read_coils_file(self,filename):
+		# Packed coilset (see pack)
+		self.coil_x = None; self.coil_y = None; self.coil_z = None
+		self.coil_bounds = None; self.coil_group = None
+		self.seg_index = None; self.seg_group = None; self.seg_scale = None
+		# Unit current fields (see unit_bfield)
+		self.unit_cache = OrderedDict()
+		self.cache_dir = None
+		# Stellarator symmetry of the coilset (see find_symmetry)
+		self.sym_stell = None
+
+	def read_coils_file(self,filename,lcache=False):
 		"""Directly reads a coils file
 
-		This routine reads a coils file into the class.
+		This routine reads a coils file into the class. The
+		numeric columns are parsed in one pass and the group
+		numbers and names are taken from the lines which close a
+		group (see _parse_coils_file). With lcache the parsed arrays are stored in a
+		binary file next to the coils file (filename.npz) which is
+		used instead of the coils file as long as the modification
+		time of the coils file does not change.
 
 		Parameters
 		----------
 		filename : str
 			Path to coils file.
+		lcache : bool (optional)
+			Use a binary cache file (default: False)
 		"""
+		import os
 		import numpy as np
-		f = open(filename,'r')
-		lines = f.readlines()
-		f.close()
-		if  'periods' in lines[0]:
-			self.nfp = int(lines[0][8:])
-		else:
-			print("Bad Synatx line 1 in coils file")
-		if 'begin filament' not in lines[1]:
-			print("Bad Synatx line 2 in coils file")
-		if 'mirror' not in lines[2]:
-			print("Bad Synatx line 3 in coils file")
-		npts = int(len(lines))-3
-		if 'end' in lines[-1]: npts = npts - 1
-		coords = np.zeros((3,npts))
-		group = np.zeros((npts))
-		current = np.zeros((npts))
-		coilnames = []
-		last_dex = 0
-		self.ngroups = 0
-		for i in range(0,npts):
-			line = lines[i+3].split()
-			if len(line) < 4: continue
-			#print(line)
-			coords[0,i] = float(line[0])
-			coords[1,i] = float(line[1])
-			coords[2,i] = float(line[2])
-			current[i]  = float(line[3])
-			if len(line) == 6:
-				if int(line[4]) not in group:
-					coilnames.extend([line[5]])
-				self.ngroups = max([self.ngroups,int(line[4])])
-				group[last_dex:i+1] = int(line[4])
-				last_dex=i+1
+		cache_file = filename+'.npz'
+		mtime = os.path.getmtime(filename)
+		data = None
+		if lcache and os.path.exists(cache_file):
+			with np.load(cache_file) as f:
+				if float(f['mtime']) == mtime:
+					data = {key:f[key] for key in f.files}
+		if data is None:
+			data = _parse_coils_file(filename)
+			if data is None: return
+			if lcache:
+				try:
+					np.savez(cache_file,mtime=mtime,**data)
+				except OSError:
+					print(f"Could not write coils cache file {cache_file}")
+		self.nfp = int(data['nfp'])
+		coords = data['coords']
+		current = data['current']
+		group = data['group']
+		coilnames = [str(name) for name in data['names']]
+		self.ngroups = len(coilnames)
 		# Set extents
-		self.xmin = min(coords[0]); self.xmax = max(coords[0])
-		self.ymin = min(coords[1]); self.ymax = max(coords[1])
-		self.zmin = min(coords[2]); self.zmax = max(coords[2])
+		self.xmin = np.min(coords[0]); self.xmax = np.max(coords[0])
+		self.ymin = np.min(coords[1]); self.ymax = np.max(coords[1])
+		self.zmin = np.min(coords[2]); self.zmax = np.max(coords[2])
 		# Create the coil object
 		for i in range(self.ngroups):
 			x = coords[0,group==(i+1)]
@@ -81,6 +94,55 @@ class COILSET(LIBSTELL):
 			z = coords[2,group==(i+1)]
 			c = current[group==(i+1)]
 			self.groups.extend([COILGROUP(x,y,z,c,coilnames[i])])
+		self.pack()
+
+	def pack(self):
+		"""Builds the packed representation of the coilset
+
+		This routine stores the filaments of all coils in contiguous
+		arrays (structure of arrays) which the field, distance and
+		length kernels work on. The points of each COIL become views
+		into the packed arrays so in place edits of the points are
+		seen by both. The routine must be called again if coils are
+		added, removed or replaced.
+
+		coil_x, coil_y, coil_z : ndarray
+			Points of all coils [m]
+		coil_bounds : ndarray
+			Offset of the first point of each coil (ncoils+1)
+		coil_group : ndarray
+			Group index of each coil
+		seg_index : ndarray
+			Index of the first point of each segment
+		seg_group : ndarray
+			Group index of each segment
+		seg_scale : ndarray
+			Multiplier of the group current in each segment
+		"""
+		import numpy as np
+		coils = []
+		coil_group = []
+		for i in range(self.ngroups):
+			for coil in self.groups[i].coils:
+				coils.append(coil)
+				coil_group.append(i)
+		npts = np.array([coil.npts for coil in coils],dtype=int)
+		self.coil_bounds = np.concatenate(([0],np.cumsum(npts)))
+		self.coil_group = np.array(coil_group,dtype=int)
+		self.coil_x = np.concatenate([coil.x for coil in coils]).astype(float)
+		self.coil_y = np.concatenate([coil.y for coil in coils]).astype(float)
+		self.coil_z = np.concatenate([coil.z for coil in coils]).astype(float)
+		for k,coil in enumerate(coils):
+			sl = slice(self.coil_bounds[k],self.coil_bounds[k+1])
+			coil.x = self.coil_x[sl]
+			coil.y = self.coil_y[sl]
+			coil.z = self.coil_z[sl]
+		# Segments join neighbouring points of the same coil
+		lseg = np.ones(self.coil_bounds[-1],dtype=bool)
+		lseg[self.coil_bounds[1:]-1] = False
+		self.seg_index = np.nonzero(lseg)[0]
+		self.seg_group = np.repeat(self.coil_group,npts-1)
+		self.seg_scale = np.ones(len(self.seg_index))
 
 	def plotcoils(self,ax=None,*args,**kwargs):
 		"""Plots a coilset in 3D
@@ -217,7 +279,8 @@ class COILSET(LIBSTELL):
 	def write_coils_file(self,filename):
 		"""Writes a coils file
 
-		This routine writes a coils file into a file.
+		This routine writes a coils file into a file. The lines
+		of each group are formatted in blocks.
 
 		Parameters
 		----------
@@ -225,97 +288,436 @@ class COILSET(LIBSTELL):
 			Path to coils file.
 		"""
 		import numpy as np
+		nblock = 100000
 		f = open(filename,'w')
 		f.write(f"periods {self.nfp}\n")
 		f.write(f"begin filament\n")
 		f.write(f"mirror NIL\n")
 		for i in range(self.ngroups):
-			for j in range(self.groups[i].ncoils):
-				offset = 0
-				if j == self.groups[i].ncoils-1: offset = 1
-				current = np.ones((self.groups[i].coils[j].npts))*self.groups[i].current
-				current[-1] = 0
-				for k in range(self.groups[i].coils[j].npts-offset):
-					f.write(f"{self.groups[i].coils[j].x[k]:.10E} {self.groups[i].coils[j].y[k]:.10E} {self.groups[i].coils[j].z[k]:.10E} {current[k]:.10E}\n")
-			k = self.groups[i].coils[j].npts-offset-1
-			f.write(f"{self.groups[i].coils[j].x[k]:.10E} {self.groups[i].coils[j].y[k]:.10E} {self.groups[i].coils[j].z[k]:.10E} {current[k]:.10E} {i+1} {self.groups[i].name}\n")
+			coils = self.groups[i].coils
+			data = np.zeros((sum([coil.npts for coil in coils]),4))
+			data[:,0] = np.concatenate([coil.x for coil in coils])
+			data[:,1] = np.concatenate([coil.y for coil in coils])
+			data[:,2] = np.concatenate([coil.z for coil in coils])
+			data[:,3] = self.groups[i].current
+			# Last point of each coil closes the coil
+			data[np.cumsum([coil.npts for coil in coils])-1,3] = 0
+			for k in range(0,len(data)-1,nblock):
+				block = data[k:min(k+nblock,len(data)-1)]
+				f.write(("%.10E %.10E %.10E %.10E\n"*len(block)) % tuple(block.ravel()))
+			f.write(f"{data[-1,0]:.10E} {data[-1,1]:.10E} {data[-1,2]:.10E} {data[-1,3]:.10E} {i+1} {self.groups[i].name}\n")
 		f.close()
 
-	def coilbiot(self,x,y,z,extcur=None):
-		"""Calculates field at point in space
+	def coilbiot(self,x,y,z,extcur=None,lcache=False):
+		"""Calculates field at points in space
 
-		This routine calculates the magnetic field at a point in space
-		given the point and external current array.
+		This routine calculates the magnetic field at points in space
+		given the points and external current array. The points
+		may be scalars or arrays of any (matching) shape. With
+		lcache the field is superposed from the unit current
+		fields of the groups (see unit_bfield), so repeated calls
+		on the same points with different extcur are cheap.
 
 		Parameters
 		----------
-		x : real
+		x : real or ndarray
 			Cartesian x value [m].
-		y : real
+		y : real or ndarray
 			Cartesian y value [m].
-		z : real
+		z : real or ndarray
 			Cartesian z value [m].
 		extcur : list
 			Array of currents in coil groups [A]
+		lcache : bool (optional)
+			Use the unit current field cache (default: False)
 		Returns
 		----------
-		bx : real
+		bx : real or ndarray
 			Magnetic field in cartesian x direction [T]
-		by : real
+		by : real or ndarray
 			Magnetic field in cartesian y direction [T]
-		bz : real
+		bz : real or ndarray
 			Magnetic field in cartesian z direction [T]
 		"""
 		import numpy as np
-		bx = 0; by = 0; bz = 0
+		if lcache:
+			if extcur is None:
+				extcur = [self.groups[i].current for i in range(self.ngroups)]
+			b = np.tensordot(np.asarray(extcur,dtype=float),self.unit_bfield(x,y,z),axes=(0,1))
+			return b[0], b[1], b[2]
+		xc,yc,zc,seg,cur = self.segments(extcur)
+		return biot_savart(x,y,z,xc,yc,zc,seg,cur)
+
+	def coilbiot_tree(self,x,y,z,extcur=None,theta=0.4,order=8):
+		"""Calculates approximate field at points in space
+
+		This routine calculates the magnetic field using the octree
+		multipole expansion of COILTREE. Building the tree costs
+		about as much as the exact sum on a few thousand points, so
+		for fewer than TREE_MIN_POINTS points the field is summed
+		exactly (as coilbiot). The gain grows with the distance of
+		the points from the coils: for the NCSX coils on 1E5 points
+		it is about 8 outside the coils and below 2 in the plasma
+		region (see coiltree_bench.py). See COILTREE for the error
+		bound set by theta and order.
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		extcur : list (optional)
+			Array of currents in coil groups [A]
+		theta : float (optional)
+			Opening angle (default: 0.4)
+		order : int (optional)
+			Expansion order (default: 8)
+		Returns
+		----------
+		bx : real or ndarray
+			Magnetic field in cartesian x direction [T]
+		by : real or ndarray
+			Magnetic field in cartesian y direction [T]
+		bz : real or ndarray
+			Magnetic field in cartesian z direction [T]
+		"""
+		import numpy as np
+		xc,yc,zc,seg,cur = self.segments(extcur)
+		if np.broadcast(np.asarray(x),np.asarray(y),np.asarray(z)).size < TREE_MIN_POINTS:
+			return biot_savart(x,y,z,xc,yc,zc,seg,cur)
+		tree = COILTREE(xc,yc,zc,seg,cur,order=order)
+		return tree.bfield(x,y,z,theta=theta)
+
+	def unit_bfield(self,x,y,z):
+		"""Calculates the field of each coil group for unit current
+
+		This routine returns the field of every coil group for a
+		unit group current so the field for any extcur is
+		np.tensordot(extcur,b,axes=(0,1)). Results are kept in
+		unit_cache keyed on the coil geometry (coilHash) and the
+		points, beyond UNIT_CACHE_SIZE entries the least recently
+		used are dropped. If cache_dir is set they are also stored
+		there as .npy files and reused by later sessions.
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		Returns
+		----------
+		b : ndarray
+			Field (bx,by,bz) of each group, shape (3,ngroups,...) [T/A]
+		"""
+		import os
+		import hashlib
+		import numpy as np
+		x, y, z = np.broadcast_arrays(np.asarray(x,dtype=float),\
+			np.asarray(y,dtype=float),np.asarray(z,dtype=float))
+		sha = hashlib.sha1(self.coilHash().encode())
+		sha.update(np.array(x.shape).tobytes())
+		for temp in [x,y,z]: sha.update(np.ascontiguousarray(temp).tobytes())
+		key = sha.hexdigest()
+		if key in self.unit_cache:
+			self.unit_cache.move_to_end(key)
+			return self.unit_cache[key]
+		fname = None
+		if self.cache_dir:
+			fname = os.path.join(self.cache_dir,f'coils_unit_{key}.npy')
+			if os.path.exists(fname):
+				b = np.load(fname)
+				self._unit_cache_add(key,b)
+				return b
+		xc,yc,zc,seg,cur = self.segments(np.ones(self.ngroups))
+		b = np.zeros((3,self.ngroups)+x.shape)
 		for i in range(self.ngroups):
-			for j in range(self.groups[i].ncoils):
-				if extcur:
-					bxt,byt,bzt = self.groups[i].coils[j].bfield(x,y,z,extcur[i])
-				else:
-					bxt,byt,bzt = self.groups[i].coils[j].bfield(x,y,z,self.groups[i].current)
-				bx = bx + bxt
-				by = by + byt
-				bz = bz + bzt
-		return bx,by,bz
+			mask = self.seg_group == i
+			b[:,i] = biot_savart(x,y,z,xc,yc,zc,seg[mask],cur[mask])
+		if fname:
+			os.makedirs(self.cache_dir,exist_ok=True)
+			np.save(fname+'.tmp.npy',b)
+			os.replace(fname+'.tmp.npy',fname)
+		self._unit_cache_add(key,b)
+		return b
+
+	def _unit_cache_add(self,key,b):
+		"""Adds a field to unit_cache and drops the oldest entries"""
+		self.unit_cache[key] = b
+		while len(self.unit_cache) > UNIT_CACHE_SIZE:
+			self.unit_cache.popitem(last=False)
+
+	def coilHash(self):
+		"""Returns a hash of the coil geometry
+
+		The hash covers the packed points, coils, groups and
+		segment current multipliers so it changes with any edit of
+		the coilset which changes the field.
+
+		Returns
+		----------
+		hash : str
+			SHA1 hex digest
+		"""
+		import hashlib
+		import numpy as np
+		if self.seg_index is None: self.pack()
+		sha = hashlib.sha1()
+		for temp in [self.coil_x,self.coil_y,self.coil_z,self.coil_bounds,\
+			self.coil_group,self.seg_scale]:
+			sha.update(np.ascontiguousarray(temp).tobytes())
+		return sha.hexdigest()
+
+	def find_symmetry(self,lstell_sym=True,tol=1.0E-6):
+		"""Checks the field period and stellarator symmetry of a coilset
+
+		This routine maps every coil by rotation by 2*pi/nfp about
+		the Z axis and (with lstell_sym) the stellarator symmetry
+		(x,y,z) -> (x,-y,-z) with reversed current. Each image must
+		match a coil of the same group, point by point within tol
+		[m], with the same current direction. Closed coils may
+		start at a different point and coils may share a centroid
+		(e.g. concentric PF coils). On success sym_stell is set to
+		lstell_sym, which coilbiot_sym uses to map the evaluation
+		points.
+
+		Parameters
+		----------
+		lstell_sym : bool (optional)
+			Include stellarator symmetry (default: True)
+		tol : float (optional)
+			Matching tolerance [m] (default: 1.0E-6)
+		Returns
+		----------
+		lsym : bool
+			True if the coilset has the symmetry
+		"""
+		import numpy as np
+		if self.seg_index is None: self.pack()
+		self.sym_stell = None
+		ncoils = len(self.coil_group)
+		bounds = self.coil_bounds
+		pts = [np.stack((self.coil_x[bounds[i]:bounds[i+1]],self.coil_y[bounds[i]:bounds[i+1]],\
+			self.coil_z[bounds[i]:bounds[i+1]]),axis=1) for i in range(ncoils)]
+		def center(q):
+			# Closed coils repeat the first point
+			if len(q) > 1 and np.max(np.abs(q[0]-q[-1])) < tol: q = q[:-1]
+			return np.mean(q,axis=0)
+		cent = np.array([center(p) for p in pts])
+		def match(q,i):
+			p = pts[i]
+			if len(p) != len(q): return False
+			if np.max(np.abs(q-p)) < tol: return True
+			# Closed coils may start elsewhere
+			if np.max(np.abs(q[0]-q[-1])) > tol: return False
+			m = np.argmin(np.sum((q[:-1]-p[0])**2,axis=1))
+			q = np.roll(q[:-1],-m,axis=0)
+			return np.max(np.abs(q-p[:-1])) < tol
+		ops = [(k,ls) for ls in ([False,True] if lstell_sym else [False]) for k in range(self.nfp)]
+		for i in range(ncoils):
+			for k,ls in ops:
+				q = pts[i]*[1,-1,-1] if ls else pts[i]
+				# Reversed current, same direction along reversed points
+				if ls: q = q[::-1]
+				a = 2*np.pi*k/self.nfp
+				q = np.stack((q[:,0]*np.cos(a)-q[:,1]*np.sin(a),\
+					q[:,0]*np.sin(a)+q[:,1]*np.cos(a),q[:,2]),axis=1)
+				# Every coil of the group with the same centroid is a candidate
+				dc = np.sqrt(np.sum((cent-center(q))**2,axis=1))
+				cand = np.nonzero((dc <= tol) & (self.coil_group == self.coil_group[i]))[0]
+				if not any(match(q,j) for j in cand[np.argsort(dc[cand])]):
+					print(f"  Coil {i} (group {self.coil_group[i]+1}) has no image for k={k}, stellsym={ls}")
+					return False
+		self.sym_stell = lstell_sym
+		return True
+
+	def coilbiot_sym(self,x,y,z,extcur=None,tol=1.0E-9):
+		"""Calculates field at points in space using symmetry
+
+		This routine calculates the magnetic field as coilbiot but
+		maps each point into the first half field period (first
+		field period without stellarator symmetry) found by
+		find_symmetry. Points with the same image within tol [m]
+		are evaluated once and the field is mapped back, so for
+		point sets with the symmetry of the coilset (e.g. grids
+		over the full torus) the work drops by up to 2*nfp.
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		extcur : list (optional)
+			Array of currents in coil groups [A]
+		tol : float (optional)
+			Tolerance for equal point images [m] (default: 1.0E-9)
+		Returns
+		----------
+		bx : real or ndarray
+			Magnetic field in cartesian x direction [T]
+		by : real or ndarray
+			Magnetic field in cartesian y direction [T]
+		bz : real or ndarray
+			Magnetic field in cartesian z direction [T]
+		"""
+		import numpy as np
+		if self.sym_stell is None and not self.find_symmetry() \
+			and not self.find_symmetry(lstell_sym=False):
+			print("  Coilset is not symmetric, using coilbiot")
+			return self.coilbiot(x,y,z,extcur)
+		x, y, z = np.broadcast_arrays(np.asarray(x,dtype=float),\
+			np.asarray(y,dtype=float),np.asarray(z,dtype=float))
+		shape = x.shape
+		x = x.ravel(); y = y.ravel(); z = z.ravel()
+		# Rotate each point into the first field period
+		dp = 2*np.pi/self.nfp
+		k = np.floor(np.mod(np.arctan2(y,x),2*np.pi)/dp)
+		a = k*dp
+		ca = np.cos(a); sa = np.sin(a)
+		x0 = x*ca+y*sa; y0 = y*ca-x*sa; z0 = z.copy()
+		# Reflect the second half period, (R,phi,Z) -> (R,dp-phi,-Z)
+		lref = np.zeros(len(x),dtype=bool)
+		if self.sym_stell:
+			lref = np.mod(np.arctan2(y0,x0),2*np.pi) > 0.5*dp
+			cb = np.cos(dp); sb = np.sin(dp)
+			xr = x0*cb+y0*sb; yr = x0*sb-y0*cb
+			x0 = np.where(lref,xr,x0); y0 = np.where(lref,yr,y0); z0 = np.where(lref,-z0,z0)
+		# Evaluate each distinct image once
+		key = np.round(np.stack((x0,y0,z0),axis=1)/tol)
+		_, iuniq, inv = np.unique(key,axis=0,return_index=True,return_inverse=True)
+		inv = np.ravel(inv)
+		xc,yc,zc,seg,cur = self.segments(extcur)
+		fx,fy,fz = biot_savart(x0[iuniq],y0[iuniq],z0[iuniq],xc,yc,zc,seg,cur)
+		fx = fx[inv]; fy = fy[inv]; fz = fz[inv]
+		if self.sym_stell:
+			# Reflected images carry reversed current, B = -M.B0 with M
+			# the reflection (R,phi,Z) -> (R,dp-phi,-Z)
+			fxr = -(fx*cb+fy*sb); fyr = fy*cb-fx*sb
+			fx = np.where(lref,fxr,fx); fy = np.where(lref,fyr,fy)
+		bx = fx*ca-fy*sa
+		by = fx*sa+fy*ca
+		bz = fz
+		if shape == ():
+			return bx[0], by[0], bz[0]
+		return bx.reshape(shape), by.reshape(shape), bz.reshape(shape)
 
 	def coilvecpot(self,x,y,z,extcur=None):
-		"""Calculates vector potential at point in space
+		"""Calculates vector potential at points in space
 
-		This routine calculates the vector potential at a point in space
-		given the point and external current array.
+		This routine calculates the vector potential at points in space
+		given the points and external current array. The points
+		may be scalars or arrays of any (matching) shape.
 
 		Parameters
 		----------
-		x : real
+		x : real or ndarray
 			Cartesian x value [m].
-		y : real
+		y : real or ndarray
 			Cartesian y value [m].
-		z : real
+		z : real or ndarray
 			Cartesian z value [m].
 		extcur : list
 			Array of currents in coil groups [A]
 		Returns
 		----------
-		ax : real
+		ax : real or ndarray
 			Vector potential in cartesian x direction []
-		ay : real
+		ay : real or ndarray
 			Vector potential in cartesian y direction []
-		az : real
+		az : real or ndarray
 			Vector potential in cartesian z direction []
 		"""
+		xc,yc,zc,seg,cur = self.segments(extcur)
+		return biot_savart(x,y,z,xc,yc,zc,seg,cur,lvecpot=True)
+
+	def coilbiot_grad(self,x,y,z,extcur=None):
+		"""Calculates field and field gradient at points in space
+
+		This routine calculates the magnetic field and the
+		gradient tensor dB_i/dx_j at points in space given the
+		points and external current array (see biot_savart_grad).
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		extcur : list
+			Array of currents in coil groups [A]
+		Returns
+		----------
+		bx : real or ndarray
+			Magnetic field in cartesian x direction [T]
+		by : real or ndarray
+			Magnetic field in cartesian y direction [T]
+		bz : real or ndarray
+			Magnetic field in cartesian z direction [T]
+		gradb : ndarray
+			Field gradient dB_i/dx_j, shape (3,3)+shape of x [T/m]
+		"""
+		xc,yc,zc,seg,cur = self.segments(extcur)
+		return biot_savart_grad(x,y,z,xc,yc,zc,seg,cur)
+
+	def segments(self,extcur=None):
+		"""Returns the filament segments of all coils
+
+		This routine returns the packed coil points along with the
+		index of the first point of each segment and the segment
+		currents.
+
+		Parameters
+		----------
+		extcur : list (optional)
+			Array of currents in coil groups [A]
+		Returns
+		----------
+		xc : ndarray
+			Cartesian x of all coil points [m]
+		yc : ndarray
+			Cartesian y of all coil points [m]
+		zc : ndarray
+			Cartesian z of all coil points [m]
+		seg : ndarray
+			Index of first point of each segment
+		cur : ndarray
+			Current in each segment [A]
+		"""
 		import numpy as np
-		ax = 0; ay = 0; az = 0
-		for i in range(self.ngroups):
-			for j in range(self.groups[i].ncoils):
-				if extcur:
-					axt,ayt,azt = self.groups[i].coils[j].vecpot(x,y,z,extcur[i])
-				else:
-					axt,ayt,azt = self.groups[i].coils[j].vecpot(x,y,z,self.groups[i].current)
-				ax = ax + axt
-				ay = ay + ayt
-				az = az + azt
-		return ax,ay,az
+		if self.seg_index is None: self.pack()
+		if extcur is None:
+			extcur = [self.groups[i].current for i in range(self.ngroups)]
+		cur = np.asarray(extcur,dtype=float)[self.seg_group]*self.seg_scale
+		return self.coil_x,self.coil_y,self.coil_z,self.seg_index,cur
+
+	def coilLength(self):
+		"""Calculates the length of each coil
+
+		Returns
+		----------
+		length : ndarray
+			Length of each coil in packed order [m]
+		"""
+		import numpy as np
+		if self.seg_index is None: self.pack()
+		seg = self.seg_index
+		dx = self.coil_x[seg+1]-self.coil_x[seg]
+		dy = self.coil_y[seg+1]-self.coil_y[seg]
+		dz = self.coil_z[seg+1]-self.coil_z[seg]
+		dl = np.sqrt(dx*dx+dy*dy+dz*dz)
+		# First segment of each coil
+		seg_bounds = self.coil_bounds[:-1]-np.arange(len(self.coil_group))
+		return np.add.reduceat(dl,seg_bounds)
 
 	def coiloffset(self,dist=0.0):
 		"""Calculates offset from coils
@@ -388,7 +790,10 @@ class COILSET(LIBSTELL):
 
 		This routine calculates the distance between a coil and a 
 		surface defined by points in cartesian coordiantes (x,y,z).
-		Values are stored in the coil atribute dist_coil.
+		Values are stored in the coil atribute dist_coil. The
+		index of the nearest surface point is stored in surf_index.
+		A KD-tree of the surface points is built once and reused
+		while the surface does not change.
 
 		Parameters
 		----------
@@ -398,10 +803,24 @@ class COILSET(LIBSTELL):
 			Y points defining surface [m]
 		zs : ndarray
 			Z points defining surface [m]
+		Returns
+		----------
+		dist : ndarray
+			Distance of each coil point to the surface (packed order) [m]
+		index : ndarray
+			Index of the nearest surface point (packed order)
 		"""
+		import numpy as np
+		if self.seg_index is None: self.pack()
+		tree = surface_tree(xs,ys,zs)
+		dist, index = tree.query(np.stack((self.coil_x,self.coil_y,self.coil_z),axis=1))
+		k = 0
 		for i in range(self.ngroups):
-			for j in range(self.groups[i].ncoils):
-				self.groups[i].coils[j].surfDist(xs,ys,zs)
+			for coil in self.groups[i].coils:
+				coil.dist_surf = dist[self.coil_bounds[k]:self.coil_bounds[k+1]]
+				coil.surf_index = index[self.coil_bounds[k]:self.coil_bounds[k+1]]
+				k = k + 1
+		return dist, index
 
 	def blenderCoil(self,dist=0.2):
 		"""Generates the lists Blender needs to render a coilset
@@ -465,8 +884,9 @@ class COILGROUP():
 	def __init__(self, x, y, z, current,name):
 		self.name = name
 		self.current = current[0]
+		import numpy as np
 		self.coils = []
-		idex = [index for index, value in enumerate(current) if value == 0]
+		idex = np.nonzero(np.asarray(current) == 0)[0]
 		self.ncoils = len(idex)
 		i = 0
 		for j in idex:
@@ -499,6 +919,7 @@ class COIL():
 		self.yt = None
 		self.zt = None
 		self.dist_surf = None
+		self.surf_index = None
 
 	def vecpot(self,x,y,z,current):
 		"""Calculates Vector potential
@@ -508,36 +929,27 @@ class COIL():
 
 		Parameters
 		----------
-		x : real
+		x : real or ndarray
 			Cartesian x value [m].
-		y : real
+		y : real or ndarray
 			Cartesian y value [m].
-		z : real
+		z : real or ndarray
 			Cartesian z value [m].
 		current : real
 			Current in coil [A]
 		Returns
 		----------
-		ax : real
+		ax : real or ndarray
 			Vector potential in cartesian x direction [A/m]
-		ay : real
+		ay : real or ndarray
 			Vector potential in cartesian y direction [A/m]
-		az : real
+		az : real or ndarray
 			Vector potential in cartesian z direction [A/m]
 		"""
 		import numpy as np
-		x1 = x - self.x
-		y1 = y - self.y
-		z1 = z - self.z
-		rw = np.sqrt(x1*x1+y1*y1+z1*z1)
-		fa = ( rw[1:] + rw[0:-1] ) / \
-			 ( rw[1:] * rw[0:-1]   * \
-			 ( rw[1:] * rw[0:-1] + x1[1:] * x1[0:-1] + \
-			   y1[1:] * y1[0:-1] + z1[1:] * z1[0:-1] ) )
-		ax = sum( fa * self.dx ) * current
-		ay = sum( fa * self.dy ) * current
-		az = sum( fa * self.dz ) * current
-		return ax, ay, az
+		seg = np.arange(self.npts-1)
+		cur = np.full(self.npts-1,current,dtype=float)
+		return biot_savart(x,y,z,self.x,self.y,self.z,seg,cur,lvecpot=True)
 
 	def bfield(self,x,y,z,current):
 		"""Calculates magnetic field
@@ -547,40 +959,60 @@ class COIL():
 
 		Parameters
 		----------
-		x : real
+		x : real or ndarray
 			Cartesian x value [m].
-		y : real
+		y : real or ndarray
 			Cartesian y value [m].
-		z : real
+		z : real or ndarray
 			Cartesian z value [m].
 		current : real
 			Current in coil [A]
 		Returns
 		----------
-		bx : real
+		bx : real or ndarray
 			Magnetic field in cartesian x direction [T]
-		by : real
+		by : real or ndarray
 			Magnetic field in cartesian y direction [T]
-		bz : real
+		bz : real or ndarray
 			Magnetic field in cartesian z direction [T]
 		"""
 		import numpy as np
-		fac = 1.0E-7
-		x1 = x - self.x
-		y1 = y - self.y
-		z1 = z - self.z
-		rw = np.sqrt(x1*x1+y1*y1+z1*z1)
-		fa = ( rw[1:] + rw[0:-1] ) / \
-			 ( rw[1:] * rw[0:-1]   * \
-			 ( rw[1:] * rw[0:-1] + x1[1:] * x1[0:-1] + \
-			   y1[1:] * y1[0:-1] + z1[1:] * z1[0:-1] ) )
-		ax = sum(fa*self.dx)*current
-		ay = sum(fa*self.dy)*current
-		az = sum(fa*self.dz)*current
-		bx = sum( fa * self.vx * current ) - y * az + z * ay
-		by = sum( fa * self.vy * current ) - z * ax + x * az
-		bz = sum( fa * self.vz * current ) - x * ay + y * ax
-		return fac*bx, fac*by, fac*bz
+		seg = np.arange(self.npts-1)
+		cur = np.full(self.npts-1,current,dtype=float)
+		return biot_savart(x,y,z,self.x,self.y,self.z,seg,cur)
+
+	def bfield_grad(self,x,y,z,current):
+		"""Calculates magnetic field and its gradient
+
+		This routine calculates the magnetic field and the field
+		gradient tensor for a given coil a position in space and a
+		current in said coil (see biot_savart_grad).
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		current : real
+			Current in coil [A]
+		Returns
+		----------
+		bx : real or ndarray
+			Magnetic field in cartesian x direction [T]
+		by : real or ndarray
+			Magnetic field in cartesian y direction [T]
+		bz : real or ndarray
+			Magnetic field in cartesian z direction [T]
+		gradb : ndarray
+			Field gradient dB_i/dx_j, shape (3,3)+shape of x [T/m]
+		"""
+		import numpy as np
+		seg = np.arange(self.npts-1)
+		cur = np.full(self.npts-1,current,dtype=float)
+		return biot_savart_grad(x,y,z,self.x,self.y,self.z,seg,cur)
 
 	def geomCenter(self):
 		"""Calculates geometric center of the coil
@@ -606,6 +1038,8 @@ class COIL():
 
 		This routine calculates the distance between a coil and a 
 		surface defined by points in cartesian coordiantes (x,y,z).
+		The index of the nearest surface point is stored in
+		surf_index.
 
 		Parameters
 		----------
@@ -617,18 +1051,8 @@ class COIL():
 			Z points defining surface [m]
 		"""
 		import numpy as np
-		nsurf = len(xs)
-		xc = np.broadcast_to(self.x,(nsurf,self.npts)).T
-		yc = np.broadcast_to(self.y,(nsurf,self.npts)).T
-		zc = np.broadcast_to(self.z,(nsurf,self.npts)).T
-		x  = np.broadcast_to(xs,(self.npts,nsurf))
-		y  = np.broadcast_to(ys,(self.npts,nsurf))
-		z  = np.broadcast_to(zs,(self.npts,nsurf))
-		dx = xc - x
-		dy = yc - y
-		dz = zc - z
-		dl2 = dx*dx + dy * dy + dz * dz
-		self.dist_surf = np.sqrt(np.min(dl2,axis=1))
+		tree = surface_tree(xs,ys,zs)
+		self.dist_surf, self.surf_index = tree.query(np.stack((self.x,self.y,self.z),axis=1))
 		return
 
 	def spline_tangent(self, order=3, der=1):
@@ -790,6 +1214,566 @@ class COIL():
 		zz = np.array([z1, z2, z3, z4, z1])
 		return xx, yy, zz
 
+def _parse_coils_file(filename):
+	"""Parses a coils file
+
+	The numeric columns of all points are read with a single
+	np.loadtxt call, only the lines closing a coil (zero current)
+	are split in Python to find the group number and name.
+
+	Returns
+	----------
+	data : dict
+		nfp, coords (3,npts), current, group number of each point
+		(0 if not in a group) and the names of the groups.
+	"""
+	import numpy as np
+	f = open(filename,'r')
+	lines = f.read().splitlines()
+	f.close()
+	if  'periods' in lines[0]:
+		nfp = int(lines[0][8:])
+	else:
+		print("Bad Synatx line 1 in coils file")
+		nfp = 1
+	if 'begin filament' not in lines[1]:
+		print("Bad Synatx line 2 in coils file")
+	if 'mirror' not in lines[2]:
+		print("Bad Synatx line 3 in coils file")
+	lines = list(filter(str.strip,lines[3:]))
+	if lines and lines[-1].split()[0] == 'end': lines = lines[:-1]
+	if not lines:
+		print("No points in coils file")
+		return None
+	values = np.loadtxt(lines,usecols=(0,1,2,3),ndmin=2)
+	coords = values[:,0:3].T.copy()
+	current = values[:,3].copy()
+	# Lines with group number and name close a group
+	itag = []; gtag = []; names = {}
+	for i in np.nonzero(current == 0)[0]:
+		line = lines[i].split()
+		if len(line) == 6:
+			itag.append(i); gtag.append(int(line[4]))
+			if gtag[-1] not in names: names[gtag[-1]] = line[5]
+	group = np.zeros(len(current),dtype=int)
+	if itag:
+		# Points up to and including a tag line belong to its group
+		k = np.searchsorted(itag,np.arange(len(current)),side='left')
+		lin = k < len(itag)
+		group[lin] = np.array(gtag)[k[lin]]
+	names = [names.get(i+1,'') for i in range(max(gtag,default=0))]
+	return {'nfp':nfp,'coords':coords,'current':current,'group':group,'names':np.array(names)}
+
+def surface_tree(xs,ys,zs):
+	"""Returns a KD-tree of surface points
+
+	The last tree is kept so repeated distance queries against
+	the same surface do not rebuild it.
+
+	Parameters
+	----------
+	xs : ndarray
+		X points defining surface [m]
+	ys : ndarray
+		Y points defining surface [m]
+	zs : ndarray
+		Z points defining surface [m]
+	Returns
+	----------
+	tree : cKDTree
+		KD-tree of the surface points
+	"""
+	import hashlib
+	import numpy as np
+	from scipy.spatial import cKDTree
+	global _SURFACE_TREE
+	pts = np.stack((np.ravel(xs),np.ravel(ys),np.ravel(zs)),axis=1).astype(float)
+	key = hashlib.sha1(pts.tobytes()).hexdigest()
+	if _SURFACE_TREE is None or _SURFACE_TREE[0] != key:
+		_SURFACE_TREE = (key,cKDTree(pts))
+	return _SURFACE_TREE[1]
+
+class COILTREE():
+	"""Octree of coil segments for approximate Biot-Savart sums
+
+	The segments are sorted into an octree, each node holds the
+	current moments N_a = sum I*int(dl*(-d)**a) of its segments
+	about the node center (d the position on the segment relative
+	to the center) for all multi-indices |a| <= order. With
+	T_b(R) = d**b(1/R)/b! the vector potential of a node is
+	1E-7*sum T_a(R)*N_a, the field 1E-7*sum grad(T_a) x N_a is
+	stored as a matrix acting on the T_b (|b| <= order+1), which
+	follow from the recurrence
+	|b|*R**2*T_b = -(2|b|-1)*sum R_i*T_(b-e_i) - (|b|-1)*sum T_(b-2e_i).
+
+	Evaluation points which are well separated from a node
+	(radius/distance < theta) use its expansion, all others
+	descend to the children. Nodes whose expansion costs more
+	than the direct sum over their segments (see ncost) and the
+	leaves are summed directly with biot_savart, so the tree
+	falls back to the exact sum where it cannot save work.
+
+	For a node of radius a (largest distance of a segment end from
+	the center) at distance R, theta_k = a/R, the truncation error of
+	an expansion of order p is bounded by
+
+		|dB| <= 1E-7 * Q * (p+2) * theta_k**(p+1) / ((1-theta_k)**2 * R**2)
+
+	where Q is the sum of |I|*|dl| over the segments of the node.
+	The bound is absolute, where the fields of the coils largely
+	cancel the relative error is correspondingly larger. For the
+	NCSX coils (see coiltree_bench.py) the largest relative error
+	of |B| on 1E5 points is below 1E-3 for the defaults
+	(order=8, theta=0.4) both outside the coils and in the plasma
+	region.
+	"""
+	def __init__(self,xc,yc,zc,seg,cur,leaf_size=64,order=8):
+		"""Builds the octree
+
+		Parameters
+		----------
+		xc : ndarray
+			Cartesian x of filament points [m].
+		yc : ndarray
+			Cartesian y of filament points [m].
+		zc : ndarray
+			Cartesian z of filament points [m].
+		seg : ndarray
+			Index of the first point of each segment.
+		cur : ndarray
+			Current in each segment [A].
+		leaf_size : int (optional)
+			Maximum number of segments in a leaf (default: 64)
+		order : int (optional)
+			Expansion order of the moments (default: 8)
+		"""
+		import numpy as np
+		self.xc = np.asarray(xc,dtype=float)
+		self.yc = np.asarray(yc,dtype=float)
+		self.zc = np.asarray(zc,dtype=float)
+		seg = np.asarray(seg)
+		cur = np.asarray(cur,dtype=float)
+		p1 = np.stack((self.xc[seg],self.yc[seg],self.zc[seg]),axis=1)
+		p2 = np.stack((self.xc[seg+1],self.yc[seg+1],self.zc[seg+1]),axis=1)
+		mid = 0.5*(p1+p2)
+		perm = np.arange(len(seg))
+		lo = []; hi = []; children = []; parents = []
+		center = []; radius = []
+		# Depth first build, segments of a node are perm[lo:hi]
+		stack = [(0,len(seg),-1)]
+		while stack:
+			i0,i1,parent = stack.pop()
+			k = len(lo)
+			if parent >= 0: children[parent].append(k)
+			idx = perm[i0:i1]
+			pmin = np.minimum(p1[idx].min(axis=0),p2[idx].min(axis=0))
+			pmax = np.maximum(p1[idx].max(axis=0),p2[idx].max(axis=0))
+			c = 0.5*(pmin+pmax)
+			a = np.sqrt(max(np.max(np.sum((p1[idx]-c)**2,axis=1)),np.max(np.sum((p2[idx]-c)**2,axis=1))))
+			lo.append(i0); hi.append(i1); children.append([]); parents.append(parent)
+			center.append(c); radius.append(a)
+			if i1-i0 <= leaf_size or a == 0.0: continue
+			# Split by octant of the segment midpoints
+			d = mid[idx]-c
+			oct = (d[:,0]>0)*1+(d[:,1]>0)*2+(d[:,2]>0)*4
+			isort = np.argsort(oct,kind='stable')
+			perm[i0:i1] = idx[isort]
+			bounds = np.searchsorted(oct[isort],np.arange(9))
+			if np.count_nonzero(np.diff(bounds)) < 2: continue
+			for j in range(8):
+				if bounds[j+1] > bounds[j]:
+					stack.append((i0+bounds[j],i0+bounds[j+1],k))
+		self.seg = seg[perm]
+		self.cur = cur[perm]
+		self.lo = np.array(lo); self.hi = np.array(hi)
+		self.children = children; self.parent = np.array(parents)
+		self.center = np.array(center); self.radius = np.array(radius)
+		self.order = order
+		self._set_indices()
+		self._set_moments()
+		self._cmat = {}
+
+	def _set_indices(self):
+		"""Multi-indices b (|b| <= order+1) and their neighbours
+
+		beta[i] are the multi-indices in order of degree, deg their
+		degree and start the first index of each degree. prev1 and
+		prev2 hold the index of b-e_j and b-2e_j (nT if negative)
+		and next1 that of b+e_j for the moments (|b| <= order).
+		"""
+		import numpy as np
+		nmax = self.order+1
+		beta = [(i,j,n-i-j) for n in range(nmax+1) for i in range(n,-1,-1) for j in range(n-i,-1,-1)]
+		self.beta = np.array(beta)
+		self.deg = np.sum(self.beta,axis=1)
+		self.start = np.searchsorted(self.deg,np.arange(nmax+2))
+		index = {b:i for i,b in enumerate(beta)}
+		nT = len(beta)
+		self.prev1 = np.full((3,nT),nT); self.prev2 = np.full((3,nT),nT)
+		self.next1 = np.full((3,nT),nT)
+		for i,b in enumerate(beta):
+			for j in range(3):
+				e = np.eye(3,dtype=int)[j]
+				self.prev1[j,i] = index.get(tuple(np.array(b)-e),nT)
+				self.prev2[j,i] = index.get(tuple(np.array(b)-2*e),nT)
+				self.next1[j,i] = index.get(tuple(np.array(b)+e),nT)
+
+	def _set_moments(self):
+		"""Current moments N_a (|a| <= order) of every node
+
+		The moments of the leaves are line integrals over their
+		segments, using Gauss-Legendre quadrature which is exact
+		for the polynomials. The moments of the other nodes are
+		those of their children shifted to the node center,
+		(-d_p)**a = sum binom(a,g)*(-d_c)**g*(c_p-c_c)**(a-g),
+		level by level from the leaves.
+		"""
+		import numpy as np
+		nN = self.start[self.order+1]
+		na = self.beta[:nN]
+		nnode = len(self.lo)
+		self.moments = np.zeros((nnode,nN,3))
+		# Leaves
+		t, w = np.polynomial.legendre.leggauss(self.order//2+1)
+		t = 0.5*(t+1); w = 0.5*w
+		xs = self.xc[self.seg]; ys = self.yc[self.seg]; zs = self.zc[self.seg]
+		dl = np.stack((self.xc[self.seg+1]-xs,self.yc[self.seg+1]-ys,self.zc[self.seg+1]-zs),axis=1)
+		jl = self.cur[:,None]*dl
+		p0 = np.stack((xs,ys,zs),axis=1)
+		nblock = max(1,int(COIL_BLOCK_BYTES//(8*len(t)*(nN+3*(self.order+1)))))
+		leaves = np.array([k for k in range(nnode) if not self.children[k]])
+		# Leaf of each segment
+		owner = np.zeros(len(self.seg),dtype=int)
+		for k in leaves: owner[self.lo[k]:self.hi[k]] = k
+		for i0 in range(0,len(self.seg),nblock):
+			sl = slice(i0,min(i0+nblock,len(self.seg)))
+			# Quadrature points relative to the center, -d
+			d = self.center[owner[sl]].T[:,:,None]-(p0[sl].T[:,:,None]+dl[sl].T[:,:,None]*t)
+			pw = d[:,None]**np.arange(self.order+1)[None,:,None,None]
+			mono = (pw[0,na[:,0]]*pw[1,na[:,1]]*pw[2,na[:,2]]) @ w
+			mono = mono.T[:,:,None]*jl[sl,None,:]
+			# Segments of a leaf are contiguous
+			i1 = np.nonzero(np.diff(owner[sl],prepend=-1))[0]
+			np.add.at(self.moments,owner[sl][i1],np.add.reduceat(mono,i1,axis=0))
+		# Shift of the children, combinations g <= a
+		ia, ig = np.nonzero(np.all(na[None,:,:] <= na[:,None,:],axis=2))
+		index = np.zeros((self.order+1,)*3,dtype=int)
+		index[na[:,0],na[:,1],na[:,2]] = np.arange(nN)
+		idel = index[tuple((na[ia]-na[ig]).T)]
+		ia0 = np.searchsorted(ia,np.arange(nN))
+		from math import comb
+		binom = np.array([[comb(n,m) for m in range(self.order+1)] for n in range(self.order+1)])
+		coef = np.prod(binom[na[ia],na[ig]],axis=1)
+		depth = np.zeros(nnode,dtype=int)
+		for k in range(1,nnode): depth[k] = depth[self.parent[k]]+1
+		for level in range(np.max(depth),0,-1):
+			kc = np.nonzero(depth == level)[0]
+			kp = self.parent[kc]
+			u = self.center[kp]-self.center[kc]
+			pw = u[...,None]**np.arange(self.order+1)
+			ud = pw[:,0,na[:,0]]*pw[:,1,na[:,1]]*pw[:,2,na[:,2]]
+			shifted = (coef*ud[:,idel])[:,:,None]*self.moments[kc][:,ig,:]
+			np.add.at(self.moments,kp,np.add.reduceat(shifted,ia0,axis=1))
+
+	def _field_matrix(self,order):
+		"""Matrices C (nnode,nT,3) with B = 1E-7*T @ C for an order"""
+		import numpy as np
+		if order in self._cmat: return self._cmat[order]
+		nN = self.start[order+1]
+		nT = len(self.beta)
+		eps = np.zeros((3,3,3))
+		eps[0,1,2] = eps[1,2,0] = eps[2,0,1] = 1.0
+		eps[0,2,1] = eps[2,1,0] = eps[1,0,2] = -1.0
+		C = np.zeros((len(self.lo),nT+1,3))
+		for j in range(3):
+			# d/dx_j T_a = (a_j+1)*T_(a+e_j)
+			fac = (self.beta[:nN,j]+1.0)[None,:,None]
+			np.add.at(C,(slice(None),self.next1[j,:nN]),\
+				fac*np.einsum('ik,nak->nai',eps[:,j,:],self.moments[:,:nN]))
+		C = C[:,:self.start[order+2]]
+		self._cmat[order] = C
+		return C
+
+	def _taylor(self,rv,order):
+		"""T_b = d**b(1/R)/b! (|b| <= order+1) at rv, shape (nT,npts)"""
+		import numpy as np
+		n = self.start[order+2]
+		r2 = np.sum(rv*rv,axis=1)
+		T = np.empty((len(self.beta)+1,len(r2)))
+		T[-1] = 0.0
+		T[0] = 1.0/np.sqrt(r2)
+		for m in range(1,order+2):
+			sl = slice(self.start[m],self.start[m+1])
+			s = (2*m-1)*(rv[:,0]*T[self.prev1[0,sl]]+rv[:,1]*T[self.prev1[1,sl]]\
+				+rv[:,2]*T[self.prev1[2,sl]])
+			if m > 1:
+				s += (m-1)*(T[self.prev2[0,sl]]+T[self.prev2[1,sl]]+T[self.prev2[2,sl]])
+			T[sl] = -s/(m*r2)
+		return T[:n]
+
+	def bfield(self,x,y,z,theta=0.4,order=None,ncost=0.5):
+		"""Calculates the approximate field at points in space
+
+		Parameters
+		----------
+		x : real or ndarray
+			Cartesian x value [m].
+		y : real or ndarray
+			Cartesian y value [m].
+		z : real or ndarray
+			Cartesian z value [m].
+		theta : float (optional)
+			Opening angle, nodes with radius/distance < theta use
+			the multipole expansion (default: 0.4, 0 is exact)
+		order : int (optional)
+			Expansion order up to the order of the tree
+			(default: order of the tree)
+		ncost : float (optional)
+			Cost of one T_b term in segments of the direct sum, an
+			expansion is only used if it is cheaper than the direct
+			sum over the segments of the node (default: 0.5)
+		Returns
+		----------
+		bx : real or ndarray
+			Magnetic field in cartesian x direction [T]
+		by : real or ndarray
+			Magnetic field in cartesian y direction [T]
+		bz : real or ndarray
+			Magnetic field in cartesian z direction [T]
+		"""
+		import numpy as np
+		if order is None: order = self.order
+		order = min(order,self.order)
+		C = self._field_matrix(order)
+		nseg = self.hi-self.lo
+		x, y, z = np.broadcast_arrays(np.asarray(x,dtype=float),\
+			np.asarray(y,dtype=float),np.asarray(z,dtype=float))
+		shape = x.shape
+		p = np.stack((x.ravel(),y.ravel(),z.ravel()),axis=1)
+		# Points sorted along a Morton curve keep the subsets local
+		q = np.floor((p-np.min(p,axis=0))/max(np.ptp(p),1.0E-300)*1023.999).astype(np.int64)
+		key = np.zeros(len(p),dtype=np.int64)
+		for bit in range(10):
+			for j in range(3):
+				key |= ((q[:,j]>>bit)&1) << (3*bit+j)
+		iorder = np.argsort(key,kind='stable')
+		p = p[iorder]
+		b = np.zeros(p.shape)
+		nblock = max(1,int(TREE_BLOCK_BYTES//(8*C.shape[1])))
+		stack = [(0,np.arange(len(p)))]
+		while stack:
+			k,idx = stack.pop()
+			# Nodes too small for any expansion to pay are summed directly
+			if ncost*self.start[2] < nseg[k]:
+				rv = p[idx]-self.center[k]
+				r = np.sqrt(np.sum(rv*rv,axis=1))
+				# Lowest order with theta_k**(p_k+1) <= theta**(order+1)
+				with np.errstate(divide='ignore',invalid='ignore'):
+					pk = np.ceil((order+1)*np.log(theta)/np.log(self.radius[k]/r))-1
+				pk = np.clip(np.nan_to_num(pk,nan=0.0),0,order).astype(int)
+				lfar = (self.radius[k] < theta*r) & (ncost*self.start[pk+2] < nseg[k])
+				if np.any(lfar):
+					rv = rv[lfar]; ifar = idx[lfar]; pk = pk[lfar]
+					isort = np.argsort(pk,kind='stable')
+					bounds = np.searchsorted(pk[isort],np.arange(order+2))
+					for m in range(order+1):
+						jm = isort[bounds[m]:bounds[m+1]]
+						nT = self.start[m+2]
+						for i in range(0,len(jm),nblock):
+							sl = jm[i:i+nblock]
+							b[ifar[sl]] += 1.0E-7*(self._taylor(rv[sl],m).T @ C[k,:nT])
+					idx = idx[~lfar]
+					if len(idx) == 0: continue
+				if self.children[k]:
+					for j in self.children[k]:
+						stack.append((j,idx))
+					continue
+			sl = slice(self.lo[k],self.hi[k])
+			b[idx] += np.stack(biot_savart(p[idx,0],p[idx,1],p[idx,2],\
+				self.xc,self.yc,self.zc,self.seg[sl],self.cur[sl]),axis=1)
+		b[iorder] = b.copy()
+		if shape == ():
+			return b[0,0], b[0,1], b[0,2]
+		return b[:,0].reshape(shape), b[:,1].reshape(shape), b[:,2].reshape(shape)
+
+def biot_savart(x,y,z,xc,yc,zc,seg,cur,lvecpot=False):
+	"""Biot-Savart law for straight filament segments
+
+	This routine evaluates the field (or vector potential) of
+	straight segments running from point seg to point seg+1
+	of the filament points (xc,yc,zc) using the formulation of
+	Hanson and Hirshman. Evaluation points are processed in
+	blocks of at most COIL_BLOCK_BYTES scratch memory, each block
+	is a single matrix product over all segments.
+
+	Parameters
+	----------
+	x : real or ndarray
+		Cartesian x of evaluation points [m].
+	y : real or ndarray
+		Cartesian y of evaluation points [m].
+	z : real or ndarray
+		Cartesian z of evaluation points [m].
+	xc : ndarray
+		Cartesian x of filament points [m].
+	yc : ndarray
+		Cartesian y of filament points [m].
+	zc : ndarray
+		Cartesian z of filament points [m].
+	seg : ndarray
+		Index of the first point of each segment.
+	cur : ndarray
+		Current in each segment [A].
+	lvecpot : bool (optional)
+		Return the vector potential instead of B (default: False)
+	Returns
+	----------
+	fx : real or ndarray
+		Bx [T] (or Ax) with the shape of the evaluation points
+	fy : real or ndarray
+		By [T] (or Ay) with the shape of the evaluation points
+	fz : real or ndarray
+		Bz [T] (or Az) with the shape of the evaluation points
+	"""
+	import numpy as np
+	x, y, z = np.broadcast_arrays(np.asarray(x,dtype=float),\
+		np.asarray(y,dtype=float),np.asarray(z,dtype=float))
+	shape = x.shape
+	x = x.ravel(); y = y.ravel(); z = z.ravel()
+	seg = np.asarray(seg)
+	cur = np.asarray(cur,dtype=float)
+	# Only points belonging to a segment are needed, segments are
+	# then pairs (i0,i0+1) of neighbouring points in this list
+	pts = np.unique(np.concatenate((seg,seg+1)))
+	i0 = np.searchsorted(pts,seg)
+	lgather = len(seg) != len(pts)-1
+	xp = xc[pts]; yp = yc[pts]; zp = zc[pts]
+	dx = xc[seg+1]-xc[seg]
+	dy = yc[seg+1]-yc[seg]
+	dz = zc[seg+1]-zc[seg]
+	# Weights for a single matrix product [dx,dy,dz,vx,vy,vz]*I
+	w = np.empty((len(seg),6))
+	w[:,0] = dx*cur
+	w[:,1] = dy*cur
+	w[:,2] = dz*cur
+	w[:,3] = (yc[seg]*dz - zc[seg]*dy)*cur
+	w[:,4] = (zc[seg]*dx - xc[seg]*dz)*cur
+	w[:,5] = (xc[seg]*dy - yc[seg]*dx)*cur
+	npts = len(x)
+	out = np.empty((npts,6))
+	nblock = max(1,int(COIL_BLOCK_BYTES//(8*(8*len(pts)+len(seg)))))
+	for k in range(0,npts,nblock):
+		sl = slice(k,min(k+nblock,npts))
+		x1 = x[sl,None] - xp
+		y1 = y[sl,None] - yp
+		z1 = z[sl,None] - zp
+		rw = np.sqrt(x1*x1+y1*y1+z1*z1)
+		rr = rw[:,1:] * rw[:,:-1]
+		dot = x1[:,1:] * x1[:,:-1]
+		dot += y1[:,1:] * y1[:,:-1]
+		dot += z1[:,1:] * z1[:,:-1]
+		dot += rr
+		dot *= rr
+		fa = rw[:,1:] + rw[:,:-1]
+		with np.errstate(divide='ignore',invalid='ignore'):
+			fa /= dot
+		if lgather: fa = fa[:,i0]
+		out[sl] = fa @ w
+	ax = out[:,0]; ay = out[:,1]; az = out[:,2]
+	if lvecpot:
+		fx, fy, fz = ax, ay, az
+	else:
+		fac = 1.0E-7
+		fx = fac*(out[:,3] - y * az + z * ay)
+		fy = fac*(out[:,4] - z * ax + x * az)
+		fz = fac*(out[:,5] - x * ay + y * ax)
+	if shape == ():
+		return fx[0], fy[0], fz[0]
+	return fx.reshape(shape), fy.reshape(shape), fz.reshape(shape)
+
+def biot_savart_grad(x,y,z,xc,yc,zc,seg,cur):
+	"""Biot-Savart field and field gradient of straight segments
+
+	This routine evaluates the field of straight segments (see
+	biot_savart) together with its analytic gradient. With
+	r1, r2 the vectors from the segment ends to the point and
+	fa = (R1+R2)/(R1*R2*(R1*R2+r1.r2)) the segment field is
+	B = 1E-7*I*fa*(dl x r1) so that
+	dB_i/dx_j = 1E-7*I*((dl x r1)_i*dfa/dx_j + fa*eps_ikj*dl_k)
+	with grad(fa) = (g1+g2)*r1 - g2*dl and
+	g1 = fa*(1/(R1*(R1+R2)) - 1/R1**2 - (R2/R1+1)/D),
+	g2 = fa*(1/(R2*(R1+R2)) - 1/R2**2 - (R1/R2+1)/D),
+	D = R1*R2+r1.r2. The distances and fa are shared by B and
+	its gradient.
+
+	Parameters
+	----------
+	x : real or ndarray
+		Cartesian x of evaluation points [m].
+	y : real or ndarray
+		Cartesian y of evaluation points [m].
+	z : real or ndarray
+		Cartesian z of evaluation points [m].
+	xc : ndarray
+		Cartesian x of filament points [m].
+	yc : ndarray
+		Cartesian y of filament points [m].
+	zc : ndarray
+		Cartesian z of filament points [m].
+	seg : ndarray
+		Index of the first point of each segment.
+	cur : ndarray
+		Current in each segment [A].
+	Returns
+	----------
+	bx : real or ndarray
+		Bx [T] with the shape of the evaluation points
+	by : real or ndarray
+		By [T] with the shape of the evaluation points
+	bz : real or ndarray
+		Bz [T] with the shape of the evaluation points
+	gradb : ndarray
+		dB_i/dx_j [T/m] with shape (3,3)+shape of the points
+	"""
+	import numpy as np
+	x, y, z = np.broadcast_arrays(np.asarray(x,dtype=float),\
+		np.asarray(y,dtype=float),np.asarray(z,dtype=float))
+	shape = x.shape
+	x = x.ravel(); y = y.ravel(); z = z.ravel()
+	seg = np.asarray(seg)
+	cur = 1.0E-7*np.asarray(cur,dtype=float)
+	dl = np.stack((xc[seg+1]-xc[seg],yc[seg+1]-yc[seg],zc[seg+1]-zc[seg]))
+	npts = len(x)
+	b = np.empty((3,npts))
+	gradb = np.empty((3,3,npts))
+	nblock = max(1,int(COIL_BLOCK_BYTES//(8*24*len(seg))))
+	for k in range(0,npts,nblock):
+		sl = slice(k,min(k+nblock,npts))
+		r1 = np.stack((x[sl,None]-xc[seg],y[sl,None]-yc[seg],z[sl,None]-zc[seg]))
+		r2 = r1-dl[:,None,:]
+		R1 = np.sqrt(np.sum(r1*r1,axis=0))
+		R2 = np.sqrt(np.sum(r2*r2,axis=0))
+		D = R1*R2+np.sum(r1*r2,axis=0)
+		with np.errstate(divide='ignore',invalid='ignore'):
+			fa = (R1+R2)/(R1*R2*D)
+			g1 = fa*(1.0/(R1*(R1+R2))-1.0/(R1*R1)-(R2/R1+1.0)/D)
+			g2 = fa*(1.0/(R2*(R1+R2))-1.0/(R2*R2)-(R1/R2+1.0)/D)
+		# I*(dl x r1)
+		c = np.cross(dl[:,None,:],r1,axis=0)*cur
+		h = c*(g1+g2)
+		c2 = c*g2
+		b[:,sl] = np.sum(c*fa,axis=2)
+		for i in range(3):
+			gradb[i,:,sl] = np.einsum('jps,ps->jp',r1,h[i]) - (c2[i] @ dl.T).T
+		# fa*eps_ikj*dl_k summed over segments
+		a = (fa*cur) @ dl.T
+		gradb[0,1,sl] -= a[:,2]; gradb[0,2,sl] += a[:,1]
+		gradb[1,2,sl] -= a[:,0]; gradb[1,0,sl] += a[:,2]
+		gradb[2,0,sl] -= a[:,1]; gradb[2,1,sl] += a[:,0]
+	if shape == ():
+		return b[0,0], b[1,0], b[2,0], gradb[:,:,0]
+	return b[0].reshape(shape), b[1].reshape(shape), b[2].reshape(shape), gradb.reshape((3,3)+shape)
+
 if __name__=="__main__":
 	import sys
 	from argparse import ArgumentParser
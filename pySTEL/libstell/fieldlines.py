@@ -10,19 +10,46 @@ from libstell.libstell import LIBSTELL
 
 # Constants
 
+# Trajectory arrays which are read from the file on first use
+LINE_VARS = ['R_lines', 'Z_lines', 'PHI_lines', 'B_lines']
+
 # FIELDLINES Class
 class FIELDLINES():
 	"""Class for working with FIELDLINES data
 
 	"""
 	def __init__(self):
-		test = 0
+		self.filename = None
+
+	def __getattr__(self,name):
+		"""Reads or computes the trajectory arrays on first use
+
+		R_lines, Z_lines, PHI_lines and B_lines are read from the
+		file given to read_fieldlines, X_lines and Y_lines are
+		computed from R_lines and PHI_lines.
+		"""
+		import numpy as np
+		if name in LINE_VARS and self.__dict__.get('filename'):
+			import h5py
+			with h5py.File(self.filename,'r') as f:
+				if name in f:
+					setattr(self, name, np.array(f[name][:]))
+					return self.__dict__[name]
+		elif name in ['X_lines','Y_lines']:
+			self.X_lines = self.R_lines*np.cos(self.PHI_lines)
+			self.Y_lines = self.R_lines*np.sin(self.PHI_lines)
+			return self.__dict__[name]
+		raise AttributeError(f"'FIELDLINES' object has no attribute '{name}'")
 
 	def read_fieldlines(self,filename):
 		"""Reads a FIELDLINES HDF5 file
 
 		This routine reads and initilizes the FIELDLINES
 		class with variable information from an HDF5 file.
+		The trajectories (R_lines, Z_lines, PHI_lines, B_lines)
+		and X_lines, Y_lines are only read or computed when they
+		are first used, Poincare sections can be read without
+		them (see read_poincare).
 
 		Parameters
 		----------
@@ -49,54 +76,64 @@ class FIELDLINES():
 				if temp in f:
 					setattr(self, temp, float(f[temp][0]))
 			# Arrays
-			for temp in ['phiaxis', 'raxis', 'zaxis', 'B_lines', \
-				'PHI_lines', 'R_lines', 'Z_lines', 'B_PHI', 'B_R', \
+			for temp in ['phiaxis', 'raxis', 'zaxis', 'B_PHI', 'B_R', \
 				'B_Z','wall_vertex', 'wall_faces', 'wall_strikes', \
 				'A_R', 'A_PHI', 'A_Z', 'L_lines', 'Rhc_lines',  \
 				'Zhc_lines']:
 				if temp in f:
 					setattr(self, temp, np.array(f[temp][:]))
-		# Make derived arrays
-		self.X_lines = self.R_lines*np.cos(self.PHI_lines)
-		self.Y_lines = self.R_lines*np.sin(self.PHI_lines)
-		# Fix B_R and B_Z
-		for i in range(self.nr):
-			self.B_R[i,:,:] = self.B_R[i,:,:]*self.B_PHI[i,:,:]/self.raxis[i]
-			self.B_Z[i,:,:] = self.B_Z[i,:,:]*self.B_PHI[i,:,:]/self.raxis[i]
-
-	def calc_reff(self):
+		# Trajectories of a previous file
+		for temp in LINE_VARS+['X_lines','Y_lines']:
+			self.__dict__.pop(temp,None)
+		self.filename = filename
+		# Fix B_R and B_Z (stored as R*B_R/B_PHI and R*B_Z/B_PHI)
+		if hasattr(self,'B_R'):
+			self.B_R = self.B_R*self.B_PHI/self.raxis[:,None,None]
+			self.B_Z = self.B_Z*self.B_PHI/self.raxis[:,None,None]
+
+	def calc_reff(self,nchunk=None):
 		"""Calculates the effective radius
 
-		Using the first traced fieldline the routine calculates
-		the effective minor radius [m].
+		Using the first traced fieldline as the axis the routine
+		calculates the effective minor radius [m] (see calc_iota).
 
+		Parameters
+		----------
+		nchunk : int (optional)
+			Number of steps processed at once (default: all)
 		Returns
 		----------
 		reff : ndarray
 			Effective minor radius [m].
 		"""
 		import numpy as np
-		x = self.R_lines
-		y = self.Z_lines
-		for i in range(self.nsteps):
-			x[i,:] = x[i,:] - x[i,0]
-			y[i,:] = y[i,:] - y[i,0]
-		theta = np.arctan2(y,x)
-		theta  = np.arctan2(y,x)
-		dtheta = np.diff(theta,axis=0)
-		dtheta = np.where(dtheta<-np.pi,dtheta+2*np.pi,dtheta)
-		dtheta = np.where(dtheta>np.pi,dtheta-2*np.pi,dtheta)
-		theta  = np.cumsum(dtheta,axis=0)
-		reff   = np.mean(np.sqrt(x*x+y*y),axis=0)
-		return reff
-
-	def calc_iota(self):
+		n = np.zeros(self.nlines); rsum = np.zeros(self.nlines)
+		for rho, phi, theta, lvalid in self._line_angles(nchunk):
+			n += np.sum(lvalid,axis=0)
+			rsum += np.sum(rho*lvalid,axis=0)
+		with np.errstate(divide='ignore',invalid='ignore'):
+			return rsum/n
+
+	def calc_iota(self,nchunk=None):
 		"""Calculates the rotational transform
 
-		Using the first traced fieldline the routine calculates
-		the effective minor radius [m], rotational transform,
-		and error in rotational transform.
+		Using the first traced fieldline as the axis the routine
+		calculates the effective minor radius [m], rotational transform,
+		and error in rotational transform. The poloidal angle about
+		the axis is unwrapped along each line, iota is the slope
+		of a least squares fit of this angle against PHI_lines and
+		the error the square root of the sum of squared residuals.
+		All lines are fit at once, the slope from the centered sums
+		over the steps and the residuals in a second pass over the
+		steps, both accumulated over chunks of nchunk steps so the
+		trajectories need not be in memory (they are then read from
+		the file chunk by chunk). The trajectories are not modified,
+		points of lost lines (R=0) are skipped.
 
+		Parameters
+		----------
+		nchunk : int (optional)
+			Number of steps processed at once (default: all)
 		Returns
 		----------
 		reff : ndarray
@@ -107,26 +144,316 @@ class FIELDLINES():
 			Error in rotational transform
 		"""
 		import numpy as np
-		x = self.R_lines
-		y = self.Z_lines
-		for i in range(self.nsteps):
-			x[i,:] = x[i,:] - x[i,0]
-			y[i,:] = y[i,:] - y[i,0]
-		theta  = np.arctan2(y,x)
-		dtheta = np.diff(theta,axis=0)
-		dtheta = np.where(dtheta<-np.pi,dtheta+2*np.pi,dtheta)
-		dtheta = np.where(dtheta>np.pi,dtheta-2*np.pi,dtheta)
-		theta  = np.cumsum(dtheta,axis=0)
-		reff       = np.mean(np.sqrt(x*x+y*y),axis=0)
-		iota       = np.zeros((self.nlines))
-		iota_err   = np.zeros((self.nlines))
-		for i in range(self.nlines):
-			p, residuals, rank, singular_values, rcond = np.polyfit(self.PHI_lines[0:self.nsteps-1,i],theta[:,i],1,full=True)
-			iota[i] = p[0]
-			iota_err[i] = np.sqrt(residuals)
-		iota[0] = 2.0 * iota[1] - iota[2]
+		n = np.zeros(self.nlines)
+		mp = np.zeros(self.nlines); mt = np.zeros(self.nlines)
+		cpp = np.zeros(self.nlines); cpt = np.zeros(self.nlines)
+		rsum = np.zeros(self.nlines)
+		for rho, phi, theta, lvalid in self._line_angles(nchunk):
+			# Centered sums of this chunk merged with the previous ones
+			nc = np.sum(lvalid,axis=0)
+			with np.errstate(divide='ignore',invalid='ignore'):
+				mpc = np.where(nc>0,np.sum(phi*lvalid,axis=0)/nc,0.0)
+				mtc = np.where(nc>0,np.sum(theta*lvalid,axis=0)/nc,0.0)
+				dp = (phi-mpc)*lvalid
+				dt = (theta-mtc)*lvalid
+				nn = n+nc
+				fac = np.where(nn>0,n*nc/nn,0.0)
+				cpp += np.sum(dp*dp,axis=0)+fac*(mpc-mp)**2
+				cpt += np.sum(dp*dt,axis=0)+fac*(mpc-mp)*(mtc-mt)
+				mp = np.where(nn>0,mp+(mpc-mp)*nc/nn,0.0)
+				mt = np.where(nn>0,mt+(mtc-mt)*nc/nn,0.0)
+			n = nn
+			rsum += np.sum(rho*lvalid,axis=0)
+		with np.errstate(divide='ignore',invalid='ignore'):
+			reff = rsum/n
+			iota = np.where(cpp>0,cpt/cpp,0.0)
+		# Residuals summed directly, ctt-iota*cpt cancels
+		res = np.zeros(self.nlines)
+		for rho, phi, theta, lvalid in self._line_angles(nchunk):
+			d = np.where(lvalid,(theta-mt)-iota*(phi-mp),0.0)
+			res += np.sum(d*d,axis=0)
+		iota_err = np.sqrt(res)
+		if self.nlines > 2: iota[0] = 2.0 * iota[1] - iota[2]
 		return reff, iota, iota_err
 
+	def _line_angles(self,nchunk=None):
+		"""Yields chunks of the poloidal angle about the first line
+
+		Returns the distance from the first line, PHI_lines, the
+		angle unwrapped along each line (0 at the first step) and
+		the mask of valid points for each chunk of steps.
+		"""
+		import numpy as np
+		theta0 = np.zeros(self.nlines); ang0 = None
+		for r, z, phi in self._line_chunks(['R_lines','Z_lines','PHI_lines'],nchunk):
+			x = r - r[:,0:1]
+			y = z - z[:,0:1]
+			ang = np.arctan2(y,x)
+			if ang0 is None: ang0 = ang[0]
+			dtheta = np.diff(ang,axis=0,prepend=ang0[None,:])
+			dtheta = np.mod(dtheta+np.pi,2*np.pi)-np.pi
+			theta = theta0+np.cumsum(dtheta,axis=0)
+			theta0 = theta[-1]; ang0 = ang[-1]
+			lvalid = (r > 0) & (r[:,0:1] > 0)
+			yield np.sqrt(x*x+y*y), phi, theta, lvalid
+
+	def _line_chunks(self,names,nchunk=None):
+		"""Yields chunks of steps of the trajectory arrays
+
+		Arrays in memory are sliced, others are read from the
+		file chunk by chunk.
+		"""
+		import numpy as np
+		if nchunk is None: nchunk = self.nsteps
+		lmem = all([name in self.__dict__ for name in names])
+		if lmem or not self.filename:
+			arrays = [getattr(self,name) for name in names]
+			for k in range(0,self.nsteps,nchunk):
+				yield [temp[k:k+nchunk] for temp in arrays]
+		else:
+			import h5py
+			with h5py.File(self.filename,'r') as f:
+				for k in range(0,self.nsteps,nchunk):
+					yield [self.__dict__[name][k:k+nchunk] if name in self.__dict__ \
+						else f[name][k:k+nchunk] for name in names]
+
+	def calc_grid_coils(self,coils,rmin,rmax,zmin,zmax,nr=101,nphi=37,nz=101,\
+		extcur=None,nprocs=None,restart=None,lverb=False):
+		"""Calculates the background field grid from a coilset
+
+		This routine computes B_R, B_PHI and B_Z of a coilset on
+		the (raxis,phiaxis,zaxis) grid over one field period (as
+		FIELDLINES does for lcoil runs) using MGRID.calc_mgrid.
+		The grid is kept in the class so it can be traced
+		repeatedly (see trace_fieldlines), restart is passed on to
+		calc_mgrid to keep the planes on disk.
+
+		Parameters
+		----------
+		coils : COILSET
+			Coilset to compute the field of.
+		rmin : float
+			Minimum radial extent of grid [m]
+		rmax : float
+			Maximum radial extent of grid [m]
+		zmin : float
+			Minimum vertical extent of grid [m]
+		zmax : float
+			Maximum vertical extent of grid [m]
+		nr : int (optional)
+			Number of radial gridpoints (default: 101)
+		nphi : int (optional)
+			Number of toroidal gridpoints including the end of the
+			field period (default: 37)
+		nz : int (optional)
+			Number of vertical gridpoints (default: 101)
+		extcur : list (optional)
+			Array of currents in coil groups [A]
+		nprocs : int (optional)
+			Number of processes (default: number of CPUs)
+		restart : str (optional)
+			Directory for the per plane restart files
+		lverb : bool (optional)
+			Print progress (default: False)
+		"""
+		import numpy as np
+		from libstell.mgrid import MGRID
+		mgrid = MGRID()
+		mgrid.calc_mgrid(coils,rmin,rmax,zmin,zmax,ir=nr,jz=nz,kp=nphi-1,\
+			mgrid_mode='S',nprocs=nprocs,restart=restart,lverb=lverb)
+		if extcur is None: extcur = mgrid.raw_coil_cur
+		extcur = np.asarray(extcur,dtype=float)
+		# (kp,jz,ir) -> (nr,nphi,nz) with the periodic end plane
+		b = []
+		for temp in [mgrid.br,mgrid.bp,mgrid.bz]:
+			temp = np.tensordot(extcur,temp,axes=(0,0)).transpose(2,0,1)
+			b.append(np.concatenate((temp,temp[:,0:1,:]),axis=1))
+		self.B_R, self.B_PHI, self.B_Z = b
+		self.nr = nr; self.nphi = nphi; self.nz = nz
+		self.raxis = np.linspace(rmin,rmax,nr)
+		self.zaxis = np.linspace(zmin,zmax,nz)
+		self.phiaxis = np.linspace(0.0,2.0*np.pi/mgrid.nfp,nphi)
+		self.lcoil = True
+
+	def interp_grid(self,order=3):
+		"""Returns an interpolator for the background field
+
+		Parameters
+		----------
+		order : int (optional)
+			Trilinear (1) or tricubic (3) interpolation (default: 3)
+		Returns
+		----------
+		interp : GRIDINTERP
+			Interpolator with B_R, B_PHI and B_Z [T]
+		"""
+		from libstell.gridinterp import GRIDINTERP
+		interp = GRIDINTERP(self.raxis,self.phiaxis,self.zaxis,order=order)
+		for temp in ['B_R','B_PHI','B_Z']:
+			interp.add_field(temp,getattr(self,temp))
+		return interp
+
+	def trace_fieldlines(self,r_start,z_start,phi_end,phi_start=0.0,\
+		npoinc=None,follow_tol=1.0E-7,lverb=False):
+		"""Traces fieldlines through the background field grid
+
+		This routine follows all fieldlines at once through the
+		B_R, B_PHI and B_Z grid (read from a FIELDLINES file or
+		from calc_grid_coils) using an adaptive Dormand-Prince
+		Runge-Kutta scheme in phi (dR/dphi=R*B_R/B_PHI,
+		dZ/dphi=R*B_Z/B_PHI) with a step size for each line. The
+		field is interpolated with tricubic splines (see
+		interp_grid). As in FIELDLINES the lines are stored
+		every phiaxis[-1]/npoinc in R_lines, Z_lines, PHI_lines and
+		B_lines with shape (nsteps,nlines), lines which leave the
+		grid are set to zero from there on. The Poincare routines
+		of this class can be used on the result.
+
+		Parameters
+		----------
+		r_start : ndarray
+			Starting radius of each line [m]
+		z_start : ndarray
+			Starting height of each line [m]
+		phi_end : float or ndarray
+			Toroidal angle at which to stop [rad]
+		phi_start : float or ndarray (optional)
+			Starting toroidal angle (default: 0) [rad]
+		npoinc : int (optional)
+			Number of stored points per field period
+			(default: nphi-1)
+		follow_tol : float (optional)
+			Relative and absolute tolerance (default: 1E-7)
+		lverb : bool (optional)
+			Print progress (default: False)
+		"""
+		import numpy as np
+		r_start = np.atleast_1d(np.asarray(r_start,dtype=float))
+		z_start = np.atleast_1d(np.asarray(z_start,dtype=float))
+		nlines = len(r_start)
+		phi_start = np.broadcast_to(np.asarray(phi_start,dtype=float),(nlines,)).copy()
+		phi_end = np.broadcast_to(np.asarray(phi_end,dtype=float),(nlines,)).copy()
+		if npoinc is None: npoinc = len(self.phiaxis)-1
+		period = self.phiaxis[-1]-self.phiaxis[0]
+		dphi = period/npoinc
+		nsteps = int(np.ceil(np.max(np.abs(phi_end-phi_start))/dphi))
+		sgn = np.where(phi_end >= phi_start,1.0,-1.0)
+		interp = self.interp_grid(order=3)
+		def field(r,phi,z):
+			b = interp.eval(r,phi,z)
+			return b['B_R'], b['B_PHI'], b['B_Z'], np.isfinite(b['B_PHI'])
+		def rhs(phi,q):
+			br,bp,bz,lin = field(q[0],phi,q[1])
+			with np.errstate(divide='ignore',invalid='ignore'):
+				return np.stack((q[0]*br/bp,q[0]*bz/bp)), lin
+		self.R_lines = np.zeros((nsteps+1,nlines))
+		self.Z_lines = np.zeros((nsteps+1,nlines))
+		self.PHI_lines = np.zeros((nsteps+1,nlines))
+		self.B_lines = np.zeros((nsteps+1,nlines))
+		def save(idx,k,phi,q):
+			br,bp,bz,lin = field(q[0],phi,q[1])
+			self.R_lines[k,idx] = q[0]
+			self.Z_lines[k,idx] = q[1]
+			self.PHI_lines[k,idx] = phi
+			self.B_lines[k,idx] = np.nan_to_num(np.sqrt(br*br+bp*bp+bz*bz))
+		# State of each line
+		q = np.stack((r_start,z_start))
+		phi = phi_start.copy()
+		kout = np.zeros(nlines,dtype=int)
+		nout = np.minimum(np.ceil(np.abs(phi_end-phi_start)/dphi).astype(int),nsteps)
+		h = sgn*dphi
+		lactive = field(q[0],phi,q[1])[3]
+		save(np.arange(nlines),0,phi,q)
+		lactive &= nout > 0
+		# Dormand-Prince 5(4) tableau
+		c = np.array([0,1/5,3/10,4/5,8/9,1,1])
+		a = [[],[1/5],[3/40,9/40],[44/45,-56/15,32/9],\
+			[19372/6561,-25360/2187,64448/6561,-212/729],\
+			[9017/3168,-355/33,46732/5247,49/176,-5103/18656],\
+			[35/384,0,500/1113,125/192,-2187/6784,11/84]]
+		e = np.array([71/57600,0,-71/16695,71/1920,-17253/339200,22/525,-1/40])
+		niter = 0
+		while np.any(lactive):
+			idx = np.nonzero(lactive)[0]
+			qi = q[:,idx]; pi = phi[idx]
+			target = phi_start[idx]+sgn[idx]*(kout[idx]+1)*dphi
+			hi = np.where(np.abs(h[idx]) < np.abs(target-pi),h[idx],target-pi)
+			ks = []; lin = np.ones(len(idx),dtype=bool)
+			for st in range(7):
+				qs = qi+hi*sum([a[st][m]*ks[m] for m in range(st)],np.zeros_like(qi))
+				f, l = rhs(pi+c[st]*hi,qs)
+				ks.append(f); lin &= l
+			qn = qs
+			err = np.abs(hi*sum([e[m]*ks[m] for m in range(7)]))
+			err = np.max(err/(follow_tol+follow_tol*np.abs(qi)),axis=0)
+			err = np.where(lin,err,0.0)
+			lacc = err <= 1.0
+			# Step size control
+			fac = np.clip(0.9*np.where(err>0,err,1.0E-10)**-0.2,0.2,5.0)
+			h[idx] = np.minimum(np.where(lacc,np.abs(h[idx]),np.abs(hi))*fac,dphi)*sgn[idx]
+			# Lines leaving the grid are lost
+			llost = lacc & ~lin
+			lactive[idx[llost]] = False
+			lacc &= lin
+			q[:,idx[lacc]] = qn[:,lacc]
+			phi[idx[lacc]] = pi[lacc]+hi[lacc]
+			lhit = lacc & (np.abs(phi[idx]-target) <= 1.0E-12*np.maximum(1.0,np.abs(target)))
+			jdx = idx[lhit]
+			phi[jdx] = target[lhit]
+			kout[jdx] += 1
+			save(jdx,kout[jdx],phi[jdx],q[:,jdx])
+			lactive[jdx[kout[jdx] >= nout[jdx]]] = False
+			niter += 1
+			if lverb and niter % 1000 == 0:
+				print(f'  Step {niter:8d}  active lines {np.sum(lactive):6d}')
+		self.nlines = nlines
+		# As in the FIELDLINES file nsteps is the number of points
+		self.nsteps = nsteps+1
+		self.npoinc = npoinc
+		# X_lines and Y_lines are recomputed on first use
+		self.__dict__.pop('X_lines',None)
+		self.__dict__.pop('Y_lines',None)
+
+	def read_poincare(self,k,nskip=1,names=('R_lines','Z_lines')):
+		"""Reads a Poincare section of the trajectories
+
+		Returns every npoinc-th point of the trajectories starting
+		at point k, i.e. the crossings of the k-th of the npoinc
+		toroidal planes per field period, for every nskip-th line.
+		Arrays not in memory are read from the HDF5 file with a
+		strided (hyperslab) selection so only the section is read,
+		without a file (or for X_lines, Y_lines) the whole array is
+		taken from the object.
+
+		Parameters
+		----------
+		k : int
+			Index of the toroidal plane (0 to npoinc-1)
+		nskip : int (optional)
+			Number of fieldlines to skip.
+		names : tuple (optional)
+			Trajectory arrays to read (default: R_lines, Z_lines)
+		Returns
+		----------
+		section : list
+			Arrays of shape (ncrossings,nlines/nskip) for each name
+		"""
+		import numpy as np
+		sl = (slice(k,self.nsteps-1,self.npoinc),slice(0,self.nlines,nskip))
+		section = [None]*len(names)
+		lfile = []
+		for i,name in enumerate(names):
+			if name in LINE_VARS and name not in self.__dict__ and self.filename:
+				lfile.append(i)
+			else:
+				section[i] = getattr(self,name)[sl]
+		if lfile:
+			import h5py
+			with h5py.File(self.filename,'r') as f:
+				for i in lfile:
+					section[i] = f[names[i]][sl]
+		return section
+
 	def plot_poincare(self,phi,nskip=1,ax=None,color_data=None):
 		"""Creates a basic Poincare plot
 
@@ -155,8 +482,7 @@ class FIELDLINES():
 		k = int(self.npoinc*phi/self.phiaxis[-1])
 		rmin = np.amin(self.raxis)
 		rmax = np.amax(self.raxis)
-		x = self.R_lines[k:self.nsteps-1:self.npoinc,0:self.nlines:nskip]
-		y = self.Z_lines[k:self.nsteps-1:self.npoinc,0:self.nlines:nskip]
+		x, y = self.read_poincare(k,nskip)
 		if lcdata:
 			c = color_data[k:self.nsteps-1:self.npoinc,0:self.nlines:nskip]
 			ax.scatter(x,y,s=0.1,c=c,marker='.')
@@ -0,0 +1,177 @@
+##!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This library provides a python class for interpolating quantities
+given on the cylindrical (raxis,phiaxis,zaxis) grids of FIELDLINES
+and BEAMS3D.
+"""
+
+# Libraries
+
+# Constants
+INTERP_BLOCK = 2**18 # Points per block of gradient evaluations
+
+# GRIDINTERP Class
+class GRIDINTERP():
+	"""Class for interpolating on cylindrical grids
+
+	Quantities are given with shape (nr,nphi,nz) on equidistant
+	raxis, phiaxis and zaxis. The phiaxis spans one field period
+	with the last plane repeating the first one, points are
+	mapped into the period so any phi can be evaluated. The
+	interpolation is trilinear (order=1) or tricubic B-spline
+	(order=3), the coefficient tables are computed once when a
+	quantity is added. Points outside the R/Z extent of the grid
+	return NaN.
+	"""
+	def __init__(self,raxis,phiaxis,zaxis,order=3):
+		import numpy as np
+		if order not in [1,3]:
+			print(' GRIDINTERP order must be 1 or 3')
+			order = 3
+		self.order = order
+		self.nr = len(raxis); self.nphi = len(phiaxis)-1; self.nz = len(zaxis)
+		self.rmin = raxis[0]; self.dr = (raxis[-1]-raxis[0])/(self.nr-1)
+		self.zmin = zaxis[0]; self.dz = (zaxis[-1]-zaxis[0])/(self.nz-1)
+		self.phimin = phiaxis[0]; self.period = phiaxis[-1]-phiaxis[0]
+		self.dphi = self.period/self.nphi
+		# Padding of the tables in R and Z
+		self.pad = 8 if order == 3 else 1
+		self.coefs = {}
+
+	def add_field(self,name,data):
+		"""Adds a quantity to the interpolator
+
+		The spline coefficients (tricubic) or values (trilinear)
+		are stored padded on each axis, so every stencil is inside
+		the table. In R and Z the data are extended by odd
+		reflection (the spline boundary condition then acts
+		away from the grid), in phi the table is periodic.
+
+		Parameters
+		----------
+		name : str
+			Name of the quantity.
+		data : ndarray
+			Values on the grid, shape (nr,nphi+1,nz).
+		"""
+		import numpy as np
+		c = np.asarray(data,dtype=float)[:,0:self.nphi,:]
+		p = self.pad
+		# Odd reflection keeps the slope across the R and Z edges
+		c = np.pad(c,((p,p+1),(0,0),(p,p+1)),mode='reflect',reflect_type='odd')
+		if self.order == 3:
+			from scipy import ndimage
+			c = ndimage.spline_filter1d(c,3,axis=1,mode='grid-wrap')
+			c = ndimage.spline_filter1d(c,3,axis=0,mode='mirror')
+			c = ndimage.spline_filter1d(c,3,axis=2,mode='mirror')
+		c = np.pad(c,((0,0),(1,2),(0,0)),mode='wrap')
+		self.coefs[name] = np.ascontiguousarray(c)
+
+	def eval(self,r,phi,z,names=None,lgrad=False):
+		"""Evaluates quantities at points in space
+
+		Parameters
+		----------
+		r : real or ndarray
+			Radius of the points [m]
+		phi : real or ndarray
+			Toroidal angle of the points [rad]
+		z : real or ndarray
+			Height of the points [m]
+		names : list (optional)
+			Quantities to evaluate (default: all)
+		lgrad : bool (optional)
+			Also return the gradients (default: False)
+		Returns
+		----------
+		values : dict
+			Value of each quantity with the shape of the points
+		grads : dict
+			Only with lgrad, derivatives (d/dR, d/dphi, d/dZ) of each
+			quantity, shape (3,)+shape of the points
+		"""
+		import numpy as np
+		if names is None: names = list(self.coefs.keys())
+		r, phi, z = np.broadcast_arrays(np.asarray(r,dtype=float),\
+			np.asarray(phi,dtype=float),np.asarray(z,dtype=float))
+		shape = r.shape
+		# Continuous indices into the padded tables
+		tr = (r.ravel()-self.rmin)/self.dr
+		tz = (z.ravel()-self.zmin)/self.dz
+		tp = np.mod(phi.ravel()-self.phimin,self.period)/self.dphi
+		lout = (tr < 0) | (tr > self.nr-1) | (tz < 0) | (tz > self.nz-1) | ~np.isfinite(tr+tz+tp)
+		tr = np.where(lout,0.0,tr)+self.pad
+		tz = np.where(lout,0.0,tz)+self.pad
+		tp = np.where(lout,0.0,tp)+1.0
+		values = {}
+		grads = {}
+		if not lgrad:
+			from scipy import ndimage
+			x = np.stack((tr,tp,tz))
+			for name in names:
+				f = ndimage.map_coordinates(self.coefs[name],x,order=self.order,\
+					mode='nearest',prefilter=False)
+				values[name] = np.where(lout,np.nan,f).reshape(shape)
+			return values
+		npts = len(tr)
+		for name in names:
+			values[name] = np.empty(npts)
+			grads[name] = np.empty((3,npts))
+		scale = np.array([1.0/self.dr,1.0/self.dphi,1.0/self.dz])
+		for k in range(0,npts,INTERP_BLOCK):
+			sl = slice(k,min(k+INTERP_BLOCK,npts))
+			i0, wr, dwr = self._weights(tr[sl])
+			j0, wp, dwp = self._weights(tp[sl])
+			k0, wz, dwz = self._weights(tz[sl])
+			nc = wr.shape[0]
+			for name in names:
+				c = self.coefs[name]
+				cf = c.ravel()
+				f = np.zeros((4,len(i0)))
+				for a in range(nc):
+					for b in range(nc):
+						# Stencil along z gathered at once
+						base = ((i0+a)*c.shape[1]+j0+b)*c.shape[2]+k0
+						g = cf[base[None,:]+np.arange(nc)[:,None]]
+						gz = np.sum(g*wz,axis=0)
+						gdz = np.sum(g*dwz,axis=0)
+						f[0] += wr[a]*wp[b]*gz
+						f[1] += dwr[a]*wp[b]*gz
+						f[2] += wr[a]*dwp[b]*gz
+						f[3] += wr[a]*wp[b]*gdz
+				values[name][sl] = f[0]
+				grads[name][:,sl] = f[1:]*scale[:,None]
+		for name in names:
+			values[name] = np.where(lout,np.nan,values[name]).reshape(shape)
+			grads[name] = np.where(lout,np.nan,grads[name]).reshape((3,)+shape)
+		return values, grads
+
+	def _weights(self,t):
+		"""Stencil start and B-spline weights along one axis
+
+		Returns
+		----------
+		i0 : ndarray
+			First index of the stencil in the padded table
+		w : ndarray
+			Weights, shape (order+1,npts)
+		dw : ndarray
+			Derivatives of the weights with respect to t
+		"""
+		import numpy as np
+		i = np.floor(t).astype(int)
+		u = t-i
+		if self.order == 1:
+			w = np.stack((1.0-u,u))
+			dw = np.stack((-np.ones_like(u),np.ones_like(u)))
+			return i, w, dw
+		v = 1.0-u
+		w = np.stack((v*v*v,3.0*u*u*u-6.0*u*u+4.0,-3.0*u*u*u+3.0*u*u+3.0*u+1.0,u*u*u))/6.0
+		dw = np.stack((-0.5*v*v,1.5*u*u-2.0*u,-1.5*u*u+u+0.5,0.5*u*u))
+		return i-1, w, dw
+
+# Main routine
+if __name__=="__main__":
+	import sys
+	sys.exit(0)
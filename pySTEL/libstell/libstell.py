@@ -7,18 +7,28 @@ This library provides a python class for interfacing to libstell
 # Libraries
 
 # Constants
+LIBSTELL_SYMBOL_CACHE = '~/.cache/pySTEL/libstell_symbols.json' # On disk name mangling cache
+FOURIER_BLOCK_BYTES = 2**28 # Scratch memory per block in FourierRep.mfunct
 
 # LIBSTELL Class
 class LIBSTELL():
 	"""Class for working with VMEC equilibria
 
 	"""
+	# File currently held by read_wout_mod (shared by all instances)
+	wout_file = None
+	# Loaded libraries and prepared functions (shared by all instances)
+	_lib_cache = {}
+	_func_cache = {}
+
 	def __init__(self, parent=None):
 		import os,sys
 		import ctypes as ct
-		from subprocess import Popen, PIPE
 		self.STELLOPT_PATH = os.environ["STELLOPT_PATH"]
 		self.PATH_TO_LIBSTELL = os.path.join(self.STELLOPT_PATH,'LIBSTELL','Release','libstell.so')
+		if self.PATH_TO_LIBSTELL in LIBSTELL._lib_cache:
+			self.libstell, self.s1, self.s2, self.s3 = LIBSTELL._lib_cache[self.PATH_TO_LIBSTELL]
+			return
 		try:
 			self.libstell = ct.cdll.LoadLibrary(self.PATH_TO_LIBSTELL)
 		except:
@@ -27,6 +37,41 @@ class LIBSTELL():
 			print(f"!!  PATH: {self.PATH_TO_LIBSTELL}    !!")
 			print("!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!!")
 		# Figure out uderscoring
+		self.s1, self.s2, self.s3 = self.get_underscoring()
+		LIBSTELL._lib_cache[self.PATH_TO_LIBSTELL] = (self.libstell,self.s1,self.s2,self.s3)
+
+	def get_underscoring(self):
+		"""Determines the Fortran name mangling of libstell.so
+
+		This routine runs nm on libstell.so to work out the prefix
+		and suffixes the compiler added to module procedure names.
+		The result is cached on disk (LIBSTELL_SYMBOL_CACHE) keyed
+		by the library path, size and modification time so nm only
+		runs when the library changes.
+
+		Returns
+		----------
+		s1 : str
+			Prefix before the module name
+		s2 : str
+			Separator between module and procedure names
+		s3 : str
+			Suffix after the procedure name
+		"""
+		import os,json
+		from subprocess import Popen, PIPE
+		stat = os.stat(self.PATH_TO_LIBSTELL)
+		key = [stat.st_mtime,stat.st_size]
+		cache_file = os.path.expanduser(LIBSTELL_SYMBOL_CACHE)
+		cache = {}
+		try:
+			with open(cache_file,'r') as f:
+				cache = json.load(f)
+			entry = cache[self.PATH_TO_LIBSTELL]
+			if entry['key'] == key:
+				return tuple(entry['underscoring'])
+		except (OSError,ValueError,KeyError,TypeError):
+			pass
 		out = Popen(args="nm "+self.PATH_TO_LIBSTELL, 
 			shell=True, 
 			stdout=PIPE).communicate()[0].decode("utf-8")
@@ -37,10 +82,48 @@ class LIBSTELL():
 		names = [ s for s in attrs if module in s and func in s]
 		name = names[0].replace(module, ',')
 		name = name.replace(func, ',')
-		self.s1, self.s2, self.s3 = name.split(',')
+		s1, s2, s3 = name.split(',')
 		# Weird OSX behavior
-		if self.s1=='___':
-			self.s1='__'
+		if s1=='___':
+			s1='__'
+		# Failing to write the cache is not an error
+		try:
+			cache[self.PATH_TO_LIBSTELL] = {'key':key,'underscoring':[s1,s2,s3]}
+			os.makedirs(os.path.dirname(cache_file),exist_ok=True)
+			with open(cache_file+'.tmp','w') as f:
+				json.dump(cache,f)
+			os.replace(cache_file+'.tmp',cache_file)
+		except OSError:
+			pass
+		return s1, s2, s3
+
+	def get_function(self,name,argtypes=None,restype=None):
+		"""Returns a prepared libstell function handle
+
+		Function handles are cached per process by name and
+		signature, so argtypes and restype are only set up once.
+
+		Parameters
+		----------
+		name : str
+			Full (mangled) symbol name
+		argtypes : list (optional)
+			List of ctypes argument types
+		restype : ctypes type (optional)
+			Return type (default None)
+		Returns
+		----------
+		func : ctypes function
+			Callable function handle
+		"""
+		key = (self.PATH_TO_LIBSTELL,name,None if argtypes is None else tuple(argtypes),restype)
+		func = LIBSTELL._func_cache.get(key)
+		if func is None:
+			func = self.libstell[name]
+			func.argtypes = argtypes
+			func.restype = restype
+			LIBSTELL._func_cache[key] = func
+		return func
 
 	def safe_open(self,iunit,istat,filename,filestat,fileform,record_in=None,access_in='SEQUENTIAL',delim_in='APOSTROPHE'):
 		"""Wrapper to safe_open in safe_open_mod
@@ -68,12 +151,11 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'safe_open_mod_'+self.s2
-		safe_open_h = getattr(self.libstell,module_name+'_safe_open'+self.s3)
 		# SUBROUTINE safe_open(int iunit, int istat, char filename, char filestat, char fileform, int record_in, char access_in, char delim_in)
-		safe_open_h.argtypes= [ ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_char_p, ct.c_char_p, ct.c_char_p, \
+		safe_open_h = self.get_function(module_name+'_safe_open'+self.s3,\
+			argtypes=[ ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_char_p, ct.c_char_p, ct.c_char_p, \
 			ct.POINTER(ct.c_int), ct.c_char_p, ct.c_char_p, \
-			ct.c_long, ct.c_long, ct.c_long, ct.c_long, ct.c_long]
-		safe_open_h.restype=None
+			ct.c_long, ct.c_long, ct.c_long, ct.c_long, ct.c_long],restype=None)
 		iunit_temp = ct.c_int(iunit)
 		istat_temp = ct.c_int(istat)
 		opt1 = ct.c_bool(True)
@@ -104,8 +186,7 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'safe_open_mod_'+self.s2
-		safe_close_h = getattr(self.libstell,module_name+'_safe_close'+self.s3)
-		safe_close_h.restype=None
+		safe_close_h = self.get_function(module_name+'_safe_close'+self.s3,restype=None)
 		iunit_temp = ct.c_int(iunit)
 		safe_close_h(ct.byref(iunit_temp))
 		return
@@ -124,32 +205,20 @@ class LIBSTELL():
 		import ctypes as ct
 		# Get constants
 		module_name = self.s1+'vsvd0_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getnigroup'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getnigroup'+self.s3,restype=ct.c_int)
 		nigroup = get_constant()
 		module_name = self.s1+'vparams_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getndatafmax'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getndatafmax'+self.s3,restype=ct.c_int)
 		ndatafmax = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getmpol1d'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmpol1d'+self.s3,restype=ct.c_int)
 		mpol1d = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getntord'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getntord'+self.s3,restype=ct.c_int)
 		ntord = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getnsd'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getnsd'+self.s3,restype=ct.c_int)
 		nsd = get_constant()
 		# We use an added routine as a helper
 		module_name = self.s1+'vmec_input_'+self.s2
-		read_indata_namelist = getattr(self.libstell,module_name+'_read_indata_namelist_byfile'+self.s3)
-		read_indata_namelist.argtypes = [ct.c_char_p,ct.c_long]
-		read_indata_namelist.restype=None
+		read_indata_namelist = self.get_function(module_name+'_read_indata_namelist_byfile'+self.s3,argtypes=[ct.c_char_p,ct.c_long],restype=None)
 		read_indata_namelist(filename.encode('UTF-8'),len(filename))
 		# Get vars
 		booList=['lpofr','lmac','lfreeb','lrecon','loldout','ledge_dump','lasym','lforbal','lrfp',\
@@ -204,9 +273,7 @@ class LIBSTELL():
 		if out_dict:
 			for key in out_dict:
 				self.set_module_var(module_name,key,out_dict[key])
-		write_indata_namelist = getattr(self.libstell,module_name+'_write_indata_namelist_byfile'+self.s3)
-		write_indata_namelist.argtypes = [ct.c_char_p,ct.c_long]
-		write_indata_namelist.restype=None
+		write_indata_namelist = self.get_function(module_name+'_write_indata_namelist_byfile'+self.s3,argtypes=[ct.c_char_p,ct.c_long],restype=None)
 		write_indata_namelist(filename.encode('UTF-8'),len(filename))
 
 	def read_bootin(self,filename):
@@ -223,9 +290,7 @@ class LIBSTELL():
 		import ctypes as ct
 		# We use an added routine as a helper
 		module_name = self.s1+'bootsj_input_'+self.s2
-		read_bootin_namelist = getattr(self.libstell,module_name+'_read_boot_namelist_byfile'+self.s3)
-		read_bootin_namelist.argtypes = [ct.c_char_p,ct.c_long]
-		read_bootin_namelist.restype=None
+		read_bootin_namelist = self.get_function(module_name+'_read_boot_namelist_byfile'+self.s3,argtypes=[ct.c_char_p,ct.c_long],restype=None)
 		read_bootin_namelist(filename.encode('UTF-8'),len(filename))
 		# Get vars
 		intList=['nrho','mbuse','nbuse','isymm0']
@@ -278,9 +343,7 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'bootsj_input_'+self.s2
-		write_bootin_namelist = getattr(self.libstell,module_name+'_write_boot_namelist_byfile'+self.s3)
-		write_bootin_namelist.argtypes = [ct.c_char_p,ct.c_long]
-		write_bootin_namelist.restype=None
+		write_bootin_namelist = self.get_function(module_name+'_write_boot_namelist_byfile'+self.s3,argtypes=[ct.c_char_p,ct.c_long],restype=None)
 		write_bootin_namelist(filename.encode('UTF-8'),len(filename))
 
 	def read_beams3d_input(self,filename):
@@ -297,33 +360,21 @@ class LIBSTELL():
 		import ctypes as ct
 		# A few constants defined in globals
 		module_name = self.s1+'beams3d_globals_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getmaxparticles'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmaxparticles'+self.s3,restype=ct.c_int)
 		maxparticles = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getmaxbeams'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmaxbeams'+self.s3,restype=ct.c_int)
 		maxbeams = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getmaxproflen'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmaxproflen'+self.s3,restype=ct.c_int)
 		maxproflen = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getnion'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getnion'+self.s3,restype=ct.c_int)
 		nion = get_constant()
 		# Call the initialization routine
 		module_name = self.s1+'beams3d_input_mod_'+self.s2
-		init_beams3d_input = getattr(self.libstell,module_name+'_init_beams3d_input'+self.s3)
-		init_beams3d_input.argtypes = None
-		init_beams3d_input.restype = None
+		init_beams3d_input = self.get_function(module_name+'_init_beams3d_input'+self.s3,restype=None)
 		init_beams3d_input()
 		# We use an added routine as a helper
 		module_name = self.s1+'beams3d_input_mod_'+self.s2
-		read_beams3d_input = getattr(self.libstell,module_name+'_read_beams3d_input'+self.s3)
-		read_beams3d_input.argtypes = [ct.c_char_p,ct.POINTER(ct.c_int),ct.c_long]
-		read_beams3d_input.restype = None
+		read_beams3d_input = self.get_function(module_name+'_read_beams3d_input'+self.s3,argtypes=[ct.c_char_p,ct.POINTER(ct.c_int),ct.c_long],restype=None)
 		istat = ct.c_int(0)
 		read_beams3d_input(filename.encode('UTF-8'),ct.byref(istat),len(filename))
 		if not (istat.value == 0):
@@ -388,9 +439,7 @@ class LIBSTELL():
 			for key in out_dict:
 				self.set_module_var(module_name,key,out_dict[key])
 		module_name = self.s1+'beams3d_input_mod_'+self.s2
-		write_beams3d_namelist = getattr(self.libstell,module_name+'_write_beams3d_namelist_byfile'+self.s3)
-		write_beams3d_namelist.argtypes = [ct.c_char_p,ct.c_long]
-		write_beams3d_namelist.restype=None
+		write_beams3d_namelist = self.get_function(module_name+'_write_beams3d_namelist_byfile'+self.s3,argtypes=[ct.c_char_p,ct.c_long],restype=None)
 		write_beams3d_namelist(filename.encode('UTF-8'),len(filename))
 
 	def read_diagno_in(self,filename):
@@ -411,9 +460,7 @@ class LIBSTELL():
 		import ctypes as ct
 		# We use an added routine as a helper
 		module_name = self.s1+'diagno_input_mod_'+self.s2
-		read_diagno_input = getattr(self.libstell,module_name+'_read_diagno_input'+self.s3)
-		read_diagno_input.argtypes = [ct.c_char_p, ct.POINTER(ct.c_int), ct.c_long]
-		read_diagno_input.restype=None
+		read_diagno_input = self.get_function(module_name+'_read_diagno_input'+self.s3,argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.c_long],restype=None)
 		ierr = ct.c_int(0)
 		read_diagno_input(filename.encode('UTF-8'),ct.byref(ierr),len(filename))
 		# Get vars
@@ -454,9 +501,7 @@ class LIBSTELL():
 			for key in out_dict:
 				self.set_module_var(module_name,key,out_dict[key])
 		module_name = self.s1+'diagno_input_mod_'+self.s2
-		write_diagno_input = getattr(self.libstell,module_name+'_write_diagno_input_byfile'+self.s3)
-		write_diagno_input.argtypes = [ct.c_char_p, ct.c_long]
-		write_diagno_input.restype=None
+		write_diagno_input = self.get_function(module_name+'_write_diagno_input_byfile'+self.s3,argtypes=[ct.c_char_p, ct.c_long],restype=None)
 		write_diagno_input(filename.encode('UTF-8'),len(filename))
 
 	def read_fieldlines_input(self,filename):
@@ -477,15 +522,11 @@ class LIBSTELL():
 		import ctypes as ct
 		# A few constants defined in globals
 		module_name = self.s1+'fieldlines_globals_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getmaxlines'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmaxlines'+self.s3,restype=ct.c_int)
 		maxlines = get_constant()
 		# We use an added routine as a helper
 		module_name = self.s1+'fieldlines_input_mod_'+self.s2
-		read_fieldlines_input = getattr(self.libstell,module_name+'_read_fieldlines_input'+self.s3)
-		read_fieldlines_input.argtypes = [ct.c_char_p, ct.POINTER(ct.c_int), ct.c_long]
-		read_fieldlines_input.restype=None
+		read_fieldlines_input = self.get_function(module_name+'_read_fieldlines_input'+self.s3,argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.c_long],restype=None)
 		ierr = ct.c_int(0)
 		read_fieldlines_input(filename.encode('UTF-8'),ct.byref(ierr),len(filename))
 		# Get vars
@@ -522,9 +563,7 @@ class LIBSTELL():
 			for key in out_dict:
 				self.set_module_var(module_name,key,out_dict[key])
 		module_name = self.s1+'fieldlines_input_mod_'+self.s2
-		write_fieldlines_input = getattr(self.libstell,module_name+'_write_fieldlines_namelist_byfile'+self.s3)
-		write_fieldlines_input.argtypes = [ct.c_char_p, ct.c_long]
-		write_fieldlines_input.restype=None
+		write_fieldlines_input = self.get_function(module_name+'_write_fieldlines_namelist_byfile'+self.s3,argtypes=[ct.c_char_p, ct.c_long],restype=None)
 		write_fieldlines_input(filename.encode('UTF-8'),len(filename))
 
 	def read_stellopt_input(self,filename):
@@ -545,47 +584,29 @@ class LIBSTELL():
 		import ctypes as ct
 		# A few constants defined in globals
 		module_name = self.s1+'vsvd0_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getnigroup'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getnigroup'+self.s3,restype=ct.c_int)
 		nigroup = get_constant()
 		module_name = self.s1+'vparams_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getndatafmax'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getndatafmax'+self.s3,restype=ct.c_int)
 		ndatafmax = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getmpol1d'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmpol1d'+self.s3,restype=ct.c_int)
 		mpol1d = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getntord'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getntord'+self.s3,restype=ct.c_int)
 		ntord = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getnsd'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getnsd'+self.s3,restype=ct.c_int)
 		nsd = get_constant()
 		module_name = self.s1+'stellopt_globals_'+self.s2
-		get_constant = getattr(self.libstell,module_name+'_getmaxwindsurf'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getmaxwindsurf'+self.s3,restype=ct.c_int)
 		maxwindsurf = get_constant()
-		get_constant = getattr(self.libstell,module_name+'_getbigno'+self.s3)
-		get_constant.argtypes = None
-		get_constant.restype=ct.c_int
+		get_constant = self.get_function(module_name+'_getbigno'+self.s3,restype=ct.c_int)
 		bigno = get_constant()
 		# Call the initialization routine
 		module_name = self.s1+'stellopt_input_mod_'+self.s2
-		init_stellopt_input = getattr(self.libstell,module_name+'_init_stellopt_input'+self.s3)
-		init_stellopt_input.argtypes = None
-		init_stellopt_input.restype = None
+		init_stellopt_input = self.get_function(module_name+'_init_stellopt_input'+self.s3,restype=None)
 		init_stellopt_input() 
 		# We use an added routine as a helper
 		module_name = self.s1+'stellopt_input_mod_'+self.s2
-		read_stellopt_input = getattr(self.libstell,module_name+'_read_stellopt_input'+self.s3)
-		read_stellopt_input.argtypes = [ct.c_char_p,ct.POINTER(ct.c_int),ct.c_long]
-		read_stellopt_input.restype = None
+		read_stellopt_input = self.get_function(module_name+'_read_stellopt_input'+self.s3,argtypes=[ct.c_char_p,ct.POINTER(ct.c_int),ct.c_long],restype=None)
 		istat = ct.c_int(0)
 		read_stellopt_input(filename.encode('UTF-8'),ct.byref(istat),len(filename))
 		if not (istat.value == 0):
@@ -831,12 +852,10 @@ class LIBSTELL():
 				self.set_module_var(module_name,key,target_dict[key])
 		# Now write namelist
 		module_name = self.s1+'stellopt_input_mod_'+self.s2
-		write_stellopt_input = getattr(self.libstell,module_name+'_write_optimum_namelist_byfile'+self.s3)
-		write_stellopt_input.argtypes = [ct.c_char_p, ct.c_long]
-		write_stellopt_input.restype=None
+		write_stellopt_input = self.get_function(module_name+'_write_optimum_namelist_byfile'+self.s3,argtypes=[ct.c_char_p, ct.c_long],restype=None)
 		write_stellopt_input(filename.encode('UTF-8'),len(filename))
 
-	def read_wout(self,file):
+	def read_wout(self,file,lazy=False):
 		"""Reads a wout file and returns a dictionary
 
 		This routine wrappers read_wout in LIBSTELL and returns
@@ -846,6 +865,9 @@ class LIBSTELL():
 		----------
 		file : str
 			Path to wout file.
+		lazy : bool (optional)
+			Skip the 2D harmonic arrays, these can be pulled later
+			with get_wout_array (default: False)
 		Returns
 		----------
 		vars : dict
@@ -853,13 +875,7 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'read_wout_mod_'+self.s2
-		read_wout = getattr(self.libstell,module_name+'_readw_and_open'+self.s3)
-		read_wout.argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_long]
-		read_wout.restype=None
-		ierr = ct.c_int(0)
-		iopen = ct.c_int(0)
-		read_wout(file.encode('UTF-8'), ct.byref(ierr), ct.byref(iopen), len(file))
-		if not (ierr.value == 0):
+		if not self._readw_and_open(file):
 			return None
 		# Setup Arrays
 		out_data={}
@@ -884,19 +900,10 @@ class LIBSTELL():
 		realLen.extend([(scalar_data['mnmax'],1)]*2)
 		realLen.extend([(scalar_data['mnmax_nyq'],1)]*2)
 		# Add 2D Arrays
-		realList.extend(['rmnc','zmns','lmns'])
-		realLen.extend([(scalar_data['ns'],scalar_data['mnmax'])]*3)
-		realList.extend([ 'bmnc','gmnc','bsupumnc','bsupvmnc',\
-			'bsubsmns','bsubumnc','bsubvmnc',\
-			'currumnc','currvmnc'])
-		realLen.extend([(scalar_data['ns'],scalar_data['mnmax_nyq'])]*9)
-		if scalar_data['iasym']:
-			realList.extend(['rmns','zmnc','lmnc'])
-			realLen.extend([(scalar_data['ns'],scalar_data['mnmax'])]*3)
-			realList.extend([ 'bmns','gmns','bsupumns','bsupvmns',\
-				'bsubsmnc','bsubumns','bsubvmns',\
-				'currumns','currvmns'])
-			realLen.extend([(scalar_data['ns'],scalar_data['mnmax_nyq'])]*9)
+		if not lazy:
+			array_2d = wout_array_sizes(scalar_data)
+			realList.extend(list(array_2d.keys()))
+			realLen.extend(list(array_2d.values()))
 		array_data = self.get_module_vars(module_name,realVar=realList,realLen=realLen)
 		# Try reading strings
 		charVar=['mgrid_file','input_extension','pmass_type','pcurr_type','piota_type']
@@ -905,6 +912,58 @@ class LIBSTELL():
 		# Return
 		return scalar_data | array_data | string_data
 
+	def get_wout_array(self,file,name,shape):
+		"""Returns a copy of a single wout array
+
+		This routine pulls a single array from read_wout_mod. If
+		another wout file has been read since, the file is read
+		again first.
+
+		Parameters
+		----------
+		file : str
+			Path to wout file.
+		name : str
+			Name of the array (e.g. 'bmnc')
+		shape : tuple
+			Shape of the array
+		Returns
+		----------
+		val : ndarray
+			Copy of the module array
+		"""
+		import numpy as np
+		module_name = self.s1+'read_wout_mod_'+self.s2
+		if LIBSTELL.wout_file != file:
+			if not self._readw_and_open(file):
+				return None
+		out_data = self.get_module_vars(module_name,realVar=[name],realLen=[shape])
+		return np.array(out_data[name])
+
+	def _readw_and_open(self,file):
+		"""Calls readw_and_open in read_wout_mod
+
+		Parameters
+		----------
+		file : str
+			Path to wout file.
+		Returns
+		----------
+		lread : bool
+			True if the file was read.
+		"""
+		import ctypes as ct
+		module_name = self.s1+'read_wout_mod_'+self.s2
+		read_wout = self.get_function(module_name+'_readw_and_open'+self.s3,argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_long],restype=None)
+		ierr = ct.c_int(0)
+		iopen = ct.c_int(0)
+		read_wout(file.encode('UTF-8'), ct.byref(ierr), ct.byref(iopen), len(file))
+		if not (ierr.value == 0):
+			LIBSTELL.wout_file = None
+			return False
+		LIBSTELL.wout_file = file
+		return True
+
 	def read_boozer(self,file):
 		"""Reads a boozmn file and returns a dictionary
 
@@ -922,9 +981,7 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'read_boozer_mod_'+self.s2
-		read_boozer = getattr(self.libstell,module_name+'_read_boozer_file'+self.s3)
-		read_boozer.argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_long]
-		read_boozer.restype=None
+		read_boozer = self.get_function(module_name+'_read_boozer_file'+self.s3,argtypes=[ct.c_char_p, ct.POINTER(ct.c_int), ct.POINTER(ct.c_int), ct.c_long],restype=None)
 		ierr = ct.c_int(0)
 		iopen = ct.c_int(0)
 		read_boozer(file.encode('UTF-8'), ct.byref(ierr), ct.byref(iopen), len(file))
@@ -1092,21 +1149,14 @@ class LIBSTELL():
 
 		Parameters
 		----------
-		s : real
-			Value of normalized toroidal flux.
+		s : real or ndarray
+			Value(s) of normalized toroidal flux.
 		Returns
 		-------
-		val : real
+		val : real or ndarray
 			Value of I'(s) or I(s)
 		"""
-		import ctypes as ct
-		# Load Libraries
-		pcurr_func = getattr(self.libstell,'pcurr_')
-		pcurr_func.argtypes = [ct.POINTER(ct.c_double)]
-		pcurr_func.restype=ct.c_double
-		s_temp = ct.c_double(s)
-		val = pcurr_func(ct.byref(s_temp))
-		return val
+		return self.profile_call('pcurr_',s)
 
 	def piota(self,s):
 		"""Wrapper to the PIOTA function
@@ -1116,21 +1166,14 @@ class LIBSTELL():
 
 		Parameters
 		----------
-		s : real
-			Value of normalized toroidal flux
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
 		Returns
 		-------
-		val : real
+		val : real or ndarray
 			Value of iota(s)
 		"""
-		import ctypes as ct
-		# Load Libraries
-		pcurr_func = getattr(self.libstell,'piota_')
-		pcurr_func.argtypes = [ct.POINTER(ct.c_double)]
-		pcurr_func.restype=ct.c_double
-		s_temp = ct.c_double(s)
-		val = pcurr_func(ct.byref(s_temp))
-		return val
+		return self.profile_call('piota_',s)
 
 	def pmass(self,s):
 		"""Wrapper to the PMASS function
@@ -1140,21 +1183,47 @@ class LIBSTELL():
 
 		Parameters
 		----------
-		s : real
-			Value of normalized toroidal flux
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
 		Returns
 		-------
-		val : real
+		val : real or ndarray
 			Value of mass(s)
 		"""
+		return self.profile_call('pmass_',s)
+
+	def profile_call(self,name,s):
+		"""Evaluates a libstell profile function
+
+		This routine calls a scalar libstell profile function
+		(pcurr_, piota_, pmass_) for a scalar or for every element
+		of an array, reusing a single prepared function handle.
+
+		Parameters
+		----------
+		name : str
+			Name of the function
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
+		Returns
+		-------
+		val : real or ndarray
+			Function value(s), same shape as s
+		"""
+		import numpy as np
 		import ctypes as ct
-		# Load Libraries
-		pcurr_func = getattr(self.libstell,'pmass_')
-		pcurr_func.argtypes = [ct.POINTER(ct.c_double)]
-		pcurr_func.restype=ct.c_double
-		s_temp = ct.c_double(s)
-		val = pcurr_func(ct.byref(s_temp))
-		return val
+		func = self.get_function(name,argtypes=[ct.POINTER(ct.c_double)],restype=ct.c_double)
+		s_temp = ct.c_double(0)
+		s_ref = ct.byref(s_temp)
+		if np.ndim(s) == 0:
+			s_temp.value = s
+			return func(s_ref)
+		s_arr = np.asarray(s,dtype=float)
+		def call(x):
+			s_temp.value = x
+			return func(s_ref)
+		val = np.fromiter((call(x) for x in s_arr.flat),dtype=float,count=s_arr.size)
+		return val.reshape(s_arr.shape)
 
 	def parse_coils_file(self,filename):
 		"""Parses a coils file
@@ -1173,9 +1242,7 @@ class LIBSTELL():
 		"""
 		import ctypes as ct
 		module_name = self.s1+'biotsavart_'+self.s2
-		parse_coils_file = getattr(self.libstell,module_name+'_parse_coils_file'+self.s3)
-		parse_coils_file.argtypes=[ct.c_char_p, ct.c_bool, ct.c_long]
-		parse_coils_file.restype=None
+		parse_coils_file = self.get_function(module_name+'_parse_coils_file'+self.s3,argtypes=[ct.c_char_p, ct.c_bool, ct.c_long],restype=None)
 		lgrps = ct.c_bool(False)
 		parse_coils_file(file.encode('UTF-8'), ct.byref(lgrps), len(file))
 		if not (ierr.value == 0):
@@ -1184,8 +1251,9 @@ class LIBSTELL():
 class FourierRep():
 	def __init__(self, parent=None):
 		self.test = None
+		self.fourier_engine = 'auto'
 
-	def cfunct(self,theta,phi,fmnc,xm,xn):
+	def cfunct(self,theta,phi,fmnc,xm,xn,surfaces=None):
 		"""Cos transformation
 
 		This routine performs the cosine transformation of the
@@ -1203,30 +1271,16 @@ class FourierRep():
 			Poloidal harmonic array.
 		xn : ndarray
 			Toroidal harmonic array.
+		surfaces : int, list or slice (optional)
+			Radial indices to transform (default: all)
 		Returns
 		----------
 		f : ndarray
 			Fourier transformed quantity (radial,poloidal,toroidal)
 		"""
-		import numpy as np
-		f=0
-		(ns,mn)=fmnc.shape
-		lt = len(theta)
-		lz = len(phi)
-		mt=np.matmul(xm,theta.T)
-		nz=np.matmul(xn,phi.T)
-		cosmt=np.cos(mt)
-		sinmt=np.sin(mt)
-		cosnz=np.cos(nz)
-		sinnz=np.sin(nz)
-		f = np.zeros((ns,lt,lz))
-		fmn = np.ndarray((mn,lt))
-		for k in range(ns):
-			fmn = np.broadcast_to(fmnc[k,:],(lt,mn)).T
-			f[k,:,:]=np.matmul((fmn*cosmt).T, cosnz)-np.matmul((fmn*sinmt).T, sinnz)
-		return f
+		return self.mfunct(theta,phi,[fmnc],xm,xn,['cos'],surfaces=surfaces)[0]
 
-	def sfunct(self,theta,phi,fmnc,xm,xn):
+	def sfunct(self,theta,phi,fmnc,xm,xn,surfaces=None):
 		"""Sine transformation
 
 		This routine performs the sine transformation of the
@@ -1244,29 +1298,395 @@ class FourierRep():
 			Poloidal harmonic array.
 		xn : ndarray
 			Toroidal harmonic array.
+		surfaces : int, list or slice (optional)
+			Radial indices to transform (default: all)
+		Returns
+		----------
+		f : ndarray
+			Fourier transformed quantity (radial,poloidal,toroidal)
+		"""
+		return self.mfunct(theta,phi,[fmnc],xm,xn,['sin'],surfaces=surfaces)[0]
+
+	def mfunct(self,theta,phi,fmn_list,xm,xn,parity=None,engine=None,surfaces=None):
+		"""Batched cos/sin transformation of several quantities
+
+		This routine performs the cosine or sine transformation of
+		the kernel (m*theta+n*phi) for a list of arrays which share
+		the same harmonics and grid. The trigonometric tables are
+		built once and every surface of every quantity is evaluated
+		with one batched matrix product.
+
+		Parameters
+		----------
+		theta : ndarray
+			Poloidal grid in radians.
+		phi : ndarray
+			Toroidal grid in radians.
+		fmn_list : list
+			List of arrays to transform (radial,fourier)
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		parity : list (optional)
+			'cos' or 'sin' for each array (default: all 'cos')
+		engine : str (optional)
+			'auto', 'fft' or 'matmul' (default: self.fourier_engine)
+			The FFT engine is used for uniform periodic grids, 'auto'
+			selects it when both grids qualify. Non-uniform grids
+			always use the matmul engine.
+		surfaces : int, list or slice (optional)
+			Radial indices to transform (default: all)
+		Returns
+		----------
+		f_list : list
+			Fourier transformed quantities (radial,poloidal,toroidal)
+		"""
+		import numpy as np
+		if parity is None:
+			parity = ['cos']*len(fmn_list)
+		if engine is None:
+			engine = getattr(self,'fourier_engine','auto')
+		mn = np.size(xm)
+		rows = [np.asarray(fmn).reshape((-1,mn)) for fmn in fmn_list]
+		if surfaces is not None:
+			if np.ndim(surfaces) == 0 and not isinstance(surfaces,slice):
+				surfaces = [surfaces]
+			rows = [fmn[surfaces] for fmn in rows]
+		nrows = [fmn.shape[0] for fmn in rows]
+		fmn_all = np.concatenate(rows,axis=0)
+		lsin = np.concatenate([[str(p).lower().startswith('s')]*n for p,n in zip(parity,nrows)])
+		fft_t = fft_z = None
+		if engine in ['auto','fft']:
+			fft_t = self._fft_grid(theta,xm)
+			fft_z = self._fft_grid(phi,xn)
+		if fft_t and fft_z:
+			f = self._mfunct_fft(theta,phi,fmn_all,lsin,xm,xn,fft_t,fft_z)
+			return np.split(f,np.cumsum(nrows)[:-1],axis=0)
+		cosmt,sinmt,cosnz,sinnz = self._trig_basis(theta,phi,xm,xn)
+		lt = cosmt.shape[1]
+		lz = cosnz.shape[1]
+		# f = [cos(mt) sin(mt)]^T [fmn*cos(nz) -fmn*sin(nz)]  (cos)
+		# f = [cos(mt) sin(mt)]^T [fmn*sin(nz)  fmn*cos(nz)]  (sin)
+		basis_t = np.concatenate((cosmt,sinmt),axis=0).T
+		f = np.empty((fmn_all.shape[0],lt,lz))
+		nblock = max(1,int(FOURIER_BLOCK_BYTES//(16*mn*lz)))
+		for k1 in range(0,fmn_all.shape[0],nblock):
+			k2 = min(k1+nblock,fmn_all.shape[0])
+			fmn = fmn_all[k1:k2,:,None]
+			lsin_k = lsin[k1:k2,None,None]
+			fnz = np.concatenate((fmn*np.where(lsin_k,sinnz,cosnz), \
+				fmn*np.where(lsin_k,cosnz,-sinnz)),axis=1)
+			np.matmul(basis_t,fnz,out=f[k1:k2])
+		return np.split(f,np.cumsum(nrows)[:-1],axis=0)
+
+	def dfunct(self,theta,phi,fmn_list,xm,xn,parity=None,engine=None,surfaces=None):
+		"""Fused value and angular derivative transformation
+
+		This routine returns a quantity and its derivatives with
+		respect to theta and phi for each array in fmn_list. The
+		derivative series (m*fmn and n*fmn with swapped parity) are
+		stacked with the values and evaluated in a single call to
+		mfunct so all share the same trigonometric tables.
+
+		Parameters
+		----------
+		theta : ndarray
+			Poloidal grid in radians.
+		phi : ndarray
+			Toroidal grid in radians.
+		fmn_list : list
+			List of arrays to transform (radial,fourier)
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		parity : list (optional)
+			'cos' or 'sin' for each array (default: all 'cos')
+		engine : str (optional)
+			'auto', 'fft' or 'matmul' (default: self.fourier_engine)
+		surfaces : int, list or slice (optional)
+			Radial indices to transform (default: all)
+		Returns
+		----------
+		f_list : list
+			List of (f, df/dtheta, df/dphi) tuples, each array
+			(radial,poloidal,toroidal)
+		"""
+		import numpy as np
+		if parity is None:
+			parity = ['cos']*len(fmn_list)
+		mn = np.size(xm)
+		xm2d = np.reshape(xm,(1,mn))
+		xn2d = np.reshape(xn,(1,mn))
+		if surfaces is not None and np.ndim(surfaces) == 0 and not isinstance(surfaces,slice):
+			surfaces = [surfaces]
+		dmn_list = []
+		dparity = []
+		for fmn,p in zip(fmn_list,parity):
+			fmn = np.asarray(fmn).reshape((-1,mn))
+			if surfaces is not None:
+				fmn = fmn[surfaces]
+			# d/du cos(mu+nv) = -m sin(mu+nv), d/du sin(mu+nv) = m cos(mu+nv)
+			if str(p).lower().startswith('s'):
+				sign = 1.0; dp = 'cos'
+			else:
+				sign = -1.0; dp = 'sin'
+			dmn_list.extend([fmn, sign*xm2d*fmn, sign*xn2d*fmn])
+			dparity.extend([p, dp, dp])
+		f = self.mfunct(theta,phi,dmn_list,xm,xn,dparity,engine=engine)
+		return [tuple(f[3*i:3*i+3]) for i in range(len(fmn_list))]
+
+	def mfunct_iter(self,theta,phi,fmn_list,xm,xn,parity=None,engine=None,surfaces=None,chunk=1):
+		"""Streaming cos/sin transformation over radial surfaces
+
+		This generator performs the same transformation as mfunct
+		but yields the result a chunk of radial surfaces at a time.
+		This allows large grids to be reduced (e.g. flux surface
+		averaged) without holding the full (radial,poloidal,toroidal)
+		arrays in memory. The trigonometric tables are shared between
+		chunks through the basis cache.
+
+		Parameters
+		----------
+		theta : ndarray
+			Poloidal grid in radians.
+		phi : ndarray
+			Toroidal grid in radians.
+		fmn_list : list
+			List of arrays to transform (radial,fourier)
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		parity : list (optional)
+			'cos' or 'sin' for each array (default: all 'cos')
+		engine : str (optional)
+			'auto', 'fft' or 'matmul' (default: self.fourier_engine)
+		surfaces : int, list or slice (optional)
+			Radial indices to transform (default: all)
+		chunk : int (optional)
+			Number of surfaces per yield (default: 1)
+		Yields
+		----------
+		k : ndarray
+			Radial indices of the chunk
+		f_list : list
+			Fourier transformed quantities (chunk,poloidal,toroidal)
+		"""
+		import numpy as np
+		ns = np.asarray(fmn_list[0]).reshape((-1,np.size(xm))).shape[0]
+		if surfaces is None:
+			surfaces = np.arange(ns)
+		elif isinstance(surfaces,slice):
+			surfaces = np.arange(ns)[surfaces]
+		else:
+			surfaces = np.atleast_1d(surfaces)
+		for i in range(0,len(surfaces),chunk):
+			k = surfaces[i:i+chunk]
+			yield k, self.mfunct(theta,phi,fmn_list,xm,xn,parity,engine=engine,surfaces=k)
+
+	def pfunct(self,s,theta,phi,fmn_list,xm,xn,parity=None):
+		"""Cos/sin transformation at scattered points
+
+		This routine evaluates the kernel (m*theta+n*phi) at
+		arbitrary points (s,theta,phi). The harmonics are linearly
+		interpolated in s between the radial surfaces, which are
+		assumed to be equally spaced in s on [0,1]. Points are
+		processed in chunks so memory scales with the chunk size
+		rather than the number of points.
+
+		Parameters
+		----------
+		s : ndarray
+			Normalized radial coordinate of the points [0,1].
+		theta : ndarray
+			Poloidal angle of the points in radians.
+		phi : ndarray
+			Toroidal angle of the points in radians.
+		fmn_list : list
+			List of arrays to transform (radial,fourier)
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		parity : list (optional)
+			'cos' or 'sin' for each array (default: all 'cos')
+		Returns
+		----------
+		f_list : list
+			Transformed quantities (same shape as s)
+		"""
+		import numpy as np
+		if parity is None:
+			parity = ['cos']*len(fmn_list)
+		s, theta, phi = np.broadcast_arrays(s,theta,phi)
+		shape = s.shape
+		s = s.ravel()
+		theta = theta.ravel()
+		phi = phi.ravel()
+		xm = np.ravel(xm)
+		xn = np.ravel(xn)
+		mn = xm.size
+		fmn_list = [np.asarray(fmn).reshape((-1,mn)) for fmn in fmn_list]
+		lsin = [str(p).lower().startswith('s') for p in parity]
+		npts = s.size
+		f_list = [np.empty(npts) for fmn in fmn_list]
+		nchunk = max(1,int(FOURIER_BLOCK_BYTES//(32*mn)))
+		for i1 in range(0,npts,nchunk):
+			i2 = min(i1+nchunk,npts)
+			arg = np.outer(theta[i1:i2],xm) + np.outer(phi[i1:i2],xn)
+			cosa = np.cos(arg)
+			sina = np.sin(arg)
+			for fmn,lsin_k,f in zip(fmn_list,lsin,f_list):
+				ns = fmn.shape[0]
+				x = np.clip(s[i1:i2],0.0,1.0)*(ns-1)
+				k = np.clip(np.floor(x).astype(int),0,max(ns-2,0))
+				w = (x-k)[:,None]
+				k2 = np.minimum(k+1,ns-1)
+				cmn = (1.0-w)*fmn[k,:] + w*fmn[k2,:]
+				if lsin_k:
+					f[i1:i2] = np.einsum('ij,ij->i',cmn,sina)
+				else:
+					f[i1:i2] = np.einsum('ij,ij->i',cmn,cosa)
+		return [f.reshape(shape) for f in f_list]
+
+	def _mfunct_fft(self,theta,phi,fmn_all,lsin,xm,xn,fft_t,fft_z):
+		"""FFT engine for mfunct
+
+		The harmonics are scattered onto an (m,n) spectrum which is
+		then inverted with a 2D real FFT for each surface. Harmonics
+		and grids are described by the output of _fft_grid.
+
+		Parameters
+		----------
+		theta : ndarray
+			Poloidal grid in radians.
+		phi : ndarray
+			Toroidal grid in radians.
+		fmn_all : ndarray
+			Array to transform (radial,fourier)
+		lsin : ndarray
+			True where a radial row is a sine series (radial)
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		fft_t : tuple
+			Poloidal FFT description from _fft_grid.
+		fft_z : tuple
+			Toroidal FFT description from _fft_grid.
 		Returns
 		----------
 		f : ndarray
 			Fourier transformed quantity (radial,poloidal,toroidal)
 		"""
 		import numpy as np
-		f=0
-		(ns,mn)=fmnc.shape
-		lt = len(theta)
-		lz = len(phi)
-		mt=np.matmul(xm,theta.T)
-		nz=np.matmul(xn,phi.T)
-		cosmt=np.cos(mt)
-		sinmt=np.sin(mt)
-		cosnz=np.cos(nz)
-		sinnz=np.sin(nz)
-		f = np.zeros((ns,lt,lz))
-		fmn = np.ndarray((mn,lt))
-		for k in range(ns):
-			fmn = np.broadcast_to(fmnc[k,:],(lt,mn)).T
-			f[k,:,:]=np.matmul((fmn*sinmt).T, cosnz)+np.matmul((fmn*cosmt).T, sinnz)
+		lt_fft, pm, t0 = fft_t
+		lz_fft, pn, z0 = fft_z
+		lt = np.size(theta)
+		lz = np.size(phi)
+		nk = fmn_all.shape[0]
+		nh = lz_fft//2+1
+		# Harmonics as complex amplitudes relative to the grid origin
+		# f = Re[ sum fmn*exp(i(m*t+n*z)) ]       (cos)
+		# f = Re[ sum -i*fmn*exp(i(m*t+n*z)) ]    (sin)
+		phase = np.exp(1j*(np.ravel(xm)*t0+np.ravel(xn)*z0))
+		# Hermitian half spectrum: a/2 at (p,q) and conj(a)/2 at (-p,-q)
+		pm2 = (-pm)%lt_fft
+		pn2 = (-pn)%lz_fft
+		k1 = pn < nh
+		k2 = pn2 < nh
+		jt = np.arange(lt)%lt_fft
+		jz = np.arange(lz)%lz_fft
+		f = np.empty((nk,lt,lz))
+		nblock = max(1,int(FOURIER_BLOCK_BYTES//(24*lt_fft*nh)))
+		for i1 in range(0,nk,nblock):
+			i2 = min(i1+nblock,nk)
+			a = (0.5*lt_fft*lz_fft)*fmn_all[i1:i2,:]*phase
+			a = np.where(lsin[i1:i2,None],-1j*a,a)
+			spec = np.zeros((i2-i1,lt_fft,nh),dtype=complex)
+			np.add.at(spec,(slice(None),pm[k1],pn[k1]),a[:,k1])
+			np.add.at(spec,(slice(None),pm2[k2],pn2[k2]),np.conj(a[:,k2]))
+			fg = np.fft.irfft2(spec,s=(lt_fft,lz_fft),axes=(1,2))
+			if lt <= lt_fft and lz <= lz_fft:
+				f[i1:i2] = fg[:,0:lt,0:lz]
+			else:
+				f[i1:i2] = fg[:,jt[:,None],jz[None,:]]
 		return f
-		
+
+	def _fft_grid(self,grid,x):
+		"""Checks if a grid and harmonics can be handled by FFT
+
+		A grid qualifies if it is uniformly spaced with a spacing
+		of 2*pi/L (L integer) and the harmonics are integers. Both
+		endpoint inclusive and exclusive grids qualify. Common
+		factors between the harmonics and L (field periods) are
+		removed so the FFT length is no longer than needed.
+
+		Parameters
+		----------
+		grid : ndarray
+			Angular grid in radians.
+		x : ndarray
+			Harmonic array.
+		Returns
+		----------
+		fft_desc : tuple or None
+			(FFT length, harmonic bin index, grid origin) or None if
+			the grid does not qualify.
+		"""
+		import numpy as np
+		grid = np.ravel(grid)
+		x = np.ravel(x)
+		n = grid.size
+		if n < 2: return None
+		d = grid[1]-grid[0]
+		if d <= 0: return None
+		if not np.allclose(np.diff(grid),d,rtol=0,atol=1E-10): return None
+		l = int(round(2*np.pi/d))
+		if l < 1 or abs(l*d-2*np.pi) > 1E-9: return None
+		xi = np.round(x)
+		if not np.allclose(x,xi,rtol=0,atol=1E-10): return None
+		xi = xi.astype(np.int64)
+		g = int(np.gcd.reduce(np.append(np.abs(xi),l)))
+		l = l//g
+		if l > 2*n: return None
+		return l, (xi//g)%l, grid[0]
+
+	def _trig_basis(self,theta,phi,xm,xn):
+		"""Trigonometric tables for the Fourier transformation
+
+		Returns the cos/sin(m*theta) and cos/sin(n*phi) tables
+		used by the transformation routines. Tables are taken
+		from the process wide FOURIER_BASIS_CACHE when the same
+		harmonics and grid have been seen before.
+
+		Parameters
+		----------
+		theta : ndarray
+			Poloidal grid in radians.
+		phi : ndarray
+			Toroidal grid in radians.
+		xm : ndarray
+			Poloidal harmonic array.
+		xn : ndarray
+			Toroidal harmonic array.
+		Returns
+		----------
+		cosmt : ndarray
+			cos(m*theta) (fourier,poloidal)
+		sinmt : ndarray
+			sin(m*theta) (fourier,poloidal)
+		cosnz : ndarray
+			cos(n*phi) (fourier,toroidal)
+		sinnz : ndarray
+			sin(n*phi) (fourier,toroidal)
+		"""
+		cosmt,sinmt = FOURIER_BASIS_CACHE.get(xm,theta)
+		cosnz,sinnz = FOURIER_BASIS_CACHE.get(xn,phi)
+		return cosmt,sinmt,cosnz,sinnz
+
 	def isotoro(self,r,z,zeta,svals,*args,**kwargs):
 		import numpy as np
 		import matplotlib.pyplot as pyplot
@@ -1384,6 +1804,187 @@ class FourierRep():
 		return vertices,faces
 
 
+class FourierBasisCache():
+	"""Least recently used cache of Fourier basis tables
+
+	This class holds cos(x*grid) and sin(x*grid) tables keyed on a
+	hash of the harmonic and grid arrays. The total size of the
+	stored tables is bounded by a byte budget, the least recently
+	used tables are evicted first. A process wide instance
+	(FOURIER_BASIS_CACHE) is used by FourierRep.
+	"""
+	def __init__(self, max_bytes=2**28):
+		from collections import OrderedDict
+		from threading import Lock
+		self.max_bytes = max_bytes
+		self.nbytes = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self._tables = OrderedDict()
+		self._lock = Lock()
+
+	def get(self,x,grid):
+		"""Returns the cos/sin tables for a harmonic set and grid
+
+		Parameters
+		----------
+		x : ndarray
+			Harmonic array.
+		grid : ndarray
+			Angular grid in radians.
+		Returns
+		----------
+		cosxg : ndarray
+			cos(x*grid) (fourier,grid) (read only)
+		sinxg : ndarray
+			sin(x*grid) (fourier,grid) (read only)
+		"""
+		import numpy as np
+		import hashlib
+		x = np.ascontiguousarray(np.ravel(x),dtype=np.float64)
+		grid = np.ascontiguousarray(np.ravel(grid),dtype=np.float64)
+		h = hashlib.sha1(x.tobytes())
+		h.update(grid.tobytes())
+		key = (x.size,grid.size,h.hexdigest())
+		with self._lock:
+			if key in self._tables:
+				self._tables.move_to_end(key)
+				self.hits += 1
+				return self._tables[key]
+			self.misses += 1
+		xg = np.outer(x,grid)
+		tables = (np.cos(xg),np.sin(xg))
+		for t in tables: t.setflags(write=False)
+		nbytes = 2*xg.nbytes
+		with self._lock:
+			if nbytes <= self.max_bytes and key not in self._tables:
+				self._tables[key] = tables
+				self.nbytes += nbytes
+				self._evict()
+		return tables
+
+	def set_budget(self,max_bytes):
+		"""Sets the memory budget of the cache
+
+		Parameters
+		----------
+		max_bytes : int
+			Maximum size of the stored tables [bytes]
+		"""
+		with self._lock:
+			self.max_bytes = max_bytes
+			self._evict()
+
+	def clear(self):
+		"""Empties the cache and resets the statistics"""
+		with self._lock:
+			self._tables.clear()
+			self.nbytes = 0
+			self.hits = 0
+			self.misses = 0
+			self.evictions = 0
+
+	def stats(self):
+		"""Returns cache statistics
+
+		Returns
+		----------
+		stats : dict
+			Dictionary with hits, misses, evictions, entries, nbytes
+			and max_bytes.
+		"""
+		with self._lock:
+			return {'hits':self.hits, 'misses':self.misses, \
+				'evictions':self.evictions, 'entries':len(self._tables), \
+				'nbytes':self.nbytes, 'max_bytes':self.max_bytes}
+
+	def _evict(self):
+		while self.nbytes > self.max_bytes and self._tables:
+			key, tables = self._tables.popitem(last=False)
+			self.nbytes -= sum(t.nbytes for t in tables)
+			self.evictions += 1
+
+FOURIER_BASIS_CACHE = FourierBasisCache()
+
+def wout_array_sizes(scalar_data):
+	"""Returns the names and sizes of the wout 2D arrays
+
+	Parameters
+	----------
+	scalar_data : dict
+		Dictionary with ns, mnmax, mnmax_nyq and iasym
+	Returns
+	----------
+	sizes : dict
+		Dictionary of array shapes (ns,mnmax) keyed by name
+	"""
+	ns = scalar_data['ns']
+	sizes = {}
+	for name in ['rmnc','zmns','lmns']:
+		sizes[name] = (ns,scalar_data['mnmax'])
+	for name in ['bmnc','gmnc','bsupumnc','bsupvmnc',\
+		'bsubsmns','bsubumnc','bsubvmnc','currumnc','currvmnc']:
+		sizes[name] = (ns,scalar_data['mnmax_nyq'])
+	if scalar_data['iasym']:
+		for name in ['rmns','zmnc','lmnc']:
+			sizes[name] = (ns,scalar_data['mnmax'])
+		for name in ['bmns','gmns','bsupumns','bsupvmns',\
+			'bsubsmnc','bsubumns','bsubvmns','currumns','currvmns']:
+			sizes[name] = (ns,scalar_data['mnmax_nyq'])
+	return sizes
+
+def read_netcdf(filename,names=None):
+	"""Reads variables from a netCDF file without LIBSTELL
+
+	This routine reads variables directly from a netCDF file.
+	Classic (and 64-bit offset) files are memory mapped through
+	scipy so only the requested variables are touched, netCDF4
+	files are read through h5py. Variables not in the file are
+	skipped. Scalars are returned as python values and character
+	arrays as stripped strings.
+
+	Parameters
+	----------
+	filename : str
+		Path to netCDF file.
+	names : list (optional)
+		Names of variables to read (default: all)
+	Returns
+	----------
+	out_data : dict
+		Dictionary of variables
+	"""
+	import numpy as np
+	out_data = {}
+	def convert(val):
+		if val.dtype.kind == 'S':
+			return b''.join(np.atleast_1d(val).ravel()).decode('UTF-8').strip()
+		if val.ndim == 0:
+			return val.item()
+		return np.array(val)
+	with open(filename,'rb') as f:
+		lhdf5 = f.read(4) == b'\x89HDF'
+	if lhdf5:
+		import h5py
+		with h5py.File(filename,'r') as f:
+			if names is None: names = list(f.keys())
+			for name in names:
+				if name in f:
+					out_data[name] = convert(np.asarray(f[name][()]))
+	else:
+		from scipy.io import netcdf_file
+		with netcdf_file(filename,'r',mmap=True) as f:
+			if names is None: names = list(f.variables.keys())
+			for name in names:
+				if name in f.variables:
+					var = f.variables[name]
+					val = var.getValue() if var.shape == () else var[:]
+					out_data[name] = convert(np.asarray(val))
+			# Release references to the memory map before closing
+			var = val = None
+	return out_data
+
 # Main routine
 if __name__=="__main__":
 	import sys
@@ -0,0 +1,252 @@
+##!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This library provides a python class for generating, reading and
+writing VMEC mgrid (vacuum field) files.
+"""
+
+# Libraries
+from libstell.libstell import read_netcdf
+
+# Constants
+
+# Coil segments of each group, set in the worker processes
+_MGRID_COILS = None
+
+# MGRID Class
+class MGRID():
+	"""Class for working with mgrid files
+
+	The vacuum field of each coil group is stored on a cylindrical
+	grid over one field period, the arrays br, bp and bz have the
+	shape (nextcur,kp,jz,ir) as in the netCDF file.
+	"""
+	def __init__(self):
+		self.ir = None
+		self.jz = None
+		self.kp = None
+		self.nfp = None
+		self.nextcur = None
+		self.rmin = None
+		self.rmax = None
+		self.zmin = None
+		self.zmax = None
+		self.coil_group = []
+		self.mgrid_mode = 'S'
+		self.raw_coil_cur = None
+		self.br = None
+		self.bp = None
+		self.bz = None
+
+	def read_mgrid(self,filename):
+		"""Reads a netCDF mgrid file
+
+		This routine reads a netCDF mgrid file into the class.
+
+		Parameters
+		----------
+		filename : str
+			Path to mgrid file.
+		"""
+		import numpy as np
+		file_data = read_netcdf(filename)
+		for temp in ['ir','jz','kp','nfp','nextcur']:
+			setattr(self, temp, int(file_data[temp]))
+		for temp in ['rmin','rmax','zmin','zmax']:
+			setattr(self, temp, float(file_data[temp]))
+		self.mgrid_mode = file_data.get('mgrid_mode','N')
+		self.raw_coil_cur = np.ravel(file_data.get('raw_coil_cur',np.ones(self.nextcur)))
+		# Names are stored as fixed length strings, read_netcdf joins them
+		names = file_data.get('coil_group','')
+		self.coil_group = [names[i:i+30].strip() for i in range(0,30*self.nextcur,30)]
+		shape = (self.nextcur,self.kp,self.jz,self.ir)
+		self.br = np.zeros(shape); self.bp = np.zeros(shape); self.bz = np.zeros(shape)
+		for ig in range(self.nextcur):
+			self.br[ig] = file_data[f'br_{ig+1:03d}']
+			self.bp[ig] = file_data[f'bp_{ig+1:03d}']
+			self.bz[ig] = file_data[f'bz_{ig+1:03d}']
+
+	def write_mgrid(self,filename):
+		"""Writes a netCDF mgrid file
+
+		This routine writes the class to a netCDF mgrid file with
+		the variables and dimensions of write_mgrid_nc (MAKEGRID).
+
+		Parameters
+		----------
+		filename : str
+			Path to mgrid file.
+		"""
+		import numpy as np
+		from scipy.io import netcdf_file
+		with netcdf_file(filename,'w') as f:
+			f.createDimension('stringsize',30)
+			f.createDimension('external_coil_groups',self.nextcur)
+			f.createDimension('external_coils',self.nextcur)
+			f.createDimension('dim_00001',1)
+			f.createDimension('rad',self.ir)
+			f.createDimension('zee',self.jz)
+			f.createDimension('phi',self.kp)
+			for temp in ['ir','jz','kp','nfp','nextcur']:
+				f.createVariable(temp,'i',()).data[...] = getattr(self,temp)
+			for temp in ['rmin','zmin','rmax','zmax']:
+				f.createVariable(temp,'d',()).data[...] = getattr(self,temp)
+			names = np.array([list(name[:30].ljust(30)) for name in self.coil_group],dtype='S1')
+			f.createVariable('coil_group','c',('external_coil_groups','stringsize'))[:] = names
+			f.createVariable('mgrid_mode','c',('dim_00001',))[:] = np.array([self.mgrid_mode],dtype='S1')
+			f.createVariable('raw_coil_cur','d',('external_coils',))[:] = self.raw_coil_cur
+			for ig in range(self.nextcur):
+				f.createVariable(f'br_{ig+1:03d}','d',('phi','zee','rad'))[:] = self.br[ig]
+				f.createVariable(f'bp_{ig+1:03d}','d',('phi','zee','rad'))[:] = self.bp[ig]
+				f.createVariable(f'bz_{ig+1:03d}','d',('phi','zee','rad'))[:] = self.bz[ig]
+
+	def calc_mgrid(self,coils,rmin,rmax,zmin,zmax,ir=121,jz=121,kp=36,\
+		mgrid_mode='S',lstell_sym=False,nprocs=None,restart=None,lverb=False):
+		"""Calculates the vacuum field of a coilset on the grid
+
+		This routine replaces MAKEGRID. The field of each coil
+		group is computed on ir x jz x kp points in R, Z and phi
+		over one field period (nfp from the coils file). The
+		phi-planes are distributed over a pool of processes. If
+		a restart directory is given each finished plane is saved
+		there and planes already present (for the same grid and
+		coils) are reused on the next call. With lstell_sym only
+		half of the planes are computed and the rest follow from
+		B(R,-phi,-Z). In scaled ('S') mode the fields are for unit
+		group current, in raw ('R') mode for the currents in the
+		coils file, in both cases raw_coil_cur holds the currents
+		in the coils file.
+
+		Parameters
+		----------
+		coils : COILSET
+			Coilset to compute the field of.
+		rmin : float
+			Minimum radial extent of grid [m]
+		rmax : float
+			Maximum radial extent of grid [m]
+		zmin : float
+			Minimum vertical extent of grid [m]
+		zmax : float
+			Maximum vertical extent of grid [m]
+		ir : int (optional)
+			Number of radial gridpoints (default: 121)
+		jz : int (optional)
+			Number of vertical gridpoints (default: 121)
+		kp : int (optional)
+			Number of toroidal planes per field period (default: 36)
+		mgrid_mode : str (optional)
+			Scaled 'S' or raw 'R' fields (default: 'S')
+		lstell_sym : bool (optional)
+			Assume stellarator symmetry (default: False)
+		nprocs : int (optional)
+			Number of processes (default: number of CPUs)
+		restart : str (optional)
+			Directory for the per plane restart files
+		lverb : bool (optional)
+			Print progress (default: False)
+		"""
+		import os
+		import hashlib
+		import numpy as np
+		if rmin < 0 or rmax <= rmin or zmax <= zmin or kp <= 0:
+			print(' Bad grid extents in calc_mgrid')
+			return
+		if not coils.find_symmetry(lstell_sym=lstell_sym):
+			print(' Coilset does not have the symmetry assumed by calc_mgrid')
+		if lstell_sym:
+			# Grid must be symmetric in Z
+			zmax = max(abs(zmin),abs(zmax))
+			zmin = -zmax
+		self.ir = ir; self.jz = jz; self.kp = kp
+		self.rmin = rmin; self.rmax = rmax
+		self.zmin = zmin; self.zmax = zmax
+		self.nfp = coils.nfp
+		self.nextcur = coils.ngroups
+		self.mgrid_mode = mgrid_mode
+		self.coil_group = [coils.groups[i].name for i in range(coils.ngroups)]
+		self.raw_coil_cur = np.array([coils.groups[i].current for i in range(coils.ngroups)],dtype=float)
+		r = np.linspace(rmin,rmax,ir)
+		z = np.linspace(zmin,zmax,jz)
+		phi = 2.0*np.pi*np.arange(kp)/(kp*self.nfp)
+		# Segments of each group for unit group current
+		xc,yc,zc,seg,cur = coils.segments(np.ones(coils.ngroups))
+		seg_list = [seg[coils.seg_group==ig] for ig in range(coils.ngroups)]
+		cur_list = [cur[coils.seg_group==ig] for ig in range(coils.ngroups)]
+		# Restart files are only valid for the same grid and coils
+		sha = hashlib.sha1(np.array([rmin,rmax,zmin,zmax,ir,jz,kp,self.nfp],dtype=float).tobytes())
+		sha.update(coils.coilHash().encode())
+		key = sha.hexdigest()
+		klist = range(kp//2+1) if lstell_sym else range(kp)
+		bplane = {}
+		if restart:
+			os.makedirs(restart,exist_ok=True)
+			for k in klist:
+				fname = os.path.join(restart,f'mgrid_plane_{k:04d}.npz')
+				if not os.path.exists(fname): continue
+				with np.load(fname) as data:
+					if str(data['key']) == key: bplane[k] = data['b']
+			if lverb and bplane: print(f'  Restarting with {len(bplane)} of {len(klist)} planes')
+		todo = [k for k in klist if k not in bplane]
+		def save(k,b):
+			bplane[k] = b
+			if restart:
+				fname = os.path.join(restart,f'mgrid_plane_{k:04d}.npz')
+				np.savez(fname+'.tmp.npz',b=b,key=key)
+				os.replace(fname+'.tmp.npz',fname)
+			if lverb: print(f'  K = {k+1:4d} (OUT OF {kp:4d})')
+		if nprocs is None: nprocs = os.cpu_count() or 1
+		if nprocs <= 1 or len(todo) <= 1:
+			_mgrid_init(xc,yc,zc,seg_list,cur_list)
+			for k in todo:
+				save(k,_mgrid_plane(r,z,phi[k]))
+		else:
+			from concurrent.futures import ProcessPoolExecutor
+			with ProcessPoolExecutor(max_workers=nprocs,initializer=_mgrid_init,\
+				initargs=(xc,yc,zc,seg_list,cur_list)) as pool:
+				futures = {k:pool.submit(_mgrid_plane,r,z,phi[k]) for k in todo}
+				for k in todo:
+					save(k,futures[k].result())
+		# Assemble (nextcur,kp,jz,ir) arrays
+		b = np.zeros((3,self.nextcur,kp,jz,ir))
+		for k in klist:
+			b[:,:,k] = bplane[k]
+		if lstell_sym:
+			for k in range(1,kp):
+				if k in klist: continue
+				b[:,:,k] = b[:,:,kp-k,::-1,:]
+				b[0,:,k] = -b[0,:,k]
+		if mgrid_mode == 'R':
+			b = b*self.raw_coil_cur[None,:,None,None,None]
+		self.br = b[0]; self.bp = b[1]; self.bz = b[2]
+
+def _mgrid_init(xc,yc,zc,seg_list,cur_list):
+	"""Stores the coil segments of each group for _mgrid_plane"""
+	global _MGRID_COILS
+	_MGRID_COILS = (xc,yc,zc,seg_list,cur_list)
+
+def _mgrid_plane(r,z,phi):
+	"""Computes the cylindrical field of each group on a phi-plane
+
+	Returns
+	----------
+	b : ndarray
+		Field (br,bp,bz) of each group, shape (3,nextcur,jz,ir) [T]
+	"""
+	import numpy as np
+	from libstell.coils import biot_savart
+	xc,yc,zc,seg_list,cur_list = _MGRID_COILS
+	rr,zz = np.meshgrid(r,z)
+	cp = np.cos(phi); sp = np.sin(phi)
+	b = np.zeros((3,len(seg_list),len(z),len(r)))
+	for ig in range(len(seg_list)):
+		bx,by,bz = biot_savart(rr*cp,rr*sp,zz,xc,yc,zc,seg_list[ig],cur_list[ig])
+		b[0,ig] = bx*cp+by*sp
+		b[1,ig] = by*cp-bx*sp
+		b[2,ig] = bz
+	return b
+
+# Main routine
+if __name__=="__main__":
+	import sys
+	sys.exit(0)
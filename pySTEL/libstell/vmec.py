@@ -6,9 +6,28 @@ equilibrium data.
 """
 
 # Libraries
-from libstell.libstell import LIBSTELL, FourierRep
+from libstell.libstell import LIBSTELL, FourierRep, read_netcdf, wout_array_sizes
 
 # Constants
+# read_wout_mod variable names which differ in the netCDF wout file
+WOUT_NETCDF_NAMES = {'lasym':'lasym__logical__','ierr_vmec':'ier_flag',\
+	'betatot':'betatotal','ionlarmor':'IonLarmor','volavgb':'volavgB',\
+	'aminor':'Aminor_p','rmajor':'Rmajor_p','volume':'volume_p',\
+	'itor':'ctor','phip':'phips','overr':'over_r','dmerc':'DMerc',\
+	'dwell':'DWell','dcurr':'DCurr','dgeod':'DGeod'}
+# 2D wout arrays stored on the half grid
+WOUT_HALF_GRID = ['lmns','bmnc','gmnc','bsupumnc','bsupvmnc','bsubsmns',\
+	'bsubumnc','bsubvmnc','lmnc','bmns','gmns','bsupumns','bsupvmns',\
+	'bsubsmnc','bsubumns','bsubvmns']
+
+# Current harmonics computed by read_wout_nc for files before version 9.0
+WOUT_CURRENTS = ['currumnc','currvmnc','currumns','currvmns']
+# Profile types handled by pmass and piota of profile_functions.f,
+# other types fall back to power_series
+PMASS_TYPES = ['power_series','two_power','gauss_trunc','two_lorentz',\
+	'rational','line_segment','cubic_spline','akima_spline','pedestal']
+PIOTA_TYPES = ['power_series','sum_atan','rational','nice_quadratic',\
+	'line_segment','cubic_spline','akima_spline']
 
 # VMEC Class
 class VMEC(FourierRep):
@@ -18,9 +37,13 @@ class VMEC(FourierRep):
 	def __init__(self):
 		super().__init__()
 		self.nfp = None
-		self.libStell = LIBSTELL()
+		try:
+			self.libStell = LIBSTELL()
+		except Exception:
+			# No libstell.so, netCDF files can still be read
+			self.libStell = None
 
-	def read_wout(self,filename):
+	def read_wout(self,filename,lnative=None):
 		"""Reads a VMEC wout_file
 
 		This routine reads and initilizes the VMEC class
@@ -30,11 +53,27 @@ class VMEC(FourierRep):
 		----------
 		file : str
 			Path to wout file.
+		lnative : bool (optional)
+			Read a netCDF wout file directly instead of through
+			LIBSTELL (default: only if libstell.so is unavailable)
 		"""
 		import numpy as np
-		wout_dict = self.libStell.read_wout(filename)
+		if lnative is None: lnative = self.libStell is None
+		if lnative:
+			wout_dict = self.read_wout_netcdf(filename)
+		else:
+			wout_dict = self.libStell.read_wout(filename,lazy=True)
 		for key in wout_dict:
-			setattr(self, key, wout_dict[key])
+			val = wout_dict[key]
+			if isinstance(val,np.ndarray): val = val.copy()
+			setattr(self, key, val)
+		# 2D arrays are pulled on first access (see __getattr__)
+		self._wout_file = filename
+		self._wout_native = lnative
+		self._wout_shapes = wout_array_sizes(wout_dict)
+		for key in self._wout_shapes:
+			self.__dict__.pop(key,None)
+			self.__dict__.pop(key+'_half',None)
 		# (mu-nv) -> (mu+nv)
 		self.xn = -self.xn
 		self.xn_nyq = -self.xn_nyq
@@ -44,27 +83,6 @@ class VMEC(FourierRep):
 		self.vp = self.h2f(self.vp)
 		self.overr = self.h2f(self.overr)
 		self.specw = self.h2f(self.specw)
-		for mn in range(self.mnmax):
-			self.lmns[:,mn] = self.h2f(self.lmns[:,mn])
-		for mn in range(self.mnmax_nyq):
-			self.bmnc[:,mn] = self.h2f(self.bmnc[:,mn])
-			self.gmnc[:,mn] = self.h2f(self.gmnc[:,mn])
-			self.bsupumnc[:,mn] = self.h2f(self.bsupumnc[:,mn])
-			self.bsupvmnc[:,mn] = self.h2f(self.bsupvmnc[:,mn])
-			self.bsubsmns[:,mn] = self.h2f(self.bsubsmns[:,mn])
-			self.bsubumnc[:,mn] = self.h2f(self.bsubumnc[:,mn])
-			self.bsubvmnc[:,mn] = self.h2f(self.bsubvmnc[:,mn])
-		if self.iasym==1:
-			for mn in range(self.mnmax):
-				self.lmnc[:,mn] = self.h2f(self.lmnc[:,mn])
-			for mn in range(self.mnmax_nyq):
-				self.bmns[:,mn] = self.h2f(self.bmns[:,mn])
-				self.gmns[:,mn] = self.h2f(self.gmns[:,mn])
-				self.bsupumns[:,mn] = self.h2f(self.bsupumns[:,mn])
-				self.bsupvmns[:,mn] = self.h2f(self.bsupvmns[:,mn])
-				self.bsubsmnc[:,mn] = self.h2f(self.bsubsmnc[:,mn])
-				self.bsubumns[:,mn] = self.h2f(self.bsubumns[:,mn])
-				self.bsubvmns[:,mn] = self.h2f(self.bsubvmns[:,mn])
 		# Calc Eplasma
 		self.eplasma = 1.5*4*np.pi*np.pi*sum( self.vp * self.presf ) / self.ns
 		# Get mn00
@@ -74,12 +92,155 @@ class VMEC(FourierRep):
 				self.mn00 = mn
 
 
+	def __getattr__(self,name):
+		"""Loads wout harmonic arrays on first access
+
+		The 2D harmonic arrays of a wout file are only pulled from
+		LIBSTELL when first accessed. Arrays stored on the half grid
+		are converted to the full grid at that point, the raw
+		half grid array remains available as name+'_half'
+		(e.g. bmnc_half).
+		"""
+		shapes = self.__dict__.get('_wout_shapes',{})
+		base = name[:-5] if name.endswith('_half') else name
+		if base not in shapes or (base != name and base not in WOUT_HALF_GRID):
+			raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+		if self._wout_native:
+			val = read_netcdf(self._wout_file,[base]).get(base)
+			if val is None and base in WOUT_CURRENTS and self.version_ < 9.0:
+				# Not stored before version 9.0 (see read_wout_nc)
+				self.compute_currents()
+				return self.__dict__[name]
+			if val is None:
+				raise AttributeError(f"'{base}' not found in {self._wout_file}")
+		else:
+			val = self.libStell.get_wout_array(self._wout_file,base,shapes[base])
+		if base in WOUT_HALF_GRID:
+			self.__dict__[base+'_half'] = val
+			self.__dict__[base] = self.h2f(val)
+		else:
+			self.__dict__[base] = val
+		return self.__dict__[name]
+
+	def read_wout_netcdf(self,filename):
+		"""Reads a netCDF wout file without LIBSTELL
+
+		This routine reads the scalars, profiles, mode numbers and
+		strings of a netCDF wout file. The returned dictionary has
+		the same keys, shapes and units as LIBSTELL.read_wout with
+		lazy=True. As no Fortran module state is involved, several
+		files may be read at the same time.
+
+		Parameters
+		----------
+		filename : str
+			Path to wout file.
+		Returns
+		----------
+		wout_dict : dict
+			Dictionary of wout variables
+		"""
+		import numpy as np
+		scalarList = ['lasym','ns','nfp','mpol','ntor','mnmax','mnmax_nyq',\
+			'iasym','ierr_vmec','wb','wp','gamma','pfac','rmax_surf',\
+			'rmin_surf','zmax_surf','aspect','betatot','betapol','betator',\
+			'betaxis','b0','version_','ionlarmor','volavgb','fsql','fsqr',\
+			'fsqz','ftolv','aminor','rmajor','volume','rbtor','rbtor0',\
+			'itor','machsq']
+		profList = ['iotas','iotaf','presf','phipf','chipf','chi','phi','mass',\
+			'pres','beta_vol','phip','buco','bvco','vp','overr','jcuru',\
+			'jcurv','specw','jdotb','dmerc','dwell','dcurr','dgeod','equif']
+		modeList = ['xm','xn','xm_nyq','xn_nyq']
+		charList = ['mgrid_file','input_extension','pmass_type','pcurr_type','piota_type']
+		allList = scalarList+profList+modeList+charList
+		file_names = [WOUT_NETCDF_NAMES.get(temp,temp) for temp in allList]+['wpar']
+		file_data = read_netcdf(filename,file_names)
+		wout_dict = {}
+		for temp in allList:
+			wout_dict[temp] = file_data.get(WOUT_NETCDF_NAMES.get(temp,temp))
+		# Scalars missing from older files
+		for temp in scalarList:
+			if wout_dict[temp] is None: wout_dict[temp] = 0
+		for temp in charList:
+			if wout_dict[temp] is None: wout_dict[temp] = ''
+		if 'lasym__logical__' not in file_data and 'iasym' in file_data:
+			wout_dict['lasym'] = wout_dict['iasym']
+		wout_dict['lasym'] = bool(wout_dict['lasym'])
+		if 'iasym' not in file_data:
+			wout_dict['iasym'] = int(wout_dict['lasym'])
+		# Match the (n,1) shapes of the module arrays
+		ns = wout_dict['ns']
+		for temp in profList:
+			if wout_dict[temp] is None:
+				wout_dict[temp] = np.zeros((ns,1))
+			else:
+				wout_dict[temp] = np.reshape(wout_dict[temp],(ns,1)).astype(float)
+		if 'chipf' not in file_data:
+			wout_dict['chipf'][:] = 1.0E30
+		if wout_dict['xm_nyq'] is None:
+			wout_dict['mnmax_nyq'] = wout_dict['mnmax']
+			wout_dict['xm_nyq'] = wout_dict['xm']
+			wout_dict['xn_nyq'] = wout_dict['xn']
+		for temp in modeList:
+			wout_dict[temp] = np.reshape(wout_dict[temp],(-1,1)).astype(float)
+		# read_wout_nc conversions
+		if 'wpar' in file_data: wout_dict['wp'] = float(file_data['wpar'])
+		wout_dict['lthreed'] = bool(np.any(np.rint(wout_dict['xn']) != 0))
+		wout_dict['lwout_opened'] = True
+		return wout_dict
+
+	def compute_currents(self):
+		"""Computes the current harmonics from the covariant field
+
+		This routine computes currumnc and currvmnc (and for
+		asymmetric equilibria currumns and currvmns), the harmonics
+		of sqrt(g)*J^u and sqrt(g)*J^v on the full grid [A], from
+		the half grid bsubsmn, bsubumn and bsubvmn harmonics. It is
+		a port of Compute_Currents in read_wout_mod, which
+		read_wout_nc uses for wout files older than version 9.0
+		where the currents were not stored.
+		"""
+		import numpy as np
+		mu0 = 4.0E-7*np.pi
+		ns = self.ns
+		ohs = ns-1.0; hs = 1.0/ohs
+		j = np.arange(ns)
+		shalf = np.sqrt(hs*np.maximum(j-0.5,0.0))
+		sfull = np.sqrt(hs*j)
+		xm = np.ravel(self.xm_nyq)
+		# File convention (mu-nv)
+		xn = -np.ravel(self.xn_nyq)
+		lodd = np.mod(np.rint(xm).astype(int),2) == 1
+		k = np.arange(1,ns-1)
+		sh0 = shalf[k][:,None]; sh1 = shalf[k+1][:,None]; sf = sfull[k][:,None]
+		def currents(bs,bu,bv,sign,shu0):
+			# Odd m are averaged with a sqrt(s) weight near the axis
+			t1 = np.where(lodd,0.5*(sh1*bs[k+1]+sh0*bs[k])/sf,0.5*(bs[k+1]+bs[k]))
+			bu0 = bu[k]/shu0; bu1 = bu[k+1]/sh1
+			t2 = np.where(lodd,ohs*(bu1-bu0)*sf+0.25*(bu0+bu1)/sf,ohs*(bu[k+1]-bu[k]))
+			bv0 = bv[k]/sh0; bv1 = bv[k+1]/sh1
+			t3 = np.where(lodd,ohs*(bv1-bv0)*sf+0.25*(bv0+bv1)/sf,ohs*(bv[k+1]-bv[k]))
+			curru = np.zeros((ns,len(xm))); currv = np.zeros((ns,len(xm)))
+			curru[k] = sign*xn*t1-t3
+			currv[k] = sign*xm*t1+t2
+			for temp in [curru,currv]:
+				temp[0] = np.where(xm <= 1,2*temp[1]-temp[2],0.0)
+				temp[-1] = 2*temp[-2]-temp[-3]
+			return curru/mu0, currv/mu0
+		self.__dict__['currumnc'], self.__dict__['currvmnc'] = currents(\
+			self.bsubsmns_half,self.bsubumnc_half,self.bsubvmnc_half,-1.0,sh0)
+		if self.iasym:
+			# Compute_Currents divides bsubumns(js) by shalf(js+1)
+			self.__dict__['currumns'], self.__dict__['currvmns'] = currents(\
+				self.bsubsmnc_half,self.bsubumns_half,self.bsubvmns_half,1.0,sh1)
+
 	def h2f(self,var_half):
 		"""Half to full grid
 
-		This routine takes a 1D field and interpolates it from the half
-		to the full grid. For an ns sized array we assumes that the
-		first index [0]=0 and is just a placeholder.
+		This routine takes a field and interpolates it from the half
+		to the full grid along the first (radial) index. For an ns
+		sized array we assumes that the first index [0]=0 and is just
+		a placeholder.
 
 		Parameters
 		----------
@@ -112,23 +273,62 @@ class VMEC(FourierRep):
 		jll : ndarray
 			Parallel current density [A/m^2]
 		"""
-		b  = self.cfunct(theta,phi,self.bmnc,self.xm_nyq,self.xn_nyq)
-		g  = self.cfunct(theta,phi,self.gmnc,self.xm_nyq,self.xn_nyq)
-		bu = self.cfunct(theta,phi,self.bsubumnc,self.xm_nyq,self.xn_nyq)
-		bv = self.cfunct(theta,phi,self.bsubvmnc,self.xm_nyq,self.xn_nyq)
-		ju = self.cfunct(theta,phi,self.currumnc,self.xm_nyq,self.xn_nyq)
-		jv = self.cfunct(theta,phi,self.currvmnc,self.xm_nyq,self.xn_nyq)
-
+		fmn = [self.bmnc,self.gmnc,self.bsubumnc,self.bsubvmnc,self.currumnc,self.currvmnc]
+		parity = ['cos']*6
+		if (self.iasym==1):
+			fmn.extend([self.bmns,self.gmns,self.bsubumns,self.bsubvmns,self.currumns,self.currvmns])
+			parity.extend(['sin']*6)
+		f = self.mfunct(theta,phi,fmn,self.xm_nyq,self.xn_nyq,parity)
+		b, g, bu, bv, ju, jv = f[0:6]
 		if (self.iasym==1):
-			b  = b + self.sfunct(theta,phi,self.bmns,self.xm_nyq,self.xn_nyq)
-			g  = g + self.sfunct(theta,phi,self.gmns,self.xm_nyq,self.xn_nyq)
-			bu = bu + self.sfunct(theta,phi,self.bsubumns,self.xm_nyq,self.xn_nyq)
-			bv = bv + self.sfunct(theta,phi,self.bsubvmns,self.xm_nyq,self.xn_nyq)
-			ju = ju + self.sfunct(theta,phi,self.currumns,self.xm_nyq,self.xn_nyq)
-			jv = jv + self.sfunct(theta,phi,self.currvmns,self.xm_nyq,self.xn_nyq)
+			b  = b  + f[6]
+			g  = g  + f[7]
+			bu = bu + f[8]
+			bv = bv + f[9]
+			ju = ju + f[10]
+			jv = jv + f[11]
 		jll = (bu*ju+bv*jv)/(g*b)
 		return jll
 
+	def eval_points(self,s,theta,phi,names=['rmnc','zmns']):
+		"""Evaluates VMEC quantities at scattered points
+
+		This routine evaluates Fourier quantities at arbitrary
+		points in VMEC coordinates (s,theta,phi). The harmonics are
+		linearly interpolated in s and the mode sum is done in
+		vectorized chunks of points. Quantities are referenced by
+		the name of their harmonic array ('rmnc','zmns','bmnc',...),
+		the sine or cosine parity and the harmonic set (xm or
+		xm_nyq) are taken from the name and the array size.
+
+		Parameters
+		----------
+		s : ndarray
+			Normalized toroidal flux of the points.
+		theta : ndarray
+			VMEC poloidal angle of the points [rad]
+		phi : ndarray
+			Toroidal angle of the points [rad]
+		names : list (optional)
+			Harmonic arrays to evaluate (default: ['rmnc','zmns'])
+		Returns
+		----------
+		f_list : list
+			Evaluated quantities (same shape as s)
+		"""
+		import numpy as np
+		f_list = [None]*len(names)
+		for xm,xn,mnmax in [(self.xm,self.xn,self.mnmax),(self.xm_nyq,self.xn_nyq,self.mnmax_nyq)]:
+			dex = [i for i,name in enumerate(names) \
+				if f_list[i] is None and getattr(self,name).shape[1] == mnmax]
+			if not dex: continue
+			fmn = [getattr(self,names[i]) for i in dex]
+			parity = ['sin' if names[i].endswith('s') else 'cos' for i in dex]
+			f = self.pfunct(s,theta,phi,fmn,xm,xn,parity)
+			for i,val in zip(dex,f):
+				f_list[i] = val
+		return f_list
+
 	def calc_grad_rhosq(self):
 		"""Compute <|grad(rho)|^2> 
 		This routine flux surface average of |grad(rho)|^2 
@@ -149,31 +349,24 @@ class VMEC(FourierRep):
 		nv = 128
 		theta = np.linspace(0,2*np.pi,nu)
 		phi   = np.linspace(0,2*np.pi,nv)
-		# Create derivatives
-		xm2d  = np.broadcast_to(self.xm,(self.ns,self.mnmax))
-		xn2d  = np.broadcast_to(self.xn,(self.ns,self.mnmax))
-		rumns = - xm2d * self.rmnc
-		rvmns = - xn2d * self.rmnc
-		zumnc =   xm2d * self.zmns
-		zvmnc =   xn2d * self.zmns
+		rho   = np.sqrt(np.linspace(0,1,self.ns))
+		# Values and derivatives
+		fmn = [self.rmnc,self.zmns]
+		parity = ['cos','sin']
 		if self.iasym==1:
-			rumnc =   xm2d * self.rmns
-			rvmnc =   xn2d * self.rmns
-			zumns = - xm2d * self.zmnc
-			zvmns = - xn2d * self.zmnc
-		r = self.cfunct(theta,zeta,self.rmnc,self.xm,self.xn)
-		g = self.cfunct(theta,zeta,self.gmnc,self.xm_nyq,self.xn_nyq)
-		ru = self.sfunct(theta,zeta,rumns,self.xm,self.xn)
-		rv = self.sfunct(theta,zeta,rvmns,self.xm,self.xn)
-		zu = self.cfunct(theta,zeta,zumnc,self.xm,self.xn)
-		zv = self.cfunct(theta,zeta,zvmnc,self.xm,self.xn)
+			fmn.extend([self.rmns,self.zmnc])
+			parity.extend(['sin','cos'])
+		f = self.dfunct(theta,phi,fmn,self.xm,self.xn,parity)
+		r, ru, rv = f[0]
+		z, zu, zv = f[1]
+		g = self.cfunct(theta,phi,self.gmnc,self.xm_nyq,self.xn_nyq)
 		if self.iasym==1:
-			r  = r  + self.sfunct(theta,zeta,self.rmns,self.xm,self.xn)
-			g  = g  + self.sfunct(theta,zeta,self.gmns,self.xm_nyq,self.xn_nyq)
-			ru = ru + self.cfunct(theta,zeta,rumnc,self.xm,self.xn)
-			rv = rv + self.cfunct(theta,zeta,rvmnc,self.xm,self.xn)
-			zu = zu + self.sfunct(theta,zeta,zumns,self.xm,self.xn)
-			zv = zv + self.sfunct(theta,zeta,zvmns,self.xm,self.xn)
+			r  = r  + f[2][0]
+			ru = ru + f[2][1]
+			rv = rv + f[2][2]
+			zu = zu + f[3][1]
+			zv = zv + f[3][2]
+			g  = g  + self.sfunct(theta,phi,self.gmns,self.xm_nyq,self.xn_nyq)
 		# Calc metrics
 		gsr = - zu * r
 		gsp = zu * rv - ru * zv
@@ -207,53 +400,42 @@ class VMEC(FourierRep):
 		nv = 128
 		theta = np.linspace(0,2*np.pi,nu)
 		phi   = np.linspace(0,2*np.pi,nv)
-		# Create derivatives
-		xm2d  = np.broadcast_to(self.xm,(self.ns,self.mnmax))
-		xn2d  = np.broadcast_to(self.xn,(self.ns,self.mnmax))
-		rumns = - xm2d * self.rmnc
-		rvmns = - xn2d * self.rmnc
-		zumnc =   xm2d * self.zmns
-		zvmnc =   xn2d * self.zmns
-		lumnc =   xm2d * self.lmns
-		lvmnc =   xn2d * self.lmns
+		# Values and derivatives
+		fmn = [self.rmnc,self.zmns,self.lmns]
+		parity = ['cos','sin','sin']
 		if self.iasym==1:
-			rumnc =   xm2d * self.rmns
-			rvmnc =   xn2d * self.rmns
-			zumns = - xm2d * self.zmnc
-			zvmns = - xn2d * self.zmnc
-			lumns = - xm2d * self.lmnc
-			lvmns = - xn2d * self.lmnc
-		r = self.cfunct(theta,zeta,self.rmnc,self.xm,self.xn)
-		g = self.cfunct(theta,zeta,self.gmnc,self.xm_nyq,self.xn_nyq)
-		ru = self.sfunct(theta,zeta,rumns,self.xm,self.xn)
-		rv = self.sfunct(theta,zeta,rvmns,self.xm,self.xn)
-		zu = self.cfunct(theta,zeta,zumnc,self.xm,self.xn)
-		zv = self.cfunct(theta,zeta,zvmnc,self.xm,self.xn)
-		lu = self.cfunct(theta,zeta,lumnc,self.xm,self.xn)
-		lv = self.cfunct(theta,zeta,lvmnc,self.xm,self.xn)
+			fmn.extend([self.rmns,self.zmnc,self.lmnc])
+			parity.extend(['sin','cos','cos'])
+		f = self.dfunct(theta,phi,fmn,self.xm,self.xn,parity)
+		r, ru, rv = f[0]
+		z, zu, zv = f[1]
+		l, lu, lv = f[2]
+		g = self.cfunct(theta,phi,self.gmnc,self.xm_nyq,self.xn_nyq)
 		if self.iasym==1:
-			r  = r  + self.sfunct(theta,zeta,self.rmns,self.xm,self.xn)
-			g  = g  + self.sfunct(theta,zeta,self.gmns,self.xm_nyq,self.xn_nyq)
-			ru = ru + self.cfunct(theta,zeta,rumnc,self.xm,self.xn)
-			rv = rv + self.cfunct(theta,zeta,rvmnc,self.xm,self.xn)
-			zu = zu + self.sfunct(theta,zeta,zumns,self.xm,self.xn)
-			zv = zv + self.sfunct(theta,zeta,zvmns,self.xm,self.xn)
-			lu = lu + self.sfunct(theta,zeta,lumns,self.xm,self.xn)
-			lv = lv + self.sfunct(theta,zeta,lvmns,self.xm,self.xn)
+			r  = r  + f[3][0]
+			ru = ru + f[3][1]
+			rv = rv + f[3][2]
+			zu = zu + f[4][1]
+			zv = zv + f[4][2]
+			lu = lu + f[5][1]
+			lv = lv + f[5][2]
+			g  = g  + self.sfunct(theta,phi,self.gmns,self.xm_nyq,self.xn_nyq)
 		# Calc suscpetance matrices
 		scale_fact = 1.0 / ( 4 * np.pi * np.pi )
+		# np.trapezoid replaces np.trapz (deprecated in NumPy 2.0, since removed)
+		trapz = getattr(np,'trapezoid',None) or np.trapz
 		S11 = ( ru * ru + zu * zu)
 		S21 = ( ru * rv + zu * zv)
-		S12 = ( S12 * ( 1.0 + lu ) - S11 * lv )
+		S12 = ( S21 * ( 1.0 + lu ) - S11 * lv )
 		S22 = ( ( rv * rv + zv * zv + r * r ) * ( 1.0 + lu ) - S21 * lv )
-		S11 = np.trapz(S11 / g, x=zeta, axis=2)
-		S12 = np.trapz(S12 / g, x=zeta, axis=2)
-		S21 = np.trapz(S21 / g, x=zeta, axis=2)
-		S22 = np.trapz(S22 / g, x=zeta, axis=2)
-		S11 = np.trapz(S11, x=theta, axis=1)*scale_fact
-		S12 = np.trapz(S12, x=theta, axis=1)*scale_fact
-		S21 = np.trapz(S21, x=theta, axis=1)*scale_fact
-		S22 = np.trapz(S22, x=theta, axis=1)*scale_fact
+		S11 = trapz(S11 / g, x=phi, axis=2)
+		S12 = trapz(S12 / g, x=phi, axis=2)
+		S21 = trapz(S21 / g, x=phi, axis=2)
+		S22 = trapz(S22 / g, x=phi, axis=2)
+		S11 = trapz(S11, x=theta, axis=1)*scale_fact
+		S12 = trapz(S12, x=theta, axis=1)*scale_fact
+		S21 = trapz(S21, x=theta, axis=1)*scale_fact
+		S22 = trapz(S22, x=theta, axis=1)*scale_fact
 		return S11,S12,S21,S22
 
 	def getCurrentPoloidal(self):
@@ -571,7 +753,258 @@ class VMEC_INDATA():
 		#print(d(self))
 		self.libStell.write_indata(filename,out_dict)
 
+	def pmass(self,s):
+		"""Evaluates the pressure profile
+
+		NumPy version of the libstell PMASS function. Supported
+		values of pmass_type are power_series, two_power,
+		gauss_trunc, two_lorentz, rational, line_segment,
+		cubic_spline and akima_spline. As in VMEC, other types
+		(including sum_atan and nice_quadratic) are evaluated as
+		power_series.
+
+		Parameters
+		----------
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
+		Returns
+		-------
+		val : ndarray
+			mu0*Pressure (mu0*pres_scale*mass(s))
+		"""
+		import numpy as np
+		x = self._profile_s(s)
+		val = self._profile_eval(self.pmass_type,x,self.am,self.am_aux_s,self.am_aux_f,PMASS_TYPES)
+		if val is None:
+			print(f'  PMASS_TYPE: {self.pmass_type} not supported, use LIBSTELL.pmass')
+			return None
+		return 4.0E-7*np.pi*self.pres_scale*val
+
+	def piota(self,s):
+		"""Evaluates the rotational transform profile
+
+		NumPy version of the libstell PIOTA function. Supported
+		values of piota_type are power_series, sum_atan, rational,
+		nice_quadratic, line_segment, cubic_spline and
+		akima_spline, other types (including two_power,
+		gauss_trunc and two_lorentz) are evaluated as power_series.
+		As in VMEC the profile is not expanded by bloat and is
+		inverted for lrfp=T.
+
+		Parameters
+		----------
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
+		Returns
+		-------
+		val : ndarray
+			Rotational transform iota(s)
+		"""
+		import numpy as np
+		x = np.asarray(s,dtype=float)
+		val = self._profile_eval(self.piota_type,x,self.ai,self.ai_aux_s,self.ai_aux_f,PIOTA_TYPES)
+		if val is None:
+			print(f'  PIOTA_TYPE: {self.piota_type} not supported, use LIBSTELL.piota')
+			return None
+		if getattr(self,'lrfp',False):
+			with np.errstate(divide='ignore'):
+				val = np.where(val != 0,1.0/val,np.finfo(float).max)
+		return val
+
+	def pcurr(self,s):
+		"""Evaluates the current profile
+
+		NumPy version of the libstell PCURR function. Types
+		describing I'(s) (power_series, two_power, gauss_trunc,
+		line_segment_ip, cubic_spline_ip, akima_spline_ip) are
+		integrated from the axis so that I(s) is returned. Types
+		describing I(s) (power_series_i, sum_atan, rational,
+		line_segment_i, cubic_spline_i, akima_spline_i) are
+		evaluated directly.
 
+		Parameters
+		----------
+		s : real or ndarray
+			Value(s) of normalized toroidal flux
+		Returns
+		-------
+		val : ndarray
+			Enclosed toroidal current I(s) (unnormalized)
+		"""
+		import numpy as np
+		x = self._profile_s(s)
+		ptype = self.pcurr_type.strip().lower()
+		ac = np.ravel(self.ac)
+		val = None
+		if ptype == 'power_series_i':
+			val = x*np.polynomial.polynomial.polyval(x,ac)
+		elif ptype in ['two_power','gauss_trunc']:
+			# Same 10 point Gauss-Legendre quadrature as VMEC
+			t,w = np.polynomial.legendre.leggauss(10)
+			xq = 0.5*x[...,None]*(t+1)
+			if ptype == 'two_power':
+				f = ac[0]*(1.0-xq**ac[1])**ac[2]
+			else:
+				# Unlike pmass this is not normalized to ac(0) on axis
+				f = ac[0]*(np.exp(-(xq/ac[1])**2)-np.exp(-(1.0/ac[1])**2))
+			val = 0.5*x*np.sum(w*f,axis=-1)
+		elif ptype in ['sum_atan','rational']:
+			val = self._profile_eval(ptype,x,ac,None,None)
+		elif ptype in ['line_segment_ip','cubic_spline_ip','akima_spline_ip']:
+			spl = self._profile_spline(ptype[:-3],self.ac_aux_s,self.ac_aux_f)
+			if spl is not None:
+				spl = spl.antiderivative()
+				val = spl(x)-spl(0.0)
+		elif ptype in ['line_segment_i','cubic_spline_i','akima_spline_i']:
+			val = self._profile_eval(ptype[:-2],x,ac,self.ac_aux_s,self.ac_aux_f)
+		elif ptype != 'pedestal':
+			if ptype != 'power_series':
+				print(f'  PCURR_TYPE: {self.pcurr_type} unrecognized, using power_series')
+			i = np.arange(len(ac))
+			val = x*np.polynomial.polynomial.polyval(x,ac/(i+1))
+		if val is None:
+			print(f'  PCURR_TYPE: {self.pcurr_type} not supported, use LIBSTELL.pcurr')
+		return val
+
+	def _profile_s(self,s):
+		"""Returns the profile coordinate min(|s*bloat|,1)"""
+		import numpy as np
+		bloat = getattr(self,'bloat',1.0)
+		return np.minimum(np.abs(np.asarray(s,dtype=float)*bloat),1.0)
+
+	def _profile_eval(self,ptype,x,coefs,aux_s,aux_f,ptypes=None):
+		"""Evaluates a profile function family
+
+		Follows the pmass/piota branches of profile_functions.f,
+		unrecognized types and types not in ptypes fall back to
+		power_series.
+
+		Parameters
+		----------
+		ptype : str
+			Profile type
+		x : ndarray
+			Profile coordinate
+		coefs : ndarray
+			Coefficient array (am, ai, ac)
+		aux_s : ndarray
+			Spline knots (*_aux_s)
+		aux_f : ndarray
+			Spline values (*_aux_f)
+		ptypes : list (optional)
+			Types handled by the profile (default: all)
+		Returns
+		-------
+		val : ndarray
+			Profile values or None if ptype is not supported
+		"""
+		import numpy as np
+		ptype = ptype.strip().lower()
+		a = np.ravel(coefs)
+		if ptypes is not None and ptype not in ptypes:
+			if ptype != 'power_series':
+				print(f'  Profile type {ptype} not available, using power_series')
+			ptype = 'power_series'
+		if ptype == 'two_power':
+			return a[0]*(1.0-x**a[1])**a[2]
+		elif ptype == 'gauss_trunc':
+			edge = np.exp(-(1.0/a[1])**2)
+			return a[0]*(np.exp(-(x/a[1])**2)-edge)/(1.0-edge)
+		elif ptype == 'two_lorentz':
+			def lorentz(y,b,c,d):
+				return 1.0/(1.0+(y/b**2)**c)**d
+			e1 = lorentz(1.0,a[2],a[3],a[4])
+			e2 = lorentz(1.0,a[5],a[6],a[7])
+			return a[0]*(a[1]*(lorentz(x,a[2],a[3],a[4])-e1)/(1.0-e1)\
+				+(1.0-a[1])*(lorentz(x,a[5],a[6],a[7])-e2)/(1.0-e2))
+		elif ptype == 'sum_atan':
+			val = a[0]+0.0*x
+			with np.errstate(divide='ignore',invalid='ignore'):
+				for k in [1,5,9,13,17]:
+					val = val+a[k]*2.0/np.pi*np.arctan(a[k+1]*x**a[k+2]/(1.0-x)**a[k+3])
+			return np.where(x<1.0,val,a[0]+a[1]+a[5]+a[9]+a[13]+a[17])
+		elif ptype == 'rational':
+			num = np.polynomial.polynomial.polyval(x,a[:10])
+			den = np.polynomial.polynomial.polyval(x,a[10:])
+			with np.errstate(divide='ignore',invalid='ignore'):
+				return np.where(den != 0,num/den,np.finfo(float).max)
+		elif ptype == 'nice_quadratic':
+			return a[0]*(1.0-x)+a[1]*x+4*a[2]*x*(1.0-x)
+		elif ptype in ['line_segment','cubic_spline','akima_spline']:
+			spl = self._profile_spline(ptype,aux_s,aux_f)
+			return None if spl is None else spl(x)
+		elif ptype == 'pedestal':
+			return None
+		if ptype != 'power_series':
+			print(f'  Profile type {ptype} unrecognized, using power_series')
+		return np.polynomial.polynomial.polyval(x,a)
+
+	def _profile_spline(self,ptype,aux_s,aux_f):
+		"""Builds the piecewise polynomial of a spline profile
+
+		The knots are the leading increasing part of aux_s. As in
+		spline_cubic.f the cubic spline is clamped with the end
+		slopes of quadratic fits to the first and last three
+		points. As in spline_akima.f the Akima spline adds two
+		ghost points at each end on the quadratic extrapolation
+		of the first and last three points.
+
+		Parameters
+		----------
+		ptype : str
+			Lower case profile type (line_segment, cubic_spline, akima_spline)
+		aux_s : ndarray
+			Spline knots
+		aux_f : ndarray
+			Spline values
+		Returns
+		-------
+		spl : PPoly
+			Piecewise polynomial or None if ptype is not a spline
+		"""
+		import numpy as np
+		from scipy.interpolate import PPoly, CubicSpline
+		if ptype not in ['line_segment','cubic_spline','akima_spline'] or aux_s is None:
+			return None
+		xs = np.ravel(aux_s)
+		ys = np.ravel(aux_f)
+		n = len(xs)
+		for i in range(1,len(xs)):
+			if xs[i] <= xs[i-1]:
+				n = i
+				break
+		xs = xs[:n]
+		ys = ys[:n]
+		h = np.diff(xs)
+		dy = np.diff(ys)/h
+		if ptype == 'line_segment' or n < 3:
+			return PPoly(np.vstack((dy,ys[:-1])),xs)
+		# Quadratic through the first (last) three points
+		cl = (dy[1]-dy[0])/(xs[2]-xs[0])
+		bl = dy[0]-cl*h[0]
+		cr = (dy[-2]-dy[-1])/(xs[-1]-xs[-3])
+		br = dy[-2]-cr*h[-2]
+		if ptype == 'cubic_spline':
+			yp1 = dy[0]-cl*h[0]
+			ypn = dy[-1]-cr*h[-1]
+			spl = CubicSpline(xs,ys,bc_type=((1,yp1),(1,ypn)))
+			return PPoly(spl.c,spl.x)
+		# Ghost points of spline_akima
+		xl = np.array([2*xs[0]-xs[2],xs[0]+xs[1]-xs[2]])
+		xr = np.array([xs[-1]+xs[-2]-xs[-3],2*xs[-1]-xs[-3]])
+		yl = ys[0]+bl*(xl-xs[0])+cl*(xl-xs[0])**2
+		yr = ys[-1]+br*(xr-xs[-1])+cr*(xr-xs[-1])**2
+		xg = np.concatenate((xl,xs,xr))
+		m = np.diff(np.concatenate((yl,ys,yr)))/np.diff(xg)
+		dm = np.abs(np.diff(m))
+		# Weights of the slopes left (m[i+1]) and right (m[i+2]) of knot i
+		wl = dm[2:n+2]
+		wr = dm[0:n]
+		w = wl+wr
+		with np.errstate(divide='ignore',invalid='ignore'):
+			t = np.where(w > 0,(wl*m[1:n+1]+wr*m[2:n+2])/w,0.5*(m[1:n+1]+m[2:n+2]))
+		c = np.vstack(((t[1:]+t[:-1]-2*dy)/h**2,(3*dy-t[1:]-2*t[:-1])/h,t[:-1],ys[:-1]))
+		return PPoly(c,xs)
 
 # Main routine
 if __name__=="__main__":
@@ -47,26 +47,16 @@ class WALL(LIBSTELL):
 			print("Bad Synatx line 2 in wall file")
 		n1, n2 = lines[2].split()
 		i1 = 3
-		if (n1 == 0 and n2 == 0):
+		if (int(n1) == 0 and int(n2) == 0):
 			self.laccel = True
 			n1, n2 = lines[3].split()
 			i1 = 4
 		self.nvertex = int(n1)
 		self.nfaces  = int(n2)
-		self.vertex  = np.zeros((self.nvertex,3))
-		self.faces   = np.zeros((self.nfaces,3))
-		for i in range(self.nvertex):
-			line = lines[i+i1].split()
-			self.vertex[0,i] = float(line[0])
-			self.vertex[1,i] = float(line[1])
-			self.vertex[2,i] = float(line[2])
+		self.vertex  = np.loadtxt(lines[i1:i1+self.nvertex],ndmin=2)[:,0:3]
 		i1 = i1 + self.nvertex
-		for i in range(self.nfaces):
-			line = lines[i+i1].split()
-			# note we convert to python indexing
-			self.faces[0,i] = int(line[0])-1
-			self.faces[1,i] = int(line[1])-1
-			self.faces[2,i] = int(line[2])-1
+		# note we convert to python indexing
+		self.faces   = np.loadtxt(lines[i1:i1+self.nfaces],dtype=int,ndmin=2)[:,0:3]-1
 
 	def write_wall(self,filename):
 		"""Directly writes a wall file
@@ -0,0 +1,252 @@
+##!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+This library provides a python class for analysing the wall strikes
+and heat loads of FIELDLINES and BEAMS3D runs on triangulated walls.
+"""
+
+# Libraries
+
+# Constants
+
+# WALLSTATS Class
+class WALLSTATS():
+	"""Class for wall strike and heat load statistics
+
+	The geometry of the faces (area, unit normal, centroid and its
+	cylindrical coordinates) is computed once in set_mesh, all
+	reductions over faces are vectorized.
+	"""
+	def __init__(self):
+		self.nvertex = None
+		self.nface = None
+		self.vertex = None
+		self.faces = None
+		self.area = None
+		self.normal = None
+		self.centroid = None
+		self.r = None
+		self.phi = None
+		self.z = None
+		self.strikes = None
+		self.load = None
+		self.shine = None
+
+	def set_mesh(self,vertex,faces):
+		"""Sets the wall mesh and computes the face geometry
+
+		Parameters
+		----------
+		vertex : ndarray
+			Vertices (nvertex,3) [m]
+		faces : ndarray
+			Vertex indices of each face (nface,3), starting at 0
+		"""
+		import numpy as np
+		self.vertex = np.asarray(vertex,dtype=float)
+		self.faces = np.asarray(faces,dtype=int)
+		self.nvertex = self.vertex.shape[0]
+		self.nface = self.faces.shape[0]
+		v0 = self.vertex[self.faces[:,0]]
+		v1 = self.vertex[self.faces[:,1]]
+		v2 = self.vertex[self.faces[:,2]]
+		n = np.cross(v1-v0,v2-v0)
+		nn = np.sqrt(np.sum(n*n,axis=1))
+		self.area = 0.5*nn
+		with np.errstate(divide='ignore',invalid='ignore'):
+			self.normal = np.where(nn[:,None]>0,n/nn[:,None],0.0)
+		self.centroid = (v0+v1+v2)/3.0
+		self.r = np.sqrt(self.centroid[:,0]**2+self.centroid[:,1]**2)
+		self.phi = np.mod(np.arctan2(self.centroid[:,1],self.centroid[:,0]),2*np.pi)
+		self.z = self.centroid[:,2]
+
+	def read_wall(self,wall):
+		"""Sets the mesh from a WALL object
+
+		Parameters
+		----------
+		wall : WALL
+			Wall read with WALL.read_wall
+		"""
+		self.set_mesh(wall.vertex,wall.faces)
+
+	def read_data(self,data):
+		"""Sets the mesh and loads from a FIELDLINES or BEAMS3D run
+
+		The wall_vertex and wall_faces (Fortran indexing) of the
+		run define the mesh, wall_strikes (strikes per face),
+		wall_load and wall_shine (per beam and face [W/m^2]) are
+		stored with shapes (nface) and (nbeams,nface) if present.
+
+		Parameters
+		----------
+		data : FIELDLINES or BEAMS3D
+			Run read with read_fieldlines or read_beams3d
+		"""
+		import numpy as np
+		vertex = np.asarray(data.wall_vertex)
+		faces = np.asarray(data.wall_faces)
+		if vertex.shape[0] == 3 and vertex.shape[1] != 3: vertex = vertex.T
+		if faces.shape[0] == 3 and faces.shape[1] != 3: faces = faces.T
+		self.set_mesh(vertex,faces-1)
+		if hasattr(data,'wall_strikes'):
+			self.strikes = np.ravel(data.wall_strikes)
+		for temp in ['wall_load','wall_shine']:
+			if hasattr(data,temp):
+				val = np.atleast_2d(getattr(data,temp))
+				if val.shape[1] != self.nface: val = val.T
+				setattr(self,temp[5:],val)
+
+	def face_sum(self,face,weights=None):
+		"""Sums markers or weights onto the faces
+
+		Parameters
+		----------
+		face : ndarray
+			Face index (starting at 0) of each strike, negative
+			values are ignored.
+		weights : ndarray (optional)
+			Weight (e.g. power [W]) of each strike (default: 1)
+		Returns
+		----------
+		total : ndarray
+			Number or summed weight of the strikes on each face
+		"""
+		import numpy as np
+		face = np.ravel(face).astype(int)
+		lhit = face >= 0
+		if weights is not None: weights = np.ravel(weights)[lhit]
+		return np.bincount(face[lhit],weights=weights,minlength=self.nface)
+
+	def flux(self,power):
+		"""Converts power per face to heat flux density
+
+		Parameters
+		----------
+		power : ndarray
+			Power on each face (...,nface) [W]
+		Returns
+		----------
+		flux : ndarray
+			Heat flux density on each face [W/m^2]
+		"""
+		import numpy as np
+		with np.errstate(divide='ignore',invalid='ignore'):
+			return np.where(self.area>0,power/self.area,0.0)
+
+	def power(self,flux):
+		"""Converts heat flux density to power per face
+
+		Parameters
+		----------
+		flux : ndarray
+			Heat flux density on each face (...,nface) [W/m^2]
+		Returns
+		----------
+		power : ndarray
+			Power on each face [W]
+		"""
+		return flux*self.area
+
+	def binned_map(self,values,nphi=72,ntheta=36,r0=None,z0=None,lflux=True):
+		"""Bins face values in toroidal and poloidal angle
+
+		The faces are binned by the toroidal angle of their
+		centroid and the poloidal angle of the centroid about
+		(r0,z0). For heat flux densities (lflux) each bin holds the
+		area weighted mean, otherwise the sum of the values.
+
+		Parameters
+		----------
+		values : ndarray
+			Value on each face (nface)
+		nphi : int (optional)
+			Number of toroidal bins over 2*pi (default: 72)
+		ntheta : int (optional)
+			Number of poloidal bins over 2*pi (default: 36)
+		r0 : float (optional)
+			Radius of the poloidal center (default: area weighted
+			mean radius of the faces) [m]
+		z0 : float (optional)
+			Height of the poloidal center (default: area weighted
+			mean height of the faces) [m]
+		lflux : bool (optional)
+			Values are flux densities (default: True)
+		Returns
+		----------
+		phi_edges : ndarray
+			Toroidal bin edges [rad]
+		theta_edges : ndarray
+			Poloidal bin edges [rad]
+		binned : ndarray
+			Binned values (nphi,ntheta)
+		"""
+		import numpy as np
+		if r0 is None: r0 = np.sum(self.r*self.area)/np.sum(self.area)
+		if z0 is None: z0 = np.sum(self.z*self.area)/np.sum(self.area)
+		theta = np.mod(np.arctan2(self.z-z0,self.r-r0),2*np.pi)
+		ip = np.minimum((self.phi*nphi/(2*np.pi)).astype(int),nphi-1)
+		it = np.minimum((theta*ntheta/(2*np.pi)).astype(int),ntheta-1)
+		ibin = ip*ntheta+it
+		values = np.ravel(values)
+		if lflux:
+			binned = np.bincount(ibin,weights=values*self.area,minlength=nphi*ntheta)
+			area = np.bincount(ibin,weights=self.area,minlength=nphi*ntheta)
+			with np.errstate(divide='ignore',invalid='ignore'):
+				binned = np.where(area>0,binned/area,0.0)
+		else:
+			binned = np.bincount(ibin,weights=values,minlength=nphi*ntheta)
+		phi_edges = np.linspace(0,2*np.pi,nphi+1)
+		theta_edges = np.linspace(0,2*np.pi,ntheta+1)
+		return phi_edges, theta_edges, binned.reshape((nphi,ntheta))
+
+	def hot_spots(self,flux,n=10):
+		"""Returns the faces with the highest heat flux
+
+		Parameters
+		----------
+		flux : ndarray
+			Heat flux density on each face (nface) [W/m^2]
+		n : int (optional)
+			Number of faces (default: 10)
+		Returns
+		----------
+		table : dict
+			face, flux, power, area, r, phi and z of the n faces,
+			sorted by decreasing flux.
+		"""
+		import numpy as np
+		flux = np.ravel(flux)
+		n = min(n,self.nface)
+		idx = np.argpartition(-flux,n-1)[0:n]
+		idx = idx[np.argsort(-flux[idx])]
+		return {'face':idx,'flux':flux[idx],'power':flux[idx]*self.area[idx],\
+			'area':self.area[idx],'r':self.r[idx],'phi':self.phi[idx],'z':self.z[idx]}
+
+	def summary(self,flux):
+		"""Returns global statistics of a heat flux distribution
+
+		Parameters
+		----------
+		flux : ndarray
+			Heat flux density on each face (nface) [W/m^2]
+		Returns
+		----------
+		stats : dict
+			total_power [W], peak_flux [W/m^2], wetted_area [m^2]
+			(faces with flux > 0), mean_flux on the wetted area
+			[W/m^2] and peaking (peak over mean flux).
+		"""
+		import numpy as np
+		flux = np.ravel(flux)
+		total = np.sum(flux*self.area)
+		wetted = np.sum(self.area[flux>0])
+		peak = np.max(flux) if self.nface > 0 else 0.0
+		mean = total/wetted if wetted > 0 else 0.0
+		return {'total_power':total,'peak_flux':peak,'wetted_area':wetted,\
+			'mean_flux':mean,'peaking':peak/mean if mean > 0 else 0.0}
+
+# Main routine
+if __name__=="__main__":
+	import sys
+	sys.exit(0)
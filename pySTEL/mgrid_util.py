@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+
+if __name__=="__main__":
+	import sys, os
+	from argparse import ArgumentParser
+	from libstell.coils import COILSET
+	from libstell.mgrid import MGRID
+	parser = ArgumentParser(description=
+		'''Generates a VMEC mgrid file from a coils file (replaces
+		   MAKEGRID). The phi-planes are computed in parallel and
+		   can be restarted.''')
+	parser.add_argument("-c", "--coil", dest="coils_file",
+		help="Coils file for input (coils.ext)", default = None)
+	parser.add_argument("--rmin", dest="rmin", type=float,
+		help="Minimum radius of grid [m]", default = None)
+	parser.add_argument("--rmax", dest="rmax", type=float,
+		help="Maximum radius of grid [m]", default = None)
+	parser.add_argument("--zmin", dest="zmin", type=float,
+		help="Minimum height of grid [m]", default = None)
+	parser.add_argument("--zmax", dest="zmax", type=float,
+		help="Maximum height of grid [m]", default = None)
+	parser.add_argument("--ir", dest="ir", type=int,
+		help="Number of radial gridpoints", default = 121)
+	parser.add_argument("--jz", dest="jz", type=int,
+		help="Number of vertical gridpoints", default = 121)
+	parser.add_argument("--kp", dest="kp", type=int,
+		help="Number of toroidal planes per field period", default = 36)
+	parser.add_argument("-r", "--raw", dest="lraw", action='store_true',
+		help="Raw (R) instead of scaled (S) mgrid mode.", default = False)
+	parser.add_argument("-s", "--stelsym", dest="lstell_sym", action='store_true',
+		help="Assume stellarator symmetry.", default = False)
+	parser.add_argument("-n", "--nprocs", dest="nprocs", type=int,
+		help="Number of processes", default = None)
+	parser.add_argument("--restart", dest="restart",
+		help="Directory for per plane restart files", default = None)
+	args = parser.parse_args()
+	if args.coils_file:
+		if None in [args.rmin, args.rmax, args.zmin, args.zmax]:
+			print('  --rmin, --rmax, --zmin and --zmax must be set')
+			sys.exit(1)
+		coils = COILSET()
+		coils.read_coils_file(args.coils_file)
+		ext = os.path.basename(args.coils_file)
+		if ext.startswith('coils.'): ext = ext[6:]
+		mgrid_mode = 'R' if args.lraw else 'S'
+		mgrid = MGRID()
+		mgrid.calc_mgrid(coils,args.rmin,args.rmax,args.zmin,args.zmax,\
+			ir=args.ir,jz=args.jz,kp=args.kp,mgrid_mode=mgrid_mode,\
+			lstell_sym=args.lstell_sym,nprocs=args.nprocs,\
+			restart=args.restart,lverb=True)
+		mgrid.write_mgrid(f'mgrid_{ext}.nc')
+		# Currents for the INDATA namelist
+		f = open(f'extcur.{ext}','w')
+		for i in range(mgrid.nextcur):
+			if mgrid_mode == 'R':
+				f.write(f"EXTCUR({i+1}) = {mgrid.raw_coil_cur[i]:22.14E}/{mgrid.raw_coil_cur[i]:22.14E}\n")
+			else:
+				f.write(f"EXTCUR({i+1}) = {mgrid.raw_coil_cur[i]:22.14E}\n")
+		f.close()
+		print(f'  Wrote mgrid_{ext}.nc and extcur.{ext}')
@@ -12,7 +12,8 @@ setup(name='pySTEL',
 	url = 'https://github.com/PrincetonUniversity/STELLOPT',
 	packages=['libstell'],
 	scripts = ['VMECplot.py','FIELDLINESplot.py','vmec_util.py',\
-		'boozer_util.py','coils_util.py','fieldlines_util.py'],
+		'boozer_util.py','coils_util.py','fieldlines_util.py',\
+		'mgrid_util.py'],
 	install_requires=['numpy','matplotlib','PyQt5','scipy', \
 		'contourpy']
 	)
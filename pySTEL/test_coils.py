@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the COILSET symmetry routines on the NCSX coils of the
+FIELDLINES benchmark. COILSET needs STELLOPT_PATH (libstell.so).
+"""
+
+import os
+import numpy as np
+import pytest
+
+COILS_NCSX = os.path.join(os.path.dirname(os.path.abspath(__file__)),\
+	'..','BENCHMARKS','FIELDLINES_TEST','coils.NCSX')
+
+@pytest.fixture(scope='module')
+def ncsx():
+	if 'STELLOPT_PATH' not in os.environ: pytest.skip('STELLOPT_PATH not set')
+	from libstell.coils import COILSET
+	coils = COILSET()
+	coils.read_coils_file(COILS_NCSX)
+	return coils
+
+def test_find_symmetry_ncsx(ncsx):
+	# PF coils 42 and 43 are concentric (same centroid)
+	assert ncsx.nfp == 3
+	assert ncsx.find_symmetry(lstell_sym=False)
+	assert ncsx.find_symmetry(lstell_sym=True)
+	assert ncsx.sym_stell
+
+def test_coilbiot_sym_ncsx(ncsx):
+	r = np.linspace(1.0,2.0,5)
+	phi = np.linspace(0,2*np.pi,4*ncsx.nfp,endpoint=False)
+	z = np.linspace(-0.6,0.6,5)
+	r, phi, z = np.meshgrid(r,phi,z,indexing='ij')
+	x = r*np.cos(phi); y = r*np.sin(phi)
+	b0 = ncsx.coilbiot(x,y,z)
+	b1 = ncsx.coilbiot_sym(x,y,z)
+	bmax = np.max(np.abs(b0))
+	for f0,f1 in zip(b0,b1):
+		assert np.max(np.abs(f1-f0)) < 1.0E-8*bmax
+
+@pytest.mark.parametrize('rmin,rmax',[(1.2,1.8),(3.5,5.0)])
+def test_coilbiot_tree_ncsx(ncsx,rmin,rmax):
+	# Points in the plasma region and outside the coils
+	rng = np.random.default_rng(1)
+	r = rng.uniform(rmin,rmax,4000)
+	phi = rng.uniform(0,2*np.pi,4000)
+	z = rng.uniform(-0.4,0.4,4000)
+	x = r*np.cos(phi); y = r*np.sin(phi)
+	b0 = np.array(ncsx.coilbiot(x,y,z))
+	b1 = np.array(ncsx.coilbiot_tree(x,y,z))
+	err = np.sqrt(np.sum((b1-b0)**2,axis=0)/np.sum(b0*b0,axis=0))
+	assert np.max(err) < 1.0E-3
+	# Few points are summed exactly
+	b1 = np.array(ncsx.coilbiot_tree(x[:10],y[:10],z[:10]))
+	assert np.allclose(b1,b0[:,:10],rtol=1.0E-12,atol=0)
+
+def test_unit_cache_ncsx(ncsx):
+	from libstell.coils import UNIT_CACHE_SIZE
+	ncsx.unit_cache.clear()
+	x = np.linspace(1.2,1.8,3)
+	b = [ncsx.unit_bfield(x,0.0,0.01*i) for i in range(UNIT_CACHE_SIZE+1)]
+	assert len(ncsx.unit_cache) == UNIT_CACHE_SIZE
+	# A hit keeps the entry, the least recently used one is dropped
+	assert ncsx.unit_bfield(x,0.0,0.01) is b[1]
+	ncsx.unit_bfield(x,0.0,-0.01)
+	assert len(ncsx.unit_cache) == UNIT_CACHE_SIZE
+	assert ncsx.unit_bfield(x,0.0,0.01) is b[1]
+	assert ncsx.unit_bfield(x,0.0,0.02) is not b[2]
+	b0 = np.array(ncsx.coilbiot(x,0.0,0.02))
+	assert np.allclose(np.array(ncsx.coilbiot(x,0.0,0.02,lcache=True)),b0,rtol=1.0E-10,atol=1.0E-12)
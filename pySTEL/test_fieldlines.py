@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the FIELDLINES rotational transform on synthetic field
+lines about a straight axis.
+"""
+
+import numpy as np
+import pytest
+
+def make_lines(nsteps=100001,nturns=500):
+	from libstell.fieldlines import FIELDLINES
+	iota = np.array([0.0,0.41,0.43,0.47,0.52,0.55])
+	a = np.array([0.0,0.02,0.05,0.1,0.15,0.2])
+	# Small modulations give residuals well below sqrt(eps)*theta
+	eps = np.array([0.0,1.0E-5,3.0E-6,1.0E-6,1.0E-7,0.0])
+	phi = np.linspace(0,2*np.pi*nturns,nsteps)[:,None]+0.0*a
+	theta = iota*phi+eps*np.sin(5*phi)
+	lines = FIELDLINES()
+	lines.nsteps = nsteps
+	lines.nlines = len(a)
+	lines.R_lines = 1.5+a*np.cos(theta)
+	lines.Z_lines = a*np.sin(theta)
+	lines.PHI_lines = phi
+	# Last line lost halfway
+	lines.R_lines[nsteps//2:,-1] = 0.0
+	return lines
+
+def polyfit_iota(lines):
+	iota = np.zeros(lines.nlines); iota_err = np.zeros(lines.nlines)
+	x = lines.R_lines-lines.R_lines[:,0:1]
+	y = lines.Z_lines-lines.Z_lines[:,0:1]
+	for i in range(1,lines.nlines):
+		lvalid = lines.R_lines[:,i] > 0
+		theta = np.unwrap(np.arctan2(y[lvalid,i],x[lvalid,i]))
+		theta = theta-theta[0]
+		p, res, rank, sv, rcond = np.polyfit(lines.PHI_lines[lvalid,i],theta,1,full=True)
+		iota[i] = p[0]; iota_err[i] = np.sqrt(res[0])
+	return iota, iota_err
+
+@pytest.mark.parametrize('nchunk',[None,37,4096])
+def test_calc_iota(nchunk):
+	lines = make_lines()
+	iota0, iota_err0 = polyfit_iota(lines)
+	reff, iota, iota_err = lines.calc_iota(nchunk)
+	assert np.allclose(iota[1:],iota0[1:],rtol=1.0E-12,atol=0)
+	assert np.allclose(iota_err[1:],iota_err0[1:],rtol=1.0E-6,atol=1.0E-9)
+	assert np.allclose(reff[1:],[0.02,0.05,0.1,0.15,0.2],rtol=1.0E-12)
+	assert np.allclose(lines.calc_reff(nchunk),reff,rtol=1.0E-12)
+
+def test_read_poincare_memory():
+	# Without a file the sections come from the arrays in memory
+	lines = make_lines(nsteps=1001,nturns=10)
+	lines.npoinc = 100
+	r, x = lines.read_poincare(3,nskip=2,names=('R_lines','X_lines'))
+	assert np.array_equal(r,lines.R_lines[3:1000:100,0:6:2])
+	assert np.array_equal(x,lines.X_lines[3:1000:100,0:6:2])
+	del lines.R_lines
+	with pytest.raises(AttributeError):
+		lines.read_poincare(0)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tests of the VMEC_INDATA profile functions against values of the
+libstell spline_cubic, spline_akima, spline_cubic_int and
+spline_akima_int routines. VMEC_INDATA needs STELLOPT_PATH
+(libstell.so).
+"""
+
+import os
+import numpy as np
+import pytest
+
+MU0 = 4.0E-7*np.pi
+AUX_S = [0.0,0.1,0.25,0.45,0.7,0.85,1.0]
+AUX_F = [2.0,1.9,1.6,1.1,0.5,0.3,0.05]
+S = np.array([0.05,0.3,0.6,0.9,0.97])
+# Values of the Fortran routines at S
+CUBIC = [1.9606608705739290,1.4811516584265350,0.70745307924926792,\
+	0.22502596485988216,0.10460560840973460]
+AKIMA = [1.9645833333333333,1.4759792069632496,0.72950441898527019,\
+	0.21657848324514983,0.097180952380952368]
+CUBIC_INT = [0.099097101470290203,0.53691193142423610,0.86602921980085013,\
+	0.99840921343630396,1.0100242622751299]
+AKIMA_INT = [0.099210069444444438,0.53685874704491721,0.86709433252326873,\
+	1.0002382653956237,1.0111844567536483]
+
+@pytest.fixture
+def indata():
+	if 'STELLOPT_PATH' not in os.environ: pytest.skip('STELLOPT_PATH not set')
+	from libstell.vmec import VMEC_INDATA
+	indata = VMEC_INDATA()
+	indata.bloat = 1.0
+	indata.pres_scale = 1.0
+	indata.lrfp = False
+	# Unused knots are zero as in the namelist
+	for name in ['am','ai','ac']:
+		setattr(indata,name,np.array([1.0,-0.5,0.25]+[0.0]*18))
+		setattr(indata,name+'_aux_s',np.array(AUX_S+[0.0]*10))
+		setattr(indata,name+'_aux_f',np.array(AUX_F+[0.0]*10))
+	return indata
+
+@pytest.mark.parametrize('ptype,ref',[('cubic_spline',CUBIC),('akima_spline',AKIMA)])
+def test_spline_profiles(indata,ptype,ref):
+	indata.pmass_type = ptype
+	indata.piota_type = ptype
+	indata.pcurr_type = ptype+'_i'
+	assert np.allclose(indata.pmass(S)/MU0,ref,rtol=0,atol=1.0E-13)
+	assert np.allclose(indata.piota(S),ref,rtol=0,atol=1.0E-13)
+	assert np.allclose(indata.pcurr(S),ref,rtol=0,atol=1.0E-13)
+
+@pytest.mark.parametrize('ptype,ref',[('cubic_spline_ip',CUBIC_INT),('akima_spline_ip',AKIMA_INT)])
+def test_spline_current(indata,ptype,ref):
+	indata.pcurr_type = ptype
+	assert np.allclose(indata.pcurr(S),ref,rtol=0,atol=1.0E-13)
+
+def test_profile_types(indata):
+	# Types of the other profile fall back to power_series
+	power = 1.0-0.5*S+0.25*S**2
+	for ptype in ['sum_atan','nice_quadratic']:
+		indata.pmass_type = ptype
+		assert np.allclose(indata.pmass(S)/MU0,power)
+	for ptype in ['two_power','gauss_trunc','two_lorentz']:
+		indata.piota_type = ptype
+		assert np.allclose(indata.piota(S),power)
+	indata.pmass_type = 'two_power'
+	indata.am = np.array([1.0,2.0,1.5]+[0.0]*18)
+	assert np.allclose(indata.pmass(S)/MU0,(1.0-S**2)**1.5)
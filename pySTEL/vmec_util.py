@@ -53,9 +53,7 @@ if __name__=="__main__":
 			ax=fig.add_subplot(221)
 			pyplot.subplots_adjust(hspace=0.4,wspace=0.3)
 			s = np.linspace(0.0,1.0,128)
-			f = np.zeros(128)
-			for i,x in enumerate(s):
-				f[i] = libStell.pmass(x)
+			f = libStell.pmass(s)
 			ax.plot(s,f/1E3,'k')
 			ax.text(0.02,0.19,rf'PHIEDGE={vmec_input.phiedge:4.3f} [Wb]', horizontalalignment='left',\
 				verticalalignment='center', transform=ax.transAxes)
@@ -71,17 +69,15 @@ if __name__=="__main__":
 			ax.set_title(f'VMEC Input: {args.vmec_ext}')
 			ax=fig.add_subplot(222)
 			if vmec_input.ncurr==1:
-				for i,x in enumerate(s):
-					f[i] = libStell.pcurr(x)
-					ax.set_ylabel("Current I(s)")
-					temp_str='PCURR'
-					temp_type = vmec_input.pcurr_type
+				f = libStell.pcurr(s)
+				ax.set_ylabel("Current I(s)")
+				temp_str='PCURR'
+				temp_type = vmec_input.pcurr_type
 			else:
-				for i,x in enumerate(s):
-					f[i] = libStell.piota(x)
-					ax.set_ylabel(r"$\iota$")
-					temp_str='PIOTA'
-					temp_type = vmec_input.piota_type
+				f = libStell.piota(s)
+				ax.set_ylabel(r"$\iota$")
+				temp_str='PIOTA'
+				temp_type = vmec_input.piota_type
 			ax.plot(s,f,'k')
 			ax.set_xlabel('Norm. Tor. Flux (s)')
 			ax.text(0.98,0.95,f'{temp_str}_TYPE: {temp_type}', horizontalalignment='right',\
@@ -138,16 +134,17 @@ if __name__=="__main__":
 			zeta  = np.ndarray((3,1))
 			for j in range(360): theta[j]=2.0*np.pi*j/359.0
 			for j in range(3):   zeta[j]=     np.pi*j/2.0
-			r = vmec_wout.cfunct(theta,zeta,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp)
-			z = vmec_wout.sfunct(theta,zeta,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp)
-			ax.plot(r[1,1,0],z[1,1,0],'+r')
-			ax.plot(r[1,1,1],z[1,1,1],'+g')
-			ax.plot(r[1,1,2],z[1,1,2],'+b')
-			j = vmec_wout.ns-1
+			surfs = [1,int(vmec_wout.ns/4),vmec_wout.ns-1]
+			r = vmec_wout.cfunct(theta,zeta,vmec_wout.rmnc,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp,surfaces=surfs)
+			z = vmec_wout.sfunct(theta,zeta,vmec_wout.zmns,vmec_wout.xm,vmec_wout.xn/vmec_wout.nfp,surfaces=surfs)
+			ax.plot(r[0,1,0],z[0,1,0],'+r')
+			ax.plot(r[0,1,1],z[0,1,1],'+g')
+			ax.plot(r[0,1,2],z[0,1,2],'+b')
+			j = 2
 			ax.plot(r[j,:,0],z[j,:,0],'r')
 			ax.plot(r[j,:,1],z[j,:,1],'g')
 			ax.plot(r[j,:,2],z[j,:,2],'b')
-			j = int(vmec_wout.ns/4)
+			j = 1
 			ax.plot(r[j,:,0],z[j,:,0],'--r')
 			ax.plot(r[j,:,1],z[j,:,1],'--g')
 			ax.plot(r[j,:,2],z[j,:,2],'--b')
@@ -159,9 +156,9 @@ if __name__=="__main__":
 			zeta  = np.ndarray((256,1))
 			for j in range(256): theta[j]=2.0*np.pi*j/255.0
 			for j in range(256):  zeta[j]=2.0*np.pi*j/255.0
-			b = vmec_wout.cfunct(theta,zeta,vmec_wout.bmnc,vmec_wout.xm_nyq,vmec_wout.xn_nyq/vmec_wout.nfp)
 			j = int(vmec_wout.ns/4)
-			h=ax.pcolormesh(np.squeeze(b[j,:,:]),cmap='jet',shading='gouraud')
+			b = vmec_wout.cfunct(theta,zeta,vmec_wout.bmnc,vmec_wout.xm_nyq,vmec_wout.xn_nyq/vmec_wout.nfp,surfaces=j)
+			h=ax.pcolormesh(np.squeeze(b[0,:,:]),cmap='jet',shading='gouraud')
 			ax.set_xlabel(r"$\zeta [rad]$")
 			ax.set_ylabel(r"$\theta_{VMEC}$ [rad]")
 			ax.set_title("|B| at mid radius")